@@ -1,8 +1,10 @@
 import os
-from crewai_tools import PDFSearchTool
 
 # Create a fresh RAG tool for each PDF
 def create_pdf_rag_tool():
+    # crewai_tools pulls in embedchain and vector store clients: seconds of import time
+    from crewai_tools import PDFSearchTool
+
     rag_tool = PDFSearchTool(
         config=dict(
             llm=dict(
@@ -1,39 +1,44 @@
-from crewai import Agent, LLM
 from app.PDF_RAG import create_pdf_rag_tool
-import os
-from crewai.knowledge.source.pdf_knowledge_source import PDFKnowledgeSource
+from app.llm_gateway import build_llm
+from app.log_config import CREW_VERBOSE
+from pathlib import Path
+from typing import Optional
+
+RESUME_ANALYZER_MODEL = "gemini/gemini-2.0-flash-lite"
 
 
 def _build_llm():
-    return LLM(
-        model="gemini/gemini-2.0-flash-lite",
-        api_key=os.getenv("GEMINI_API_KEY"),
-        temperature=0,
-        top_p=1,
-    )
+    return build_llm(RESUME_ANALYZER_MODEL, temperature=0, top_p=1)
+
 
+def build_resume_analyzer_agent(path : Optional[str] = None):
+    """Factory returning a fresh stateless resume analyzer agent.
+
+    With ``path`` the PDF is attached as a knowledge source (RAG, for oversized
+    resumes); without it the resume text is expected in the task prompt.
+    """
+    # crewai is imported on first build, not with the module (see app.startup)
+    from crewai import Agent
+    from crewai.knowledge.source.pdf_knowledge_source import PDFKnowledgeSource
 
-def build_resume_analyzer_agent(path : str):
-    """Factory returning a fresh stateless resume analyzer agent with its own PDF RAG tool."""
     llm = _build_llm()
-    pdf_source = PDFKnowledgeSource(
-        file_paths=[path]
-    )
+    knowledge_sources = None
+    if path:
+        # A Path (unlike a str) is used as-is instead of being resolved under knowledge/
+        knowledge_sources = [PDFKnowledgeSource(file_paths=[Path(path)])]
     return Agent(
         role="Resume Analyzer",
         goal="Parse a SINGLE provided resume PDF into accurate structured JSON strictly from its content.",
         backstory=(
-            "You operate in stateless mode: ONLY the current PDF at {resume_path} exists. "
-            "No prior resumes, no cached memory, no external documents beyond general language knowledge. "
-            "Never fabricate employers, dates, degrees, or skills. If it's not clearly in the PDF, exclude it. "
-            "Return ONLY valid JSON. No explanations. No extra keys. "
-            "All keywords must appear in the PDF (case-insensitive or trivial morphological variant)."
+            "A meticulous resume parser working statelessly on one resume at a time. "
+            "You never fabricate and return ONLY valid JSON with no extra keys."
         ),
         #tools=[create_pdf_rag_tool()],  # new tool per invocation
         llm=llm,
         memory=False,
-        verbose=True,
-        knowledge_sources=[pdf_source]
+        verbose=CREW_VERBOSE,
+        max_retry_limit=0,  # retries happen per LLM call in app.llm_gateway
+        knowledge_sources=knowledge_sources
     )
 
 # Backwards compatibility global (kept None intentionally to discourage reuse)
@@ -1,20 +1,38 @@
-from crewai import Agent
-from crewai import LLM
-import os
+from app.llm_gateway import build_llm
+from app.log_config import CREW_VERBOSE
 
-llm = LLM(
-    model="gemini/gemini-2.0-flash-lite",
-    api_key=os.getenv("GEMINI_API_KEY")
-)
+JOB_ANALYZER_MODEL = "gemini/gemini-2.0-flash-lite"
 
-job_analyzer_agent = Agent(
-    role="Job Description Analyzer",
-    goal="Parse job descriptions into structured JSON for matching.",
-    backstory=(
-        "You are a skilled job market analyst. "
-        "You always return valid JSON. "
-        "Your job is to extract keywords, responsibilities, and requirements."
-    ),
-    llm=llm,
-    verbose=True
-)
\ No newline at end of file
+
+def _build_llm():
+    return build_llm(JOB_ANALYZER_MODEL)
+
+
+def build_job_analyzer_agent(llm=None):
+    """Factory returning a fresh job analyzer agent; each pooled task gets its own."""
+    from crewai import Agent
+
+    return Agent(
+        role="Job Description Analyzer",
+        goal="Parse job descriptions into structured JSON for matching.",
+        backstory=(
+            "You are a skilled job market analyst. "
+            "You always return valid JSON. "
+            "Your job is to extract keywords, responsibilities, and requirements."
+        ),
+        llm=llm or _build_llm(),
+        verbose=CREW_VERBOSE,
+        max_retry_limit=0,  # retries happen per LLM call in app.llm_gateway
+    )
+
+# Backwards compatibility globals (not used by the pipeline, which checks agents out of app.pool),
+# built on first access so importing this module builds no LLM
+def __getattr__(name):
+    if name == "llm":
+        value = _build_llm()
+    elif name == "job_analyzer_agent":
+        value = build_job_analyzer_agent(globals().get("llm") or __getattr__("llm"))
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
\ No newline at end of file
@@ -1,23 +1,40 @@
-from crewai import Agent
-from crewai import LLM
-import os
+from app.llm_gateway import build_llm
+from app.log_config import CREW_VERBOSE
 
-llm = LLM(
-    model="gemini/gemini-2.0-flash-lite",
-    api_key=os.getenv("GEMINI_API_KEY"),
-    temperature=0
-)
+SCORE_GENERATOR_MODEL = "gemini/gemini-2.0-flash-lite"
 
-score_generator_agent = Agent(
-    role="ATS Score Generator",
-    goal="Compare resume analysis with job description analysis to compute ATS score and structured feedback.",
-    backstory=(
-        "You are an ATS optimization expert. "
-        "You always return valid JSON. "
-        "You compare resume keywords with job description keywords/requirements. "
-        "You must produce a score out of 100 and a breakdown of strengths, weaknesses, and summary."
-    ),
-    llm=llm,
-    verbose=True,
-    allow_delegation=False
-)
\ No newline at end of file
+
+def _build_llm():
+    return build_llm(SCORE_GENERATOR_MODEL, temperature=0)
+
+
+def build_score_generator_agent(llm=None):
+    """Factory returning a fresh ATS score generator agent; each pooled task gets its own."""
+    from crewai import Agent
+
+    return Agent(
+        role="ATS Score Generator",
+        goal="Compare resume analysis with job description analysis to compute ATS score and structured feedback.",
+        backstory=(
+            "You are an ATS optimization expert. "
+            "You always return valid JSON. "
+            "You compare resume keywords with job description keywords/requirements. "
+            "You must produce a score out of 100 and a breakdown of strengths, weaknesses, and summary."
+        ),
+        llm=llm or _build_llm(),
+        verbose=CREW_VERBOSE,
+        max_retry_limit=0,  # retries happen per LLM call in app.llm_gateway
+        allow_delegation=False
+    )
+
+# Backwards compatibility globals (not used by the pipeline, which checks agents out of app.pool),
+# built on first access so importing this module builds no LLM
+def __getattr__(name):
+    if name == "llm":
+        value = _build_llm()
+    elif name == "score_generator_agent":
+        value = build_score_generator_agent(globals().get("llm") or __getattr__("llm"))
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
\ No newline at end of file
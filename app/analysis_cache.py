@@ -0,0 +1,100 @@
+"""Content-addressed caches for LLM analyses that repeat across requests."""
+
+import hashlib
+import logging
+import os
+import unicodedata
+from typing import Optional
+from pydantic import ValidationError
+from app.agents.agent1 import RESUME_ANALYZER_MODEL
+from app.agents.agent2 import JOB_ANALYZER_MODEL
+from app.cache import build_cache
+from app.extraction import EXTRACTOR_VERSION
+from app.models import JobAnalysis, ResumeAnalysis
+from app.tasks.task1 import RESUME_ANALYSIS_PROMPT_VERSION
+from app.tasks.task2 import JOB_ANALYSIS_PROMPT_VERSION
+
+logger = logging.getLogger(__name__)
+
+JOB_ANALYSIS_CACHE_SIZE = int(os.getenv("JOB_ANALYSIS_CACHE_SIZE", "256"))
+JOB_ANALYSIS_CACHE_TTL = float(os.getenv("JOB_ANALYSIS_CACHE_TTL", str(7 * 24 * 3600)))  # 0 = never expire
+RESUME_ANALYSIS_CACHE_SIZE = int(os.getenv("RESUME_ANALYSIS_CACHE_SIZE", "1024"))
+RESUME_TEXT_CACHE_SIZE = int(os.getenv("RESUME_TEXT_CACHE_SIZE", "1024"))
+RESUME_EMBEDDING_CACHE_SIZE = int(os.getenv("RESUME_EMBEDDING_CACHE_SIZE", "8192"))  # vectors, ~4 KB each
+RESUME_CACHE_TTL = float(os.getenv("RESUME_CACHE_TTL", str(30 * 24 * 3600)))  # 0 = never expire
+
+job_analysis_cache = build_cache("job_analysis", JOB_ANALYSIS_CACHE_SIZE, JOB_ANALYSIS_CACHE_TTL)
+# Resume-derived entries can be purged from any process (DELETE /resumes), so with a disk tier
+# memory hits are checked against it
+resume_analysis_cache = build_cache("resume_analysis", RESUME_ANALYSIS_CACHE_SIZE, RESUME_CACHE_TTL, revalidate=True)
+resume_text_cache = build_cache("resume_text", RESUME_TEXT_CACHE_SIZE, RESUME_CACHE_TTL, revalidate=True)
+resume_embedding_cache = build_cache("resume_embedding", RESUME_EMBEDDING_CACHE_SIZE, RESUME_CACHE_TTL, revalidate=True)
+
+
+def normalize_job_description(job_description: str) -> str:
+    """Canonical form used for hashing: NFKC, collapsed whitespace, trimmed."""
+    text = unicodedata.normalize("NFKC", job_description or "")
+    return " ".join(text.split())
+
+
+def job_analysis_key(job_description: str) -> str:
+    payload = "\n".join((JOB_ANALYZER_MODEL, JOB_ANALYSIS_PROMPT_VERSION, normalize_job_description(job_description)))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_cached_job_analysis(job_description: str) -> Optional[JobAnalysis]:
+    key = job_analysis_key(job_description)
+    cached = job_analysis_cache.get(key)
+    if cached is None:
+        return None
+    try:
+        return JobAnalysis.model_validate(cached)
+    except ValidationError:
+        logger.warning(f"⚠️ Discarding invalid cached job analysis {key[:12]}")
+        return None
+
+
+def store_job_analysis(job_description: str, analysis: JobAnalysis):
+    job_analysis_cache.set(job_analysis_key(job_description), analysis.model_dump())
+
+
+def resume_analysis_key(resume_sha256: str) -> str:
+    # The upload hash leads every resume key so purge_resume can delete by prefix.
+    return f"{resume_sha256}:{RESUME_ANALYZER_MODEL}:{RESUME_ANALYSIS_PROMPT_VERSION}"
+
+
+def get_cached_resume_analysis(resume_sha256: str) -> Optional[ResumeAnalysis]:
+    key = resume_analysis_key(resume_sha256)
+    cached = resume_analysis_cache.get(key)
+    if cached is None:
+        return None
+    try:
+        return ResumeAnalysis.model_validate(cached)
+    except ValidationError:
+        logger.warning(f"⚠️ Discarding invalid cached resume analysis {resume_sha256[:12]}")
+        return None
+
+
+def store_resume_analysis(resume_sha256: str, analysis: ResumeAnalysis):
+    resume_analysis_cache.set(resume_analysis_key(resume_sha256), analysis.model_dump())
+
+
+def get_cached_resume_text(resume_sha256: str) -> Optional[str]:
+    return resume_text_cache.get(f"{resume_sha256}:{EXTRACTOR_VERSION}")
+
+
+def store_resume_text(resume_sha256: str, text: str):
+    resume_text_cache.set(f"{resume_sha256}:{EXTRACTOR_VERSION}", text)
+
+
+def purge_resume(resume_sha256: str) -> int:
+    """Privacy delete: drop every cached text, analysis and embedding derived from this upload.
+
+    Other processes still holding them in memory stop serving them at their next lookup,
+    which is checked against the disk tier. Raises ``sqlite3.Error`` if the disk tier fails.
+    """
+    removed = resume_analysis_cache.delete_prefix(f"{resume_sha256}:")
+    removed += resume_text_cache.delete_prefix(f"{resume_sha256}:")
+    removed += resume_embedding_cache.delete_prefix(f"{resume_sha256}:")
+    logger.info(f"🗑️ Purged {removed} cached entries for resume {resume_sha256[:12]}")
+    return removed
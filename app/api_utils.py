@@ -0,0 +1,74 @@
+"""Request checks and error helpers shared by the API routes."""
+
+import logging
+import math
+from typing import Dict, Optional
+from fastapi import HTTPException
+from app.llm_gateway import LLMUnavailableError
+from app.results import IDEMPOTENCY_KEY_MAX_LENGTH
+from app.scoring import resolve_scoring_mode
+from app.tenants import Tenant, tenant_for_key, tenants
+
+logger = logging.getLogger(__name__)
+
+
+def require_api_key(x_api_key: Optional[str]) -> Tenant:
+    """The client's tenant. Raise 500 if the server has no API_KEY/API_KEYS configured, 401 if the key is not one of them."""
+    if not tenants():
+        logger.error("❌ No API_KEY or API_KEYS environment variable set")
+        raise HTTPException(status_code=500, detail="Server configuration error")
+
+    tenant = tenant_for_key(x_api_key)
+    if tenant is None:
+        logger.warning("🚫 Invalid API key provided")
+        raise HTTPException(status_code=401, detail="Invalid API Key")
+    return tenant
+
+
+def queue_full_error(retry_after: int) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Server busy: review queue is full, retry later.",
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+def llm_unavailable_error(error: LLMUnavailableError) -> HTTPException:
+    logger.warning(f"🚦 {error}")
+    return HTTPException(
+        status_code=503,
+        detail="Language model unavailable, retry later.",
+        headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))},
+    )
+
+
+def validate_idempotency_key(idempotency_key: Optional[str]) -> Optional[str]:
+    """The stripped ``Idempotency-Key`` header, 422 if it is empty or too long."""
+    if idempotency_key is None:
+        return None
+    idempotency_key = idempotency_key.strip()
+    if not idempotency_key or len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(
+            status_code=422, detail=f"Idempotency-Key must be 1-{IDEMPOTENCY_KEY_MAX_LENGTH} characters"
+        )
+    return idempotency_key
+
+
+def idempotency_key_reused_error() -> HTTPException:
+    logger.warning("🚫 Idempotency-Key reused for a different review")
+    return HTTPException(
+        status_code=422, detail="Idempotency-Key was already used with a different resume or job description."
+    )
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """Render stage timings (seconds) as a Server-Timing header value in milliseconds."""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
+
+
+def validate_scoring_mode(scoring_mode: Optional[str]) -> str:
+    """Resolve the per-request scoring mode, 422 if it is unknown."""
+    try:
+        return resolve_scoring_mode(scoring_mode)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
@@ -0,0 +1,215 @@
+"""Small key/value caches used to skip repeated LLM and embedding work.
+
+``LRUCache`` is the in-process tier, ``SQLiteCache`` the optional on-disk tier
+shared by every worker on the host, and ``TieredCache`` checks them in that
+order. A ``revalidate`` cache confirms memory hits against the disk tier, so
+an entry another process deleted (a privacy purge) is never served from
+memory. Values must be JSON-serializable (store ``model.model_dump()``, not
+pydantic objects).
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_CACHE_DB = os.getenv("ANALYSIS_CACHE_DB")  # e.g. data/analysis_cache.db; unset = memory only
+
+
+class LRUCache:
+    """Thread-safe in-process LRU with optional per-entry TTL (``ttl_seconds=0`` disables expiry)."""
+
+    def __init__(self, maxsize: int = 256, ttl_seconds: float = 0):
+        self.maxsize = max(1, maxsize)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (expires_at or None, value)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> int:
+        with self._lock:
+            keys = [k for k in self._data if k.startswith(prefix)]
+            for k in keys:
+                del self._data[k]
+            return len(keys)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """On-disk cache table with TTL and least-recently-used trimming to ``max_entries``."""
+
+    def __init__(self, path: str, namespace: str, max_entries: int = 10_000, ttl_seconds: float = 0):
+        self.path = path
+        self.table = f"cache_{namespace}"
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, accessed_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        # Short-lived connections keep the cache safe across threads and processes.
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] is not None and row[1] < now:
+                conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return None
+            conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        now = time.time()
+        expires_at = now + self.ttl_seconds if self.ttl_seconds else None
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def delete(self, key: str):
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def contains(self, key: str) -> bool:
+        """Whether ``key`` is stored and not expired, without reading or touching the value."""
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT expires_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        return row is not None and (row[0] is None or row[0] >= time.time())
+
+    def delete_prefix(self, prefix: str) -> int:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"DELETE FROM {self.table} WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            )
+            return cursor.rowcount
+
+
+class TieredCache:
+    """Memory tier in front of an optional SQLite tier, with hit/miss counters."""
+
+    def __init__(self, name: str, memory: LRUCache, disk: Optional[SQLiteCache] = None, revalidate: bool = False):
+        self.name = name
+        self.memory = memory
+        self.disk = disk
+        self.revalidate = revalidate and disk is not None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()  # guards the counters; lookups run on many threads
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None and self.revalidate:
+            try:
+                if not self.disk.contains(key):
+                    # Deleted by another process since this one cached it
+                    self.memory.delete(key)
+                    value = None
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ {self.name} cache disk check failed: {e}")
+                value = None
+        if value is None and self.disk is not None:
+            try:
+                value = self.disk.get(key)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ {self.name} cache disk read failed: {e}")
+            if value is not None:
+                self.memory.set(key, value)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ {self.name} cache disk write failed: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {"hits": hits, "misses": misses, "memory_entries": len(self.memory)}
+
+    def delete_prefix(self, prefix: str) -> int:
+        removed = self.memory.delete_prefix(prefix)
+        if self.disk is not None:
+            removed += self.disk.delete_prefix(prefix)
+        return removed
+
+
+_caches: Dict[str, TieredCache] = {}
+
+
+def build_cache(
+    name: str, maxsize: int, ttl_seconds: float, disk_path: Optional[str] = ANALYSIS_CACHE_DB, revalidate: bool = False
+) -> TieredCache:
+    """Tiered cache named ``name``; the disk tier is enabled when ``disk_path`` is set."""
+    disk = None
+    if disk_path:
+        disk = SQLiteCache(disk_path, name, ttl_seconds=ttl_seconds)
+        logger.info(f"🗄️ {name} cache persisted to {disk_path}")
+    cache = TieredCache(name, LRUCache(maxsize, ttl_seconds), disk, revalidate)
+    _caches[name] = cache
+    return cache
+
+
+def cache_stats() -> Dict[str, dict]:
+    """Hit/miss counters and memory size of every cache built with ``build_cache``."""
+    return {name: cache.stats() for name, cache in _caches.items()}
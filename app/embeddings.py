@@ -0,0 +1,83 @@
+"""Embedder configuration with a per-resume cache of chunk embeddings."""
+
+import base64
+import hashlib
+import logging
+import os
+from array import array
+from typing import Optional
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from crewai.rag.embeddings.configurator import EmbeddingConfigurator
+from app.analysis_cache import resume_embedding_cache
+from app.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+EMBEDDER_MODEL = "text-embedding-004"
+
+
+def _encode_vector(vector) -> str:
+    # float32 + base64 keeps a 768-dim vector around 4 KB in memory and on disk
+    return base64.b64encode(array("f", (float(x) for x in vector)).tobytes()).decode("ascii")
+
+
+def _decode_vector(encoded: str) -> list:
+    values = array("f")
+    values.frombytes(base64.b64decode(encoded))
+    return values.tolist()
+
+
+class CachingEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Wraps an embedding function and serves repeated texts from ``resume_embedding_cache``.
+
+    Keys are ``<namespace>:<model>:<sha256(text)>`` with the resume hash as namespace,
+    so ``purge_resume`` removes a resume's vectors along with its analysis.
+    """
+
+    def __init__(self, inner: EmbeddingFunction, namespace: str, model: str = EMBEDDER_MODEL):
+        self._inner = inner
+        self._prefix = f"{namespace}:{model}:"
+
+    def __call__(self, input: Documents) -> Embeddings:
+        keys = [self._prefix + hashlib.sha256(text.encode("utf-8")).hexdigest() for text in input]
+        vectors = []
+        missing = []
+        for i, key in enumerate(keys):
+            cached = resume_embedding_cache.get(key)
+            vectors.append(_decode_vector(cached) if cached is not None else None)
+            if cached is None:
+                missing.append(i)
+
+        if missing:
+            with span("embedding", texts=len(missing)):
+                fresh = self._inner([input[i] for i in missing])
+            for i, vector in zip(missing, fresh):
+                resume_embedding_cache.set(keys[i], _encode_vector(vector))
+                vectors[i] = [float(x) for x in vector]
+        logger.debug(f"🧬 Embedded {len(missing)} of {len(keys)} chunks ({len(keys) - len(missing)} cached)")
+        return vectors
+
+
+def build_embedder_config(resume_sha256: Optional[str] = None) -> Optional[dict]:
+    """Embedder configuration (required for knowledge vectorization).
+
+    Returns ``None`` when no Google API key is configured. With ``resume_sha256``
+    the Google embedder is wrapped in a ``CachingEmbeddingFunction`` for that resume.
+    """
+    google_api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+    if not google_api_key:
+        return None
+    google_config = {
+        "provider": "google",
+        "config": {
+            "api_key": google_api_key,
+            "model": EMBEDDER_MODEL,
+        },
+    }
+    if resume_sha256 is None:
+        return google_config
+    inner = EmbeddingConfigurator().configure_embedder(google_config)
+    return {
+        "provider": "custom",
+        "config": {"embedder": CachingEmbeddingFunction(inner, namespace=resume_sha256)},
+    }
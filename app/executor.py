@@ -0,0 +1,240 @@
+"""Bounded worker pool that runs crew reviews off the event loop.
+
+Crew runs are synchronous and take tens of seconds, so they are handed to a
+thread (default) or process pool, or, in ``queue`` mode, to the review worker
+processes started by ``app.run`` through the durable queue in
+``app.work_queue``. Admission is bounded: at most
+``max_workers`` runs execute at once and at most ``max_queue`` more wait for a
+slot. Anything beyond that is rejected immediately with ``QueueFullError`` so
+the API can answer 503 + Retry-After instead of piling up work. In ``queue``
+mode the bound is on the shared queue (items queued or running, whichever API
+process put them there), and the queue is only touched from worker threads so
+the event loop never waits on SQLite.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from app.telemetry import QUEUE_WAIT
+
+logger = logging.getLogger(__name__)
+
+CREW_EXECUTOR_MODE = os.getenv("CREW_EXECUTOR_MODE", "thread").lower()  # "thread", "process" or "queue"
+CREW_MAX_WORKERS = int(os.getenv("CREW_MAX_WORKERS", "4"))
+CREW_MAX_QUEUE = int(os.getenv("CREW_MAX_QUEUE", "16"))
+CREW_RETRY_AFTER = int(os.getenv("CREW_RETRY_AFTER", "30"))  # seconds suggested to rejected clients
+WORK_QUEUE_POLL_INTERVAL = float(os.getenv("WORK_QUEUE_POLL_INTERVAL", "0.2"))  # queue mode: seconds between result checks
+WORK_QUEUE_TIMEOUT = float(os.getenv("WORK_QUEUE_TIMEOUT", "900"))  # queue mode: give up on a result after this
+
+_WAIT_SAMPLES = 1024  # recent queue-wait samples kept for percentiles
+
+
+class QueueFullError(Exception):
+    """Raised when the executor has no free slot and its queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Review queue is full")
+        self.retry_after = retry_after
+
+
+def _timed_call(fn: Callable[..., Any], args: tuple, kwargs: dict):
+    """Run ``fn`` and report the wall-clock time it started (works across processes)."""
+    started = time.time()
+    return started, fn(*args, **kwargs)
+
+
+def _percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class CrewExecutor:
+    """Runs blocking callables on a bounded pool and tracks queue metrics."""
+
+    def __init__(
+        self,
+        mode: str = CREW_EXECUTOR_MODE,
+        max_workers: int = CREW_MAX_WORKERS,
+        max_queue: int = CREW_MAX_QUEUE,
+        retry_after: int = CREW_RETRY_AFTER,
+    ):
+        if mode not in ("thread", "process", "queue"):
+            raise ValueError(f"Unsupported executor mode: {mode}")
+        self.mode = mode
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self._pool: Optional[Any] = None
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._waits = deque(maxlen=_WAIT_SAMPLES)
+
+    async def _collect_queued(self, item_id: int):
+        """Wait for a review worker process to finish work item ``item_id`` and return its outcome."""
+        from app.work_queue import get_work_queue, load_error
+        queue = get_work_queue()
+        deadline = time.monotonic() + WORK_QUEUE_TIMEOUT
+        try:
+            while (outcome := await asyncio.to_thread(queue.collect, item_id)) is None:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"No review worker finished work item {item_id} in {WORK_QUEUE_TIMEOUT:.0f}s")
+                await asyncio.sleep(WORK_QUEUE_POLL_INTERVAL)
+        except BaseException:
+            await asyncio.to_thread(queue.cancel, item_id)
+            raise
+        succeeded, data = outcome
+        if not succeeded:
+            raise load_error(data)
+        return pickle.loads(data)
+
+    def _get_pool(self):
+        # Created lazily so importing the app never spawns workers.
+        if self._pool is None:
+            if self.mode == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="crew")
+        return self._pool
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    async def is_saturated(self) -> bool:
+        """Cheap pre-check so callers can reject before doing upload work."""
+        if self.mode == "queue":
+            from app.work_queue import get_work_queue
+            return await asyncio.to_thread(get_work_queue().pending) >= self.capacity
+        return self._admitted >= self.capacity
+
+    def _reject(self):
+        with self._lock:
+            self._rejected += 1
+        raise QueueFullError(self.retry_after)
+
+    async def _enqueue(self, payload: bytes) -> Optional[int]:
+        """Put ``payload`` on the work queue unless it already holds ``capacity`` items; returns the item id."""
+        from app.work_queue import get_work_queue
+        queue = get_work_queue()
+        loop = asyncio.get_running_loop()
+        # Checked and inserted in one transaction, so API processes cannot overfill the queue together
+        enqueued = asyncio.ensure_future(asyncio.to_thread(queue.enqueue, payload, self.capacity))
+        try:
+            return await asyncio.shield(enqueued)
+        except asyncio.CancelledError:
+            # The insert may still land after the request gave up; drop the item when it does
+            enqueued.add_done_callback(
+                lambda f: f.cancelled() or f.exception() or f.result() is None
+                or loop.run_in_executor(None, queue.cancel, f.result())
+            )
+            raise
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._admitted -= 1
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` on the pool, or raise ``QueueFullError``.
+
+        In process and queue mode ``fn`` and its arguments must be picklable.
+        """
+        call = (_timed_call, fn, args, kwargs)
+        submitted_at = time.time()
+        if self.mode == "queue" and (item_id := await self._enqueue(pickle.dumps(call))) is None:
+            self._reject()
+        with self._lock:
+            if self.mode != "queue" and self._admitted >= self.capacity:
+                self._rejected += 1
+                raise QueueFullError(self.retry_after)
+            self._admitted += 1
+            self._submitted += 1
+
+        try:
+            if self.mode == "queue":
+                try:
+                    started_at, result = await self._collect_queued(item_id)
+                finally:
+                    self._release()
+            else:
+                if self.mode == "thread":
+                    # Carry the request's trace id (and OTel context) into the worker thread
+                    call = (contextvars.copy_context().run,) + call
+                try:
+                    future = self._get_pool().submit(*call)
+                except BaseException:
+                    self._release()
+                    raise
+                # A cancelled request cannot stop a crew that is already running: the slot
+                # is only freed once the pool is done with it, so admission stays bounded.
+                future.add_done_callback(self._release)
+                started_at, result = await asyncio.wrap_future(future)
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+
+        wait = max(0.0, started_at - submitted_at)
+        with self._lock:
+            self._completed += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            self._waits.append(wait)
+        QUEUE_WAIT.observe(wait)
+        logger.debug(f"⏱️ Crew run waited {wait:.3f}s for a worker")
+        return result
+
+    def stats(self) -> dict:
+        """Snapshot of queue depth, throughput counters and queue-wait times.
+
+        In queue mode these count this API process's runs; ``work_queue`` has the
+        shared queue's items by status.
+        """
+        with self._lock:
+            in_flight = min(self._admitted, self.max_workers)
+            waits = list(self._waits)
+            finished = self._completed
+            stats = {
+                "mode": self.mode,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": in_flight,
+                "queue_depth": self._admitted - in_flight,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "wait_seconds": {
+                    "avg": self._wait_total / finished if finished else 0.0,
+                    "max": self._wait_max,
+                    "p50": _percentile(waits, 50),
+                    "p95": _percentile(waits, 95),
+                },
+            }
+        if self.mode == "queue":
+            from app.work_queue import get_work_queue
+            stats["work_queue"] = get_work_queue().counts()
+        return stats
+
+    def shutdown(self, wait: bool = True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+
+crew_executor = CrewExecutor()
@@ -0,0 +1,54 @@
+"""Local resume text extraction.
+
+Pulls the text out of a resume PDF with pdfplumber and cleans it up so it can
+go straight into the resume analysis prompt. A 1-2 page resume is a few
+thousand tokens, far below the model's context window, so the common path
+needs no chunking, embeddings or vector store; only documents over
+``RESUME_INLINE_MAX_TOKENS`` fall back to knowledge-source RAG.
+"""
+
+import logging
+import os
+import re
+import unicodedata
+from app.token_budget import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Bump when extraction or cleaning changes, so cached texts are re-extracted.
+EXTRACTOR_VERSION = "pdfplumber-1"
+
+# Largest resume (prompt tokens, after compaction) injected into the prompt instead of going through RAG.
+RESUME_INLINE_MAX_TOKENS = int(os.getenv("RESUME_INLINE_MAX_TOKENS", "8000"))
+
+_CONTROL_CHARS_RE = re.compile(r"[\x00-\x08\x0b-\x1f\x7f\u200b-\u200d\ufeff]")
+_HYPHEN_BREAK_RE = re.compile(r"(\w)-\n(\w)")
+_SPACES_RE = re.compile(r"[ \t]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+def clean_text(text: str) -> str:
+    """NFKC, drop control characters, re-join words hyphenated across lines, collapse whitespace."""
+    text = unicodedata.normalize("NFKC", text or "")
+    text = text.replace("\r\n", "\n").replace("\r", "\n").replace("\f", "\n")
+    text = _CONTROL_CHARS_RE.sub("", text)
+    text = _HYPHEN_BREAK_RE.sub(r"\1\2", text)
+    lines = (_SPACES_RE.sub(" ", line).strip() for line in text.split("\n"))
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+
+def extract_pdf_text(path: str) -> str:
+    """Cleaned text of every page, pages separated by a blank line. Raises on unreadable PDFs."""
+    import pdfplumber
+
+    pages = []
+    with pdfplumber.open(path) as pdf:
+        for page in pdf.pages:
+            page_text = page.extract_text()
+            if page_text:
+                pages.append(page_text)
+    return clean_text("\n\n".join(pages))
+
+
+def fits_inline(text: str) -> bool:
+    return bool(text) and count_tokens(text) <= RESUME_INLINE_MAX_TOKENS
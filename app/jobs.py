@@ -0,0 +1,176 @@
+"""Pluggable storage for asynchronous review jobs.
+
+``JOB_STORE_URL`` selects the backend: ``memory://`` (default, per process) or
+``sqlite:///path/to/jobs.db`` (shared by every worker on the host).
+
+A job whose API process died (a restart, a crash) would stay queued or
+running forever; one not updated for ``JOB_STALE_SECONDS`` is marked failed
+the next time it is read.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Optional
+from app.models import ReviewJob
+
+logger = logging.getLogger(__name__)
+
+JOB_STORE_URL = os.getenv("JOB_STORE_URL", "memory://")
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", str(24 * 3600)))  # finished jobs are purged after this
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "1800"))  # unfinished jobs not updated for this long are failed
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+FINISHED_STATUSES = {STATUS_SUCCEEDED, STATUS_FAILED}
+
+
+class JobStore(ABC):
+    """Interface every job backend implements. All methods are thread-safe."""
+
+    def __init__(self, ttl_seconds: int = JOB_TTL_SECONDS, stale_seconds: int = JOB_STALE_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._lock = threading.RLock()
+
+    def create(self, tenant: Optional[str] = None) -> ReviewJob:
+        now = time.time()
+        job = ReviewJob(job_id=uuid.uuid4().hex, tenant=tenant, status=STATUS_QUEUED, created_at=now, updated_at=now)
+        self.purge_expired()
+        self._save(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[ReviewJob]:
+        """The job, marked failed first if it was left unfinished for ``stale_seconds``."""
+        with self._lock:
+            job = self._load(job_id)
+            if job is None or job.status in FINISHED_STATUSES or job.updated_at >= time.time() - self.stale_seconds:
+                return job
+            logger.warning(f"⌛ Review job {job_id} abandoned while {job.status}, marking it failed")
+            job = job.model_copy(update={
+                "status": STATUS_FAILED,
+                "error": "The review was abandoned: the server stopped before it finished",
+                "updated_at": time.time(),
+            })
+            self._save(job)
+            return job
+
+    @abstractmethod
+    def _load(self, job_id: str) -> Optional[ReviewJob]:
+        ...
+
+    @abstractmethod
+    def _save(self, job: ReviewJob):
+        ...
+
+    @abstractmethod
+    def purge_expired(self):
+        ...
+
+    def update(self, job_id: str, **fields) -> Optional[ReviewJob]:
+        """Apply ``fields`` to the job (status, result, error) and bump ``updated_at``."""
+        with self._lock:
+            job = self.get(job_id)
+            if job is None:
+                return None
+            job = job.model_copy(update={**fields, "updated_at": time.time()})
+            self._save(job)
+            return job
+
+    def add_stage(self, job_id: str, stage: str) -> Optional[ReviewJob]:
+        with self._lock:
+            job = self.get(job_id)
+            if job is None:
+                return None
+            return self.update(job_id, stages=job.stages + [stage])
+
+
+class InMemoryJobStore(JobStore):
+    def __init__(self, ttl_seconds: int = JOB_TTL_SECONDS):
+        super().__init__(ttl_seconds)
+        self._jobs: Dict[str, ReviewJob] = {}
+
+    def _load(self, job_id: str) -> Optional[ReviewJob]:
+        return self._jobs.get(job_id)
+
+    def _save(self, job: ReviewJob):
+        self._jobs[job.job_id] = job
+
+    def purge_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.status in FINISHED_STATUSES and job.updated_at < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+class SQLiteJobStore(JobStore):
+    """Jobs persisted in SQLite so status survives restarts and is visible to every worker."""
+
+    def __init__(self, path: str, ttl_seconds: int = JOB_TTL_SECONDS):
+        super().__init__(ttl_seconds)
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS review_jobs ("
+                "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation keeps the store safe across threads and processes.
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _load(self, job_id: str) -> Optional[ReviewJob]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM review_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return ReviewJob.model_validate(json.loads(row[0])) if row else None
+
+    def _save(self, job: ReviewJob):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO review_jobs (job_id, status, data, updated_at) VALUES (?, ?, ?, ?)",
+                (job.job_id, job.status, job.model_dump_json(), job.updated_at),
+            )
+
+    def purge_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        placeholders = ", ".join("?" for _ in FINISHED_STATUSES)
+        with self._connect() as conn:
+            conn.execute(
+                f"DELETE FROM review_jobs WHERE status IN ({placeholders}) AND updated_at < ?",
+                (*FINISHED_STATUSES, cutoff),
+            )
+
+
+def build_job_store(url: str = JOB_STORE_URL) -> JobStore:
+    """Create the job store described by ``url`` (``memory://`` or ``sqlite:///path``)."""
+    if url.startswith("sqlite:///"):
+        path = url[len("sqlite:///"):]
+        logger.info(f"🗄️ Using SQLite job store at {path}")
+        return SQLiteJobStore(path)
+    if url in ("", "memory://"):
+        return InMemoryJobStore()
+    raise ValueError(f"Unsupported JOB_STORE_URL: {url}")
+
+
+job_store = build_job_store()
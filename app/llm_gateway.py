@@ -0,0 +1,409 @@
+"""Resilient LLM call layer shared by every agent.
+
+``build_llm`` returns a ``GatewayLLM``: a CrewAI ``LLM`` whose calls go
+through ``resilient_call``, which adds
+
+- a deadline per attempt (``LLM_CALL_TIMEOUT``) and for the whole call
+  including retries and fallback (``LLM_CALL_DEADLINE``);
+- retries of rate-limited and transient failures with full-jitter
+  exponential backoff, honouring ``Retry-After``;
+- optional hedging (``LLM_HEDGE``): when an attempt is slower than the
+  model's recent p95, a second identical request races it;
+- a circuit breaker per model that fails fast after repeated failures;
+- a fallback model (``LLM_FALLBACK_MODEL``) once the primary gives up;
+- a process-wide token bucket (``LLM_RATE_LIMIT_RPS``) that every attempt,
+  retry and hedge draws from, so retries cannot stampede the quota.
+
+Client errors (bad request, auth, context length) are raised unchanged.
+When no attempt succeeds, ``LLMUnavailableError`` is raised. ``LLM_BASE_URL``
+points the Gemini models at another API root, e.g. the fake server in
+``bench/fake_llm_server.py``.
+"""
+
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional
+from functools import lru_cache
+from app.llm_http import get_llm_http_client
+from app.telemetry import Counter
+
+logger = logging.getLogger(__name__)
+
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")  # API root override (e.g. http://127.0.0.1:8090); unset = provider default
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL")  # e.g. gemini/gemini-2.0-flash; unset = no fallback
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "60"))  # seconds per attempt
+LLM_CALL_DEADLINE = float(os.getenv("LLM_CALL_DEADLINE", "150"))  # seconds for all attempts, backoff and fallback
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))  # seconds, doubled per retry
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "2.0"))  # never hedge sooner than this
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))  # consecutive failures that open the circuit
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))  # seconds open before a probe call is let through
+LLM_RATE_LIMIT_RPS = float(os.getenv("LLM_RATE_LIMIT_RPS", "0"))  # LLM requests per second; 0 = unlimited
+LLM_RATE_LIMIT_BURST = int(os.getenv("LLM_RATE_LIMIT_BURST", "10"))
+LLM_GATEWAY_THREADS = int(os.getenv("LLM_GATEWAY_THREADS", "64"))  # attempts in flight, including abandoned ones
+
+_LATENCY_SAMPLES = 200
+_MIN_HEDGE_SAMPLES = 20
+
+LLM_ATTEMPTS = Counter("llm_attempts_total", "LLM request attempts by outcome.", ["model", "outcome"])
+LLM_HEDGES = Counter("llm_hedged_requests_total", "Hedge requests started for slow LLM attempts.", ["model"])
+LLM_FALLBACKS = Counter("llm_fallbacks_total", "Calls handed to the fallback model.", ["model"])
+
+
+class LLMUnavailableError(RuntimeError):
+    """No attempt succeeded before the deadline (retries exhausted, circuit open or rate limited)."""
+
+    def __init__(self, message: str, retry_after: float = 0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AttemptTimeout(TimeoutError):
+    """An attempt (and its hedge) did not answer within ``LLM_CALL_TIMEOUT``."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``rate`` tokens per second up to ``burst``. A rate of 0 never limits."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self) -> float:
+        """Take a token and return 0, or return the seconds until one is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def try_acquire(self) -> bool:
+        return self.rate <= 0 or self._take() == 0.0
+
+    def acquire(self, timeout: float) -> bool:
+        """Block until a token is free; False if that would take longer than ``timeout`` seconds."""
+        if self.rate <= 0:
+            return True
+        deadline = time.monotonic() + timeout
+        while True:
+            wait_for = self._take()
+            if wait_for == 0.0:
+                return True
+            if time.monotonic() + wait_for > deadline:
+                return False
+            time.sleep(wait_for)
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures; after ``reset_timeout`` one probe call decides."""
+
+    def __init__(self, name: str, failure_threshold: int = LLM_BREAKER_FAILURES, reset_timeout: float = LLM_BREAKER_RESET):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self._opened_at >= self.reset_timeout else "open"
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info(f"🔌 LLM circuit for {self.name} closed")
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release(self):
+        """Give back a probe slot taken by ``allow`` when no request was made."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and self._failures >= self.failure_threshold):
+                logger.warning(f"🔌 LLM circuit for {self.name} open after {self._failures} failures")
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self._failures}
+
+
+class LatencyTracker:
+    """Recent successful attempt latencies of one model, for the hedge delay."""
+
+    def __init__(self, size: int = _LATENCY_SAMPLES):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < _MIN_HEDGE_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+rate_limiter = TokenBucket(LLM_RATE_LIMIT_RPS, LLM_RATE_LIMIT_BURST)
+_breakers: Dict[str, CircuitBreaker] = {}
+_latencies: Dict[str, LatencyTracker] = {}
+_registry_lock = threading.Lock()
+_attempt_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _breaker_for(model: str) -> CircuitBreaker:
+    with _registry_lock:
+        if model not in _breakers:
+            _breakers[model] = CircuitBreaker(model)
+        return _breakers[model]
+
+
+def _latency_for(model: str) -> LatencyTracker:
+    with _registry_lock:
+        if model not in _latencies:
+            _latencies[model] = LatencyTracker()
+        return _latencies[model]
+
+
+def _get_attempt_pool() -> ThreadPoolExecutor:
+    global _attempt_pool
+    with _registry_lock:
+        if _attempt_pool is None:
+            _attempt_pool = ThreadPoolExecutor(max_workers=LLM_GATEWAY_THREADS, thread_name_prefix="llm")
+        return _attempt_pool
+
+
+def gateway_stats() -> Dict[str, dict]:
+    """Circuit state and hedge delay per model seen so far."""
+    with _registry_lock:
+        models = sorted(set(_breakers) | set(_latencies))
+    return {
+        model: {**_breaker_for(model).stats(), "p95_seconds": _latency_for(model).percentile(LLM_HEDGE_PERCENTILE)}
+        for model in models
+    }
+
+
+# --- error classification ----------------------------------------------------
+
+RATE_LIMITED = "rate_limited"
+TRANSIENT = "transient"
+FATAL = "fatal"
+
+
+def classify_error(error: BaseException) -> str:
+    """rate_limited / transient errors are retried; fatal ones (4xx, bad output) are raised as-is."""
+    import litellm  # already loaded by the call that raised
+
+    if isinstance(error, litellm.RateLimitError):
+        return RATE_LIMITED
+    if isinstance(error, (AttemptTimeout, litellm.Timeout, litellm.APIConnectionError,
+                          litellm.ServiceUnavailableError, litellm.InternalServerError)):
+        return TRANSIENT
+    status = getattr(error, "status_code", None)
+    if status == 429:
+        return RATE_LIMITED
+    if isinstance(status, int) and (status >= 500 or status == 408):
+        return TRANSIENT
+    return FATAL
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or getattr(error, "litellm_response_headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def backoff_delay(retry: int, retry_after: Optional[float] = None) -> float:
+    """Full jitter: uniform in [0, min(max, base * 2^retry)], but never below the server's Retry-After."""
+    delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** retry)))
+    return max(delay, retry_after or 0.0)
+
+
+# --- calls -------------------------------------------------------------------
+
+def _run_attempt(model: str, attempt: Callable[[], object], deadline: float) -> object:
+    """One attempt on the attempt pool, raced by a hedge request if it is slower than the model's p95."""
+    pool = _get_attempt_pool()
+    started = time.monotonic()
+    attempt_deadline = min(deadline, started + LLM_CALL_TIMEOUT)
+    hedge_at = None
+    if LLM_HEDGE:
+        p95 = _latency_for(model).percentile(LLM_HEDGE_PERCENTILE)
+        hedge_at = started + max(LLM_HEDGE_MIN_DELAY, p95 or 0.0)
+        if hedge_at >= attempt_deadline:
+            hedge_at = None
+
+    # Each submission gets its own context copy (a Context cannot be entered twice at once)
+    pending = {pool.submit(contextvars.copy_context().run, attempt)}
+    error: Optional[BaseException] = None
+    while pending:
+        wake_at = hedge_at if hedge_at is not None else attempt_deadline
+        done, pending = wait(pending, timeout=max(0.0, wake_at - time.monotonic()), return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+        if not pending:
+            break
+        now = time.monotonic()
+        if hedge_at is not None and now >= hedge_at:
+            hedge_at = None
+            if rate_limiter.try_acquire():
+                LLM_HEDGES.inc(model=model)
+                logger.info(f"🏁 Hedging slow {model} call after {now - started:.1f}s")
+                pending.add(pool.submit(contextvars.copy_context().run, attempt))
+        elif now >= attempt_deadline:
+            # The abandoned request finishes in the background, bounded by LLM_HTTP_TIMEOUT
+            raise AttemptTimeout(f"{model} did not answer within {attempt_deadline - started:.1f}s")
+    raise error
+
+
+def resilient_call(model: str, attempt: Callable[[], object], deadline: float) -> object:
+    """Call ``attempt`` under the rate limiter, circuit breaker, retries and hedging of ``model``."""
+    breaker = _breaker_for(model)
+    last_error: Optional[BaseException] = None
+    for retry in range(LLM_MAX_RETRIES + 1):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        if not breaker.allow():
+            raise LLMUnavailableError(f"LLM circuit for {model} is open", retry_after=breaker.retry_after())
+        if not rate_limiter.acquire(timeout=remaining):
+            breaker.release()
+            raise LLMUnavailableError(f"LLM rate limit leaves no room before the deadline ({model})", retry_after=1)
+
+        started = time.monotonic()
+        try:
+            result = _run_attempt(model, attempt, deadline)
+        except Exception as e:
+            kind = classify_error(e)
+            LLM_ATTEMPTS.inc(model=model, outcome=kind)
+            if kind == FATAL:
+                breaker.record_success()  # the service answered; the request itself is at fault
+                raise
+            breaker.record_failure()
+            last_error = e
+            delay = backoff_delay(retry, _retry_after(e))
+            if retry == LLM_MAX_RETRIES or time.monotonic() + delay >= deadline:
+                break
+            logger.warning(f"⚠️ {model} call {kind} ({type(e).__name__}), retry {retry + 1} in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        LLM_ATTEMPTS.inc(model=model, outcome="ok")
+        breaker.record_success()
+        _latency_for(model).add(time.monotonic() - started)
+        return result
+
+    raise LLMUnavailableError(
+        f"LLM {model} unavailable: {type(last_error).__name__ if last_error else 'deadline exceeded'}",
+        retry_after=breaker.retry_after() or LLM_BACKOFF_BASE,
+    ) from last_error
+
+
+def _connection_params(model: str) -> dict:
+    """API key, shared HTTP pool and base URL override for ``model``."""
+    if model.startswith("gemini/"):
+        params = {"api_key": os.getenv("GEMINI_API_KEY"), "client": get_llm_http_client()}
+        if LLM_BASE_URL:
+            # litellm appends ":generateContent" to the Gemini api_base
+            params["api_base"] = f"{LLM_BASE_URL.rstrip('/')}/v1beta/models/{model.split('/', 1)[1]}"
+        return params
+    return {"base_url": LLM_BASE_URL} if LLM_BASE_URL else {}
+
+
+@lru_cache(maxsize=None)
+def gateway_llm_class() -> type:
+    """``GatewayLLM``, defined on first use: subclassing CrewAI's ``LLM`` imports crewai and litellm."""
+    from crewai import LLM
+
+    class GatewayLLM(LLM):
+        """CrewAI LLM whose calls go through ``resilient_call``, then the fallback model."""
+
+        def __init__(self, model: str, fallback_model: Optional[str] = LLM_FALLBACK_MODEL, **kwargs):
+            super().__init__(model=model, **kwargs)
+            self._fallback_model = fallback_model if fallback_model and fallback_model != model else None
+            self._fallback_params = {k: v for k, v in kwargs.items() if k in ("temperature", "top_p", "timeout")}
+            self._fallback_llm: Optional[LLM] = None
+
+        def _fallback(self) -> Optional[LLM]:
+            if self._fallback_model and self._fallback_llm is None:
+                self._fallback_llm = LLM(
+                    model=self._fallback_model, **_connection_params(self._fallback_model), **self._fallback_params
+                )
+            return self._fallback_llm
+
+        def call(self, messages, tools=None, callbacks=None, available_functions=None, from_task=None, from_agent=None):
+            args = (messages, tools, callbacks, available_functions, from_task, from_agent)
+            deadline = time.monotonic() + LLM_CALL_DEADLINE
+            try:
+                return resilient_call(self.model, lambda: LLM.call(self, *args), deadline)
+            except LLMUnavailableError as e:
+                fallback = self._fallback()
+                if fallback is None or time.monotonic() >= deadline:
+                    raise
+                logger.warning(f"↪️ {e}; falling back to {fallback.model}")
+                LLM_FALLBACKS.inc(model=self.model)
+                return resilient_call(fallback.model, lambda: fallback.call(*args), deadline)
+
+    # Found again through the module __getattr__ below, so instances pickle like any module-level class
+    GatewayLLM.__qualname__ = "GatewayLLM"
+    return GatewayLLM
+
+
+def build_llm(model: str, **params):
+    """Gateway LLM for ``model`` with the shared connection settings; ``params`` are sampling options."""
+    return gateway_llm_class()(model=model, timeout=LLM_CALL_TIMEOUT, **_connection_params(model), **params)
+
+
+def __getattr__(name):
+    if name == "GatewayLLM":
+        return gateway_llm_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
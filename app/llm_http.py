@@ -0,0 +1,46 @@
+"""Process-wide HTTP connection pool for LLM calls.
+
+Every agent LLM is built with the same litellm ``HTTPHandler`` (passed as the
+``client`` completion parameter), so concurrent crews reuse warm keep-alive
+connections to the model API instead of each call negotiating TLS again.
+``httpx.Client`` is thread-safe; process workers each get their own pool.
+"""
+
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from litellm.llms.custom_httpx.http_handler import HTTPHandler
+
+logger = logging.getLogger(__name__)
+
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "32"))
+LLM_HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "120"))  # seconds per request
+
+_client: Optional["HTTPHandler"] = None
+_lock = threading.Lock()
+
+
+def get_llm_http_client() -> "HTTPHandler":
+    import httpx
+    from litellm.llms.custom_httpx.http_handler import HTTPHandler
+
+    global _client
+    with _lock:
+        if _client is None:
+            _client = HTTPHandler(
+                timeout=httpx.Timeout(LLM_HTTP_TIMEOUT, connect=5.0),
+                concurrent_limit=LLM_HTTP_MAX_CONNECTIONS,
+            )
+            logger.info(f"🔌 LLM HTTP pool ready (max {LLM_HTTP_MAX_CONNECTIONS} connections)")
+        return _client
+
+
+def close_llm_http_client():
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
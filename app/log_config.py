@@ -0,0 +1,168 @@
+"""Logging setup: JSON or text output, a non-blocking queue handler, per-route sampling and header redaction.
+
+``configure_logging`` replaces the root handlers with a ``QueueHandler``:
+request threads only enqueue records and a background ``QueueListener``
+formats and writes them, so slow stderr or log shipping never stalls a
+request. Records carry the current trace id (``app.telemetry``).
+
+Sampling is decided once per request (``sample_request``) from
+``LOG_SAMPLE_RATES``; in a request that was not sampled, records below
+WARNING are dropped, so warnings and errors are always logged.
+"""
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+from typing import Dict, List, Mapping, Optional, Tuple
+from app.telemetry import current_trace_id
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # "text" or "json"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # records buffered before new ones are dropped
+LOG_SAMPLE_DEFAULT = float(os.getenv("LOG_SAMPLE_DEFAULT", "1.0"))  # share of requests logged below WARNING
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "/metrics=0,/healthz=0,/readyz=0")  # comma-separated path-prefix=rate
+# Agent/crew transcripts on stdout; expensive and chatty, keep off in production.
+CREW_VERBOSE = os.getenv("CREW_VERBOSE", "false").lower() in ("1", "true", "yes")
+
+REDACTED = "[redacted]"
+SENSITIVE_HEADERS = frozenset({"authorization", "proxy-authorization", "cookie", "set-cookie", "x-api-key"})
+
+_TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(trace_id)s] %(message)s"
+# LogRecord attributes that are not user-supplied ``extra`` fields
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "trace_id"}
+
+_sampled: contextvars.ContextVar[bool] = contextvars.ContextVar("log_sampled", default=True)
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def parse_sample_rates(spec: str) -> List[Tuple[str, float]]:
+    """``"/run-crew=0.1,/batch=0.5"`` -> [(prefix, rate)], longest prefix first."""
+    rates = []
+    for item in (spec or "").split(","):
+        prefix, sep, rate = item.strip().partition("=")
+        if not sep or not prefix:
+            continue
+        try:
+            rates.append((prefix.strip(), min(1.0, max(0.0, float(rate)))))
+        except ValueError:
+            logging.getLogger(__name__).warning(f"⚠️ Ignoring invalid LOG_SAMPLE_RATES entry {item!r}")
+    return sorted(rates, key=lambda entry: len(entry[0]), reverse=True)
+
+
+_sample_rates = parse_sample_rates(LOG_SAMPLE_RATES)
+
+
+def sample_rate_for(path: str) -> float:
+    for prefix, rate in _sample_rates:
+        if path.startswith(prefix):
+            return rate
+    return LOG_SAMPLE_DEFAULT
+
+
+def sample_request(path: str) -> contextvars.Token:
+    """Decide whether this request's INFO/DEBUG records are kept; reset the returned token when it ends."""
+    rate = sample_rate_for(path)
+    return _sampled.set(rate >= 1.0 or (rate > 0.0 and random.random() < rate))
+
+
+def end_request(token: contextvars.Token):
+    _sampled.reset(token)
+
+
+def redact_headers(headers: Mapping[str, str]) -> Dict[str, str]:
+    """Header dict safe to log: credentials and cookies replaced with ``[redacted]``."""
+    return {name: REDACTED if name.lower() in SENSITIVE_HEADERS else value for name, value in headers.items()}
+
+
+class ContextFilter(logging.Filter):
+    """Stamps the trace id and applies request sampling; runs in the logging thread, before queueing."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING and not _sampled.get():
+            return False
+        if getattr(record, "trace_id", None) is None:
+            record.trace_id = current_trace_id() or "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, trace id, ``extra`` fields and exception."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "trace_id": getattr(record, "trace_id", "-"),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records without formatting them here (the stock handler bakes the text format in)."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass  # shed log records rather than block a request
+
+
+def _build_formatter() -> logging.Formatter:
+    if LOG_FORMAT == "json":
+        return JsonFormatter()
+    return logging.Formatter(_TEXT_FORMAT)
+
+
+def configure_logging():
+    """Install the queue handler on the root logger (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler()
+    output.setFormatter(_build_formatter())
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    handler = _QueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,33 +1,72 @@
-import shutil
 import asyncio
 import logging
-import uuid
+from contextlib import asynccontextmanager
+from functools import partial
 from typing import Optional
 from fastapi import HTTPException, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 import os
 import tempfile
-from fastapi import FastAPI, File, Form, Header, UploadFile
+from fastapi import FastAPI, File, Form, Header, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from crewai import Crew
 from dotenv import load_dotenv
-from app.agents.agent2 import job_analyzer_agent
-from app.agents.agent3 import score_generator_agent
-from app.tasks.task1 import build_resume_analysis_task
-from app.tasks.task2 import job_analysis_task
-from app.tasks.task3 import build_ats_score_task
+from app.api_utils import (
+    idempotency_key_reused_error,
+    llm_unavailable_error,
+    queue_full_error,
+    require_api_key,
+    server_timing_header,
+    validate_idempotency_key,
+    validate_scoring_mode,
+)
+from app.executor import QueueFullError, crew_executor
+from app.llm_gateway import LLMUnavailableError
+from app.llm_http import close_llm_http_client
+from app.log_config import configure_logging, end_request, redact_headers, sample_request, stop_logging
+from app.pipeline import PipelineError, run_review
+from app.pool import pool_stats
+from app.results import IdempotencyKeyReused, bind_idempotency_key, has_idempotent_result, review_key, review_once
+from app.routes.batch import BATCH_MAX_REQUEST_SIZE, router as batch_router
+from app.routes.candidates import router as candidates_router
+from app.routes.health import router as health_router
+from app.routes.metrics import router as metrics_router
+from app.routes.resumes import router as resumes_router
+from app.routes.reviews import cancel_review_jobs, check_job_store, router as reviews_router
+from app.skill_index import index_resume, skill_indexes
+from app.startup import mark_stopping, start_warm_up
+from app.telemetry import TraceMiddleware, shutdown_tracing
+from app.tenants import TenantLimitMiddleware
+from app.token_budget import token_usage_header
+from app.uploads import MAX_REQUEST_SIZE, RequestSizeLimitMiddleware, cleanup_upload, log_upload_details, store_upload
 from pydantic import BaseModel
 
 """Main FastAPI application for the Resume Reviewer System."""
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging: JSON/text via a background queue, sampled per route (see app.log_config)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Load environment variables from .env (idempotent call)
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    check_job_store()
+    # Import crewai, build the stage agents/tasks and load the tokenizer before the first request
+    # needs them (in the background by default, see app.startup); in queue mode the review workers
+    # run the crews and warm their own
+    await start_warm_up(pools=crew_executor.mode != "queue")
+    yield
+    mark_stopping()
+    await cancel_review_jobs()
+    # Let in-flight crew runs finish, drop anything still queued.
+    crew_executor.shutdown(wait=True)
+    skill_indexes.save()
+    close_llm_http_client()
+    shutdown_tracing()
+    stop_logging()
+
 app = FastAPI(
     title="Resume Reviewer System API",
     description=(
@@ -38,22 +77,21 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_url="/openapi.json",
+    lifespan=lifespan,
 )
 
 # Add exception handler for validation errors
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    logger.error("🚫 Pydantic Validation Error:")
-    logger.error(f"📍 URL: {request.url}")
-    logger.error(f"📋 Method: {request.method}")
-    logger.error(f"📄 Headers: {dict(request.headers)}")
-    
-    # Log detailed validation errors
-    for error in exc.errors():
-        logger.error(f"❌ Field: {error['loc']} | Type: {error['type']} | Message: {error['msg']}")
-        if 'input' in error:
-            logger.error(f"💡 Input received: {error['input']}")
-    
+    # One line per request; headers (redacted) and inputs only at DEBUG, they can hold personal data
+    fields = "; ".join(f"{error['loc']}: {error['msg']}" for error in exc.errors())
+    logger.warning(f"🚫 Validation failed for {request.method} {request.url.path}: {fields}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"📄 Headers: {redact_headers(request.headers)}")
+        for error in exc.errors():
+            if 'input' in error:
+                logger.debug(f"💡 Input received for {error['loc']}: {error['input']!r:.200}")
+
     return JSONResponse(
         status_code=422,
         content={
@@ -63,8 +101,45 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         }
     )
 
+# Oversized uploads are refused before the multipart parser buffers them
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    max_body_size=MAX_REQUEST_SIZE,
+    limits={"/batch/": BATCH_MAX_REQUEST_SIZE},
+)
+
+# Unknown keys, rate-limited and over-concurrency tenants are refused from the headers alone
+app.add_middleware(TenantLimitMiddleware)
+
+app.include_router(reviews_router)
+app.include_router(resumes_router)
+app.include_router(batch_router)
+app.include_router(candidates_router)
+app.include_router(metrics_router)
+app.include_router(health_router)
+
+@app.middleware("http")
+async def log_requests(request: Request, call_next):
+    """Decide log sampling for the request and log it in two lines (headers only at DEBUG, redacted)."""
+    token = sample_request(request.url.path)
+    try:
+        logger.info(f"📥 {request.method} {request.url.path}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"📋 Headers: {redact_headers(request.headers)}")
+        response = await call_next(request)
+        logger.info(f"📤 {request.method} {request.url.path} -> {response.status_code}")
+        return response
+    finally:
+        end_request(token)
+
+# Every response (413s included) carries X-Trace-Id and lands in the request metrics,
+# and every log line of the request has its trace id
+app.add_middleware(TraceMiddleware)
+
 # Minimal, configurable CORS so the Swagger UI can be used from a browser during development.
+# Added last so it is outermost: the 401/413/429 answers of the middlewares above get CORS headers too.
 raw = os.getenv("ALLOWED_ORIGINS")
+origins = ["http://localhost:3000"]
 if raw:
     origins = [o.strip() for o in raw.split(",") if o.strip()]
 
@@ -74,242 +149,89 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id", "Server-Timing", "X-Token-Usage", "X-Review-Source"],
 )
 
-# Save uploaded file to uploads folder in a thread so we don't block the event loop.
-        # Ensure the file is flushed and synced to disk before proceeding to Crew.
-def _save_and_sync(upload_file, dest_path):
-    # upload_file.file is a file-like object opened by Starlette's UploadFile
-    # copy into dest_path, flush and fsync to ensure write completes.
-    with open(dest_path, "wb") as buffer:
-        shutil.copyfileobj(upload_file.file, buffer)
-        buffer.flush()
-        try:
-            os.fsync(buffer.fileno())
-        except OSError:
-            # fsync may not be supported in some environments; ignore if it fails
-            pass
-
-UPLOAD_DIR = os.path.normpath(os.path.join("web", "uploads"))  # matches your mounts: block in .platform.app.yaml
-MAX_FILE_SIZE = 2 * 1024 * 1024  # 2 MB
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-KNOWLEDGE_DIR = os.path.normpath(os.path.join("knowledge"))
-os.makedirs(KNOWLEDGE_DIR, exist_ok=True)
-
-def _wait_for_file(path: str, attempts: int = 5, delay: float = 0.05) -> bool:
-    """Poll for file existence & non-zero size to guard against race conditions on some filesystems."""
-    import time
-    last_size = -1
-    for _ in range(attempts):
-        if os.path.exists(path):
-            size = os.path.getsize(path)
-            if size > 0 and size == last_size:  # stable size over two consecutive checks
-                return True
-            last_size = size
-        time.sleep(delay)
-    return os.path.exists(path) and os.path.getsize(path) > 0
-
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Log all incoming requests for debugging"""
-    logger.info(f"📥 Incoming request: {request.method} {request.url}")
-    logger.info(f"📋 Headers: {dict(request.headers)}")
-    
-    # Log form data for POST requests (be careful with file content)
-    if request.method == "POST":
-        try:
-            content_type = request.headers.get("content-type", "")
-            logger.info(f"📄 Content-Type: {content_type}")
-            if "multipart/form-data" in content_type:
-                logger.info("📎 Multipart form data detected")
-        except Exception as e:
-            logger.error(f"❌ Error reading request details: {e}")
-    
-    response = await call_next(request)
-    logger.info(f"📤 Response status: {response.status_code}")
-    return response
-
 @app.post("/run-crew")
 async def run_crew(
+    response: Response,
     job_description: str = Form(...),
     resume_file: UploadFile = File(...),
-    x_api_key: Optional[str] = Header(None)
+    scoring_mode: Optional[str] = Form(None),
+    x_api_key: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
 ):
-    logger.info("🚀 Starting /run-crew endpoint")
-    resume_path = None
-    knowledge_path_full = None  # will hold path to copied knowledge file
-    knowledge_copied = False    # flag to indicate we created a copy to delete later
+    upload = None
+    owns_upload = True  # until review_once takes over deleting it
     try:
-        # Log received parameters
-        logger.info(f"📝 Job description length: {len(job_description) if job_description else 0} chars")
-        logger.info(f" API key provided: {'Yes' if x_api_key else 'No'}")
-
-        # Log file details
-        if resume_file:
-            logger.info(f"📎 File details:")
-            logger.info(f"  - Filename: {resume_file.filename}")
-            logger.info(f"  - Content-Type: {resume_file.content_type}")
-            logger.info(f"  - Size: {resume_file.size if hasattr(resume_file, 'size') else 'Unknown'}")
-        else:
-            logger.error("❌ No resume file received")
-            raise HTTPException(status_code=422, detail="No resume file provided")
-
-        # Validate API key
-        logger.info("🔐 Validating API key...")
-        expected_key = os.getenv("API_KEY")
-        if not expected_key:
-            logger.error("❌ No API_KEY environment variable set")
-            raise HTTPException(status_code=500, detail="Server configuration error")
-
-        if x_api_key != expected_key:
-            logger.warning("🚫 Invalid API key provided")
-            raise HTTPException(status_code=401, detail="Invalid API Key")
-        logger.info("✅ API key validated")
-
-        # Read and validate file size
-        logger.info("📏 Checking file size...")
-        contents = await resume_file.read()
-        file_size = len(contents)
-        logger.info(f"📦 File size: {file_size} bytes ({file_size / 1024:.2f} KB)")
-
-        if file_size > MAX_FILE_SIZE:
-            logger.warning(f"❌ File too large: {file_size} > {MAX_FILE_SIZE}")
-            raise HTTPException(status_code=413, detail="File too large. Max 2 MB allowed.")
-
-        if file_size == 0:
-            logger.error("❌ Empty file received")
-            raise HTTPException(status_code=422, detail="Empty file received")
-
-        # Reset file pointer
-        resume_file.file.seek(0)
-
-        # Validate content type
-        logger.info("🔍 Validating content type...")
-        allowed_types = {"application/pdf", "application/x-pdf"}
-        content_type = resume_file.content_type
-        logger.info(f"📄 Received content type: {content_type}")
-
-        if not content_type or content_type.lower() not in allowed_types:
-            logger.warning(f"❌ Invalid content type: {content_type}")
-            raise HTTPException(status_code=415, detail="Only PDF uploads are accepted.")
-        logger.info("✅ Content type validated")
-
-        # Generate unique, sanitized filename (no longer supplied by client)
-        logger.info("🧹 Generating unique filename...")
-        original_filename = resume_file.filename or "resume.pdf"
-        original_filename = os.path.basename(original_filename)
-        base, ext = os.path.splitext(original_filename)
-        if ext.lower() != ".pdf":
-            ext = ".pdf"
-        unique_id = uuid.uuid4().hex
-        resume_filename = f"{base[:50]}_{unique_id}{ext}"  # truncate base to avoid overly long names
-        logger.info(f"📝 Original: {original_filename} -> Unique: {resume_filename}")
-
-        # Create full path
-        resume_path = os.path.abspath(os.path.normpath(os.path.join(UPLOAD_DIR, resume_filename)))
-        logger.info(f"💾 Save path: {resume_path}")
-
-        # Save file (synchronously, block until done)
-        logger.info("💾 Saving file (blocking)...")
-        _save_and_sync(resume_file, resume_path)
-
-        if not _wait_for_file(resume_path):
-            logger.error("❌ File save verification failed (not found or unstable size)")
-            raise HTTPException(status_code=500, detail="File save failed (verification)")
-        saved_size = os.path.getsize(resume_path)
-        logger.info(f"✅ File saved & verified ({saved_size} bytes)")
-
-        # Prepare knowledge-local copy (workaround for PDFKnowledgeSource prefix behavior)
-        knowledge_filename = os.path.basename(resume_path)
-        knowledge_path_full = os.path.join(KNOWLEDGE_DIR, knowledge_filename)
-        try:
-            shutil.copy2(resume_path, knowledge_path_full)
-            if not _wait_for_file(knowledge_path_full):
-                raise RuntimeError("knowledge copy not stable")
-            logger.info(f"📚 Copied resume into knowledge store: {knowledge_path_full}")
-            knowledge_copied = True
-        except Exception as copy_err:
-            logger.warning(f"⚠️ Could not copy file into knowledge directory ({copy_err}), falling back to original path for knowledge source")
-            knowledge_filename = os.path.basename(resume_path)
-
-        # We pass only the filename so the knowledge system (which prefixes knowledge/) doesn't duplicate the directory
-        knowledge_identifier = knowledge_filename
-
-        # Run CrewAI with fresh agent & task (stateless per request)
-        logger.info("🤖 Building fresh resume analyzer agent & task...")
-        dynamic_resume_task = build_resume_analysis_task(knowledge_identifier)
-        dynamic_resume_agent = getattr(dynamic_resume_task, 'agent', None)
-        dynamic_ats_task = build_ats_score_task(dynamic_resume_task)
-
-        agents_list = [dynamic_resume_agent, job_analyzer_agent, score_generator_agent]
-        tasks_list = [dynamic_resume_task, job_analysis_task, dynamic_ats_task]
-
-        # Diagnostics: ensure nothing is None
-        if any(a is None for a in agents_list):
-            nulls = [i for i,a in enumerate(agents_list) if a is None]
-            logger.error(f"❌ Agent build failure at indices {nulls}")
-            raise HTTPException(status_code=500, detail=f"Internal error: agent build failed (indices {nulls})")
-        if any(t is None for t in tasks_list):
-            nulls = [i for i,t in enumerate(tasks_list) if t is None]
-            logger.error(f"❌ Task build failure at indices {nulls}")
-            raise HTTPException(status_code=500, detail=f"Internal error: task build failed (indices {nulls})")
-
-        # Extra: log types for debugging
-        logger.info("🧪 Agents types: " + ", ".join(type(a).__name__ for a in agents_list))
-        logger.info("🧪 Tasks types: " + ", ".join(type(t).__name__ for t in tasks_list))
-
-        # Build embedder configuration (required for knowledge vectorization)
-        google_api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
-        if not google_api_key:
-            logger.error("❌ Missing GOOGLE_API_KEY or GEMINI_API_KEY for embedding model")
-            raise HTTPException(status_code=500, detail="Server missing Google embedding API key")
-
-        embedder_config = {
-            "provider": "google",
-            "config": {
-                "api_key": google_api_key,
-                "model": "text-embedding-004",
-            },
-        }
-        logger.info("🧬 Embedder configured: provider=google model=text-embedding-004")
-
-        crew = Crew(
-            agents=agents_list,
-            tasks=tasks_list,
-            verbose=True,
-            embedder=embedder_config,
+        logger.debug(
+            f"🚀 /run-crew: job description {len(job_description) if job_description else 0} chars, "
+            f"API key provided: {'yes' if x_api_key else 'no'}"
         )
-        result = crew.kickoff(inputs={
-            "resume_path": resume_path,
-            "job_description": job_description
-        })
-
-        logger.info("✅ CrewAI processing completed")
-        logger.info(f"📊 Result type: {type(result)}")
-
-        return result.json_dict
 
+        log_upload_details(resume_file)
+        tenant = require_api_key(x_api_key)
+        scoring_mode = validate_scoring_mode(scoring_mode)
+        idempotency_key = validate_idempotency_key(idempotency_key)
+
+        # Fast admission check before buffering and saving the upload; a retry whose
+        # result is already stored is answered without the executor
+        if await crew_executor.is_saturated() and not (
+            idempotency_key and await has_idempotent_result(tenant.name, idempotency_key)
+        ):
+            logger.warning("🚦 Review queue full, rejecting request")
+            raise queue_full_error(crew_executor.retry_after)
+
+        upload = await store_upload(resume_file)
+        key = review_key(upload.sha256, job_description, scoring_mode)
+        if idempotency_key:
+            await bind_idempotency_key(tenant.name, idempotency_key, key)
+
+        # Run the crew on the bounded worker pool so the event loop stays responsive;
+        # stored and in-flight identical reviews are reused instead
+        logger.debug("🤖 Submitting review to crew executor...")
+        # Identical requests may join this review and read the upload after this one is gone
+        owns_upload = False
+        review = await review_once(key, lambda: crew_executor.run(
+            run_review, upload.knowledge_identifier, upload.resume_path, job_description, upload.sha256,
+            scoring_mode=scoring_mode,
+        ), cleanup=partial(cleanup_upload, upload))
+        response.headers["X-Review-Source"] = review.source
+        outcome = review.outcome
+        await asyncio.to_thread(
+            index_resume, tenant.name, upload.sha256, outcome.resume_analysis if outcome is not None else None
+        )
+        if outcome is not None:
+            response.headers["Server-Timing"] = server_timing_header(outcome.timings)
+            if outcome.token_usage:
+                response.headers["X-Token-Usage"] = token_usage_header(outcome.token_usage)
+        return review.result
+
+    except QueueFullError as e:
+        logger.warning("🚦 Review queue full, rejecting request")
+        raise queue_full_error(e.retry_after)
+    except IdempotencyKeyReused:
+        raise idempotency_key_reused_error()
+    except LLMUnavailableError as e:
+        raise llm_unavailable_error(e)
+    except PipelineError as e:
+        raise HTTPException(status_code=500, detail=str(e))
     except HTTPException:
         # Re-raise HTTP exceptions (they're already logged above)
         raise
     except Exception as e:
-        logger.error(f"💥 Unexpected error in /run-crew: {str(e)}")
-        logger.exception("Full exception details:")
+        logger.exception(f"💥 Unexpected error in /run-crew: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
     finally:
         # Clean up
-        try:
-            if resume_path and os.path.exists(resume_path):
-                os.remove(resume_path)
-                logger.info(f"🗑️ Cleaned up file: {resume_path}")
-            if knowledge_copied and knowledge_path_full and os.path.exists(knowledge_path_full):
-                try:
-                    os.remove(knowledge_path_full)
-                    logger.info(f"🗑️ Cleaned up knowledge copy: {knowledge_path_full}")
-                except Exception as ke:
-                    logger.warning(f"⚠️ Failed to remove knowledge copy {knowledge_path_full}: {ke}")
-        except Exception as e:
-            logger.warning(f"⚠️ Cleanup failed: {e}")
+        if owns_upload:
+            cleanup_upload(upload)
+
+@app.get("/executor/metrics")
+async def executor_metrics():
+    """Queue depth, in-flight count and queue-wait times of the crew executor, plus stage pool usage."""
+    # Queue mode reads the shared queue from SQLite
+    return {**await asyncio.to_thread(crew_executor.stats), "stage_pools": pool_stats()}
 
 @app.get("/")
 async def root():
@@ -1,20 +1,31 @@
-from pydantic import BaseModel
-from typing import List
-
-class ResumeAnalysis(BaseModel):
-    summary: str
-    keywords: List[str]
-
-class JobAnalysis(BaseModel):
-    keywords: List[str]
-    responsibilities: List[str]
-    requirements: List[str]
-
-class CVAnalysisDetails(BaseModel):
-    strengths: str  # newline or comma separated list of strengths
-    weaknesses: str  # newline or comma separated list of weaknesses
-    summary: str
-
-class CVAnalysis(BaseModel):
-    ats_score: int
-    analysis: CVAnalysisDetails
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+class ResumeAnalysis(BaseModel):
+    summary: str
+    keywords: List[str]
+
+class JobAnalysis(BaseModel):
+    keywords: List[str]
+    responsibilities: List[str]
+    requirements: List[str]
+
+class CVAnalysisDetails(BaseModel):
+    strengths: str  # newline or comma separated list of strengths
+    weaknesses: str  # newline or comma separated list of weaknesses
+    summary: str
+
+class CVAnalysis(BaseModel):
+    ats_score: int
+    analysis: CVAnalysisDetails
+
+class ReviewJob(BaseModel):
+    job_id: str
+    tenant: Optional[str] = None  # owner; never sent to clients
+    status: str  # queued | running | succeeded | failed
+    stages: List[str] = []  # completed pipeline stages, in order
+    token_usage: Dict[str, Dict[str, int]] = {}  # {stage: {"prompt", "completion"}} plus "total"
+    result: Optional[CVAnalysis] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
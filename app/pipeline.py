@@ -0,0 +1,300 @@
+"""Staged review pipeline for a single resume / job description pair.
+
+The review runs as three stages, each a small single-agent crew:
+
+1. resume analysis  (PDF -> local text extraction -> ResumeAnalysis)
+2. job analysis     (job description -> JobAnalysis)
+3. ATS scoring      (both analyses -> CVAnalysis)
+
+Stages 1 and 2 are independent, so in the default ``parallel`` mode they run
+concurrently and scoring starts once both finish: latency is roughly the
+max of the two analyses instead of their sum. Cached analyses skip their
+stage entirely. Prompt inputs are compacted and capped by
+``app.token_budget``, which also totals the tokens each review used; malformed
+stage output is repaired locally by ``app.repair``. Stage tasks and agents come from the warm pools in
+``app.pool``, so concurrent runs never share one. Kept free of FastAPI so it can run on a worker thread or in a
+worker process.
+"""
+
+import contextvars
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, NamedTuple, Optional
+from pydantic import ValidationError
+from app.analysis_cache import (
+    get_cached_job_analysis,
+    get_cached_resume_analysis,
+    get_cached_resume_text,
+    store_job_analysis,
+    store_resume_analysis,
+    store_resume_text,
+)
+from app.extraction import clean_text, extract_pdf_text, fits_inline
+from app.log_config import CREW_VERBOSE
+from app.models import CVAnalysis, CVAnalysisDetails, JobAnalysis, ResumeAnalysis
+from app.pool import ats_feedback_pool, ats_score_pool, job_analysis_pool, resume_analysis_pool
+from app.repair import RepairError, parse_structured, record_structured_output
+from app.scoring import SCORING_MODE_HYBRID, SCORING_MODE_LOCAL, resolve_scoring_mode, score_locally
+from app.tasks.task1 import build_resume_analysis_task
+from app.telemetry import record_token_usage, span
+from app.token_budget import (
+    cap_items,
+    compact_analysis_json,
+    compact_job_description,
+    compact_resume_text,
+    count_tokens,
+    record_stage_tokens,
+    token_ledger,
+)
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "parallel").lower()  # "parallel" or "sequential"
+PIPELINE_ANALYSIS_WORKERS = int(os.getenv("PIPELINE_ANALYSIS_WORKERS", "8"))  # threads for concurrent job analyses
+
+# Stage names reported to progress callbacks and in timings.
+STAGE_RESUME_ANALYSIS = "resume_analysis"
+STAGE_JOB_ANALYSIS = "job_analysis"
+STAGE_ATS_SCORE = "ats_score"
+
+_analysis_pool: Optional[ThreadPoolExecutor] = None
+
+
+class PipelineError(RuntimeError):
+    """Raised when a stage crew cannot be assembled or returns unusable output."""
+
+
+class ReviewOutcome(NamedTuple):
+    result: dict                 # CVAnalysis JSON dict
+    timings: Dict[str, float]    # seconds per stage, plus "total"
+    resume_analysis: Optional[ResumeAnalysis] = None  # for the skill index, which lives in the API process
+    token_usage: Optional[Dict[str, Dict[str, int]]] = None  # {stage: {"prompt", "completion"}} plus "total"
+
+
+def _get_analysis_pool() -> ThreadPoolExecutor:
+    global _analysis_pool
+    if _analysis_pool is None:
+        _analysis_pool = ThreadPoolExecutor(max_workers=PIPELINE_ANALYSIS_WORKERS, thread_name_prefix="analysis")
+    return _analysis_pool
+
+
+def _run_stage_crew(stage: str, task, inputs: dict, embedder: Optional[dict] = None):
+    from crewai import Crew
+
+    agent = getattr(task, 'agent', None)
+    if agent is None:
+        logger.error(f"❌ Agent build failure for stage {stage}")
+        raise PipelineError(f"Internal error: agent build failed ({stage})")
+    crew = Crew(
+        agents=[agent],
+        tasks=[task],
+        verbose=CREW_VERBOSE,
+        embedder=embedder,
+    )
+    with span(stage):
+        output = crew.kickoff(inputs=inputs)
+    record_token_usage(stage, getattr(output, "token_usage", None))
+    record_stage_tokens(stage, getattr(output, "token_usage", None))
+    return output
+
+
+def _parse_output(stage: str, crew_output, model):
+    record_structured_output(model)
+    try:
+        return model.model_validate(crew_output.json_dict or {})
+    except ValidationError as e:
+        errors = e.error_count()
+    # The converter handed back the raw answer; one more local pass before giving up
+    try:
+        return parse_structured(crew_output.raw or "", model)
+    except RepairError:
+        logger.error(f"❌ {stage} returned invalid {model.__name__}: {errors} errors")
+        raise PipelineError(f"{stage} produced invalid output")
+
+
+def extract_resume_text(resume_path: str, resume_sha256: Optional[str] = None) -> str:
+    """Cleaned text of the resume PDF, cached by ``resume_sha256``. Empty if nothing is extractable."""
+    if resume_sha256:
+        cached = get_cached_resume_text(resume_sha256)
+        if cached is not None:
+            logger.info("⚡ Resume text cache hit, skipping PDF extraction")
+            return cached
+
+    started = time.perf_counter()
+    try:
+        with span("pdf_extraction"):
+            text = extract_pdf_text(resume_path)
+    except Exception as e:
+        logger.warning(f"⚠️ Local PDF extraction failed ({e}), falling back to knowledge source")
+        return ""
+    logger.info(
+        f"📄 Extracted {len(text)} chars ({count_tokens(text)} tokens) in {time.perf_counter() - started:.3f}s"
+    )
+    if resume_sha256:
+        store_resume_text(resume_sha256, text)
+    return text
+
+
+def analyze_resume(knowledge_identifier: str, resume_path: str, resume_sha256: Optional[str] = None) -> ResumeAnalysis:
+    """Stage 1: parse the resume PDF, or return the cached analysis for ``resume_sha256``.
+
+    The locally extracted text goes straight into the prompt; knowledge-source
+    RAG (PDF chunking + embeddings) is only used when it does not fit or the
+    PDF has no extractable text.
+    """
+    if resume_sha256:
+        cached = get_cached_resume_analysis(resume_sha256)
+        if cached is not None:
+            logger.info("⚡ Resume analysis cache hit, skipping resume analyzer agent")
+            return cached
+
+    resume_text = compact_resume_text(extract_resume_text(resume_path, resume_sha256))
+    if fits_inline(resume_text):
+        logger.debug("📝 Resume text injected into the prompt, no knowledge source")
+        with resume_analysis_pool.checkout() as task:
+            output = _run_stage_crew(
+                STAGE_RESUME_ANALYSIS, task, {"resume_path": resume_path, "resume_text": resume_text}
+            )
+    else:
+        # The embedding stack (chromadb, crewai RAG) is only loaded for the rare oversized resume
+        from app.embeddings import EMBEDDER_MODEL, build_embedder_config
+
+        embedder_config = build_embedder_config(resume_sha256)
+        if embedder_config is None:
+            logger.error("❌ Missing GOOGLE_API_KEY or GEMINI_API_KEY for embedding model")
+            raise PipelineError("Server missing Google embedding API key")
+        logger.debug(f"🧬 Embedder configured: provider=google model={EMBEDDER_MODEL}")
+        # Fresh agent & task: the knowledge source is bound to this PDF
+        logger.debug("🤖 Building fresh resume analyzer agent & task...")
+        task = build_resume_analysis_task(knowledge_identifier)
+        output = _run_stage_crew(STAGE_RESUME_ANALYSIS, task, {"resume_path": resume_path}, embedder=embedder_config)
+    analysis = _parse_output(STAGE_RESUME_ANALYSIS, output, ResumeAnalysis)
+    if resume_sha256:
+        store_resume_analysis(resume_sha256, analysis)
+    return analysis
+
+
+def analyze_job(job_description: str) -> JobAnalysis:
+    """Stage 2: parse the job description, or return the cached analysis for identical postings.
+
+    The posting is compacted first (``app.token_budget``), so copies that only
+    differ in whitespace or boilerplate share one cache entry.
+    """
+    job_description = compact_job_description(clean_text(job_description))
+    cached = get_cached_job_analysis(job_description)
+    if cached is not None:
+        logger.info("⚡ Job analysis cache hit, skipping job analyzer agent")
+        return cached
+
+    with job_analysis_pool.checkout() as task:
+        output = _run_stage_crew(STAGE_JOB_ANALYSIS, task, {"job_description": job_description})
+    analysis = _parse_output(STAGE_JOB_ANALYSIS, output, JobAnalysis)
+    store_job_analysis(job_description, analysis)
+    return analysis
+
+
+def score_review(resume_analysis: ResumeAnalysis, job_analysis: JobAnalysis, scoring_mode: Optional[str] = None) -> dict:
+    """Stage 3: ATS score from both analyses, returned as the CVAnalysis JSON dict.
+
+    ``scoring_mode`` picks who scores (see ``app.scoring``): the LLM, the local
+    engine, or the local engine with LLM-written feedback.
+    """
+    mode = resolve_scoring_mode(scoring_mode)
+    if mode == SCORING_MODE_LOCAL:
+        return score_locally(resume_analysis, job_analysis).to_cv_analysis().model_dump()
+
+    if mode == SCORING_MODE_HYBRID:
+        local = score_locally(resume_analysis, job_analysis)
+        matched = cap_items(item for section in local.sections.values() for item in section.matched)
+        missing = cap_items(item for section in local.sections.values() for item in section.missing)
+        # The matched/missing job items already carry the job side; the resume only adds its summary
+        with ats_feedback_pool.checkout() as task:
+            output = _run_stage_crew(
+                STAGE_ATS_SCORE,
+                task,
+                {
+                    "ats_score": local.ats_score,
+                    "matched_items": "; ".join(matched) or "none",
+                    "missing_items": "; ".join(missing) or "none",
+                    "resume_analysis_json": compact_analysis_json(resume_analysis, ("summary",)),
+                },
+            )
+        feedback = _parse_output(STAGE_ATS_SCORE, output, CVAnalysisDetails)
+        return CVAnalysis(ats_score=local.ats_score, analysis=feedback).model_dump()
+
+    analyses = {
+        "resume_analysis_json": compact_analysis_json(resume_analysis, ("summary", "keywords")),
+        "job_analysis_json": compact_analysis_json(job_analysis, ("keywords", "responsibilities", "requirements")),
+    }
+    with ats_score_pool.checkout() as task:
+        output = _run_stage_crew(STAGE_ATS_SCORE, task, analyses)
+    return _parse_output(STAGE_ATS_SCORE, output, CVAnalysis).model_dump()
+
+
+def _timed(stage: str, timings: Dict[str, float], progress: Optional[Callable[[str], None]], fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    timings[stage] = time.perf_counter() - started
+    if progress is not None:
+        try:
+            progress(stage)
+        except Exception as e:
+            logger.warning(f"⚠️ Progress callback failed for stage {stage}: {e}")
+    return result
+
+
+def run_review(
+    knowledge_identifier: str,
+    resume_path: str,
+    job_description: str,
+    resume_sha256: Optional[str] = None,
+    progress: Optional[Callable[[str], None]] = None,
+    scoring_mode: Optional[str] = None,
+) -> ReviewOutcome:
+    """Run the three stages for one review and return the CVAnalysis dict with stage timings.
+
+    ``resume_sha256`` (hash of the uploaded bytes) enables the resume caches.
+    ``progress`` is called with each stage name as it completes.
+    ``scoring_mode`` overrides ``SCORING_MODE`` for the ATS stage. Token usage
+    per stage (prompt + completion) is returned with the result. Blocking;
+    callers on the event loop must go through ``app.executor``.
+    """
+    scoring_mode = resolve_scoring_mode(scoring_mode)
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+
+    with token_ledger() as ledger:
+        if PIPELINE_MODE == "sequential":
+            resume_analysis = _timed(
+                STAGE_RESUME_ANALYSIS, timings, progress,
+                analyze_resume, knowledge_identifier, resume_path, resume_sha256,
+            )
+            job_analysis = _timed(STAGE_JOB_ANALYSIS, timings, progress, analyze_job, job_description)
+        else:
+            # The job analysis runs on the pool while this thread analyzes the resume.
+            # If the resume stage fails the job analysis still finishes and warms the cache.
+            job_future = _get_analysis_pool().submit(
+                contextvars.copy_context().run,
+                _timed, STAGE_JOB_ANALYSIS, timings, progress, analyze_job, job_description,
+            )
+            resume_analysis = _timed(
+                STAGE_RESUME_ANALYSIS, timings, progress,
+                analyze_resume, knowledge_identifier, resume_path, resume_sha256,
+            )
+            job_analysis = job_future.result()
+
+        result = _timed(STAGE_ATS_SCORE, timings, progress, score_review, resume_analysis, job_analysis, scoring_mode)
+    timings["total"] = time.perf_counter() - started
+
+    logger.info(
+        f"⏱️ Stage timings ({PIPELINE_MODE}, scoring={scoring_mode}): "
+        + ", ".join(f"{stage}={seconds:.2f}s" for stage, seconds in timings.items())
+    )
+    token_usage = ledger.summary()
+    logger.info(
+        "🪙 Tokens (prompt+completion): "
+        + ", ".join(f"{stage}={entry['prompt']}+{entry['completion']}" for stage, entry in token_usage.items())
+    )
+    return ReviewOutcome(result, timings, resume_analysis, token_usage)
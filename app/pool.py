@@ -0,0 +1,162 @@
+"""Warm pools of pre-built stage tasks, each with its own agent and LLM.
+
+A crew run mutates its task (output, timings, counters) and agent (crew,
+executor, knowledge context), so two concurrent runs must never share them.
+Each pipeline stage therefore has a ``TaskPool``: a run checks out a task
+for exclusive use, and the task and its agent are reset before going back.
+Pools are filled at startup (``warm_pools``); when every task is busy an
+extra one is built instead of waiting, and only ``size`` are kept idle.
+A task whose run raised is dropped rather than reused.
+
+All LLMs share the HTTP connection pool from ``app.llm_http``.
+"""
+
+import logging
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, Iterator
+from app.executor import CREW_MAX_WORKERS
+from app.tasks.task1 import build_resume_analysis_task
+from app.tasks.task2 import build_job_analysis_task
+from app.tasks.task3 import build_ats_feedback_task, build_ats_score_task
+
+if TYPE_CHECKING:
+    from crewai import Task
+
+logger = logging.getLogger(__name__)
+
+# Idle tasks kept per stage; a stage never runs more than CREW_MAX_WORKERS at once.
+PIPELINE_POOL_SIZE = int(os.getenv("PIPELINE_POOL_SIZE", str(CREW_MAX_WORKERS)))
+
+# Per-run state CrewAI leaves on tasks and agents, and the value it starts from.
+_TASK_RUN_STATE = {
+    "output": None,
+    "start_time": None,
+    "end_time": None,
+    "prompt_context": None,
+    "retry_count": 0,
+    "tools_errors": 0,
+    "delegations": 0,
+    "used_tools": 0,
+}
+_AGENT_RUN_STATE = {
+    "crew": None,
+    "agent_executor": None,
+    "knowledge_search_query": None,
+    "agent_knowledge_context": None,
+    "crew_knowledge_context": None,
+}
+
+
+def reset_task(task: "Task"):
+    """Return a task and its agent to their pre-run state."""
+    from crewai.agents.agent_builder.utilities.base_token_process import TokenProcess
+
+    for name, value in _TASK_RUN_STATE.items():
+        if hasattr(task, name):
+            setattr(task, name, value)
+    task.processed_by_agents = set()
+    agent = task.agent
+    if agent is not None:
+        for name, value in _AGENT_RUN_STATE.items():
+            if hasattr(agent, name):
+                setattr(agent, name, value)
+        agent.tools_results = []
+        # Token counts accumulate per agent; a fresh counter keeps each crew's token_usage to its own run
+        agent._token_process = TokenProcess()
+
+
+class TaskPool:
+    """Thread-safe pool of interchangeable tasks built by ``factory``."""
+
+    def __init__(self, name: str, factory: Callable[[], "Task"], size: int = PIPELINE_POOL_SIZE):
+        self.name = name
+        self._factory = factory
+        self.size = max(1, size)
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._built = 0
+        self._checkouts = 0
+        self._misses = 0
+        self._discarded = 0
+        self._in_use = 0
+
+    def _build(self) -> "Task":
+        task = self._factory()
+        with self._lock:
+            self._built += 1
+        return task
+
+    def warm(self):
+        """Build tasks until ``size`` are idle."""
+        while True:
+            with self._lock:
+                if len(self._idle) + self._in_use >= self.size:
+                    return
+            task = self._build()
+            with self._lock:
+                self._idle.append(task)
+
+    @contextmanager
+    def checkout(self) -> Iterator["Task"]:
+        with self._lock:
+            task = self._idle.pop() if self._idle else None
+            self._checkouts += 1
+            self._in_use += 1
+            if task is None:
+                self._misses += 1
+        if task is None:
+            logger.info(f"🧰 {self.name} pool empty, building an extra task")
+            task = self._build()
+
+        healthy = False
+        try:
+            yield task
+            healthy = True
+        finally:
+            keep = False
+            if healthy:
+                try:
+                    reset_task(task)
+                    keep = True
+                except Exception as e:
+                    logger.warning(f"⚠️ Could not reset pooled {self.name} task ({e}), dropping it")
+            with self._lock:
+                self._in_use -= 1
+                if keep and len(self._idle) < self.size:
+                    self._idle.append(task)
+                else:
+                    self._discarded += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "built": self._built,
+                "checkouts": self._checkouts,
+                "misses": self._misses,
+                "discarded": self._discarded,
+            }
+
+
+# The RAG resume task is built per run because its knowledge source is bound to one PDF.
+resume_analysis_pool = TaskPool("resume_analysis", build_resume_analysis_task)
+job_analysis_pool = TaskPool("job_analysis", build_job_analysis_task)
+ats_score_pool = TaskPool("ats_score", build_ats_score_task)
+ats_feedback_pool = TaskPool("ats_feedback", build_ats_feedback_task)
+
+_POOLS = (resume_analysis_pool, job_analysis_pool, ats_score_pool, ats_feedback_pool)
+
+
+def warm_pools():
+    for pool in _POOLS:
+        pool.warm()
+    logger.info(f"🧰 Stage pools warm ({PIPELINE_POOL_SIZE} tasks per stage)")
+
+
+def pool_stats() -> Dict[str, dict]:
+    return {pool.name: pool.stats() for pool in _POOLS}
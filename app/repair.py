@@ -0,0 +1,336 @@
+"""Local repair of malformed structured output from the LLM.
+
+CrewAI validates each stage's final answer against the task's pydantic
+model and, when that fails, asks the LLM to convert its own answer again:
+another full round trip. Most failures are mechanical, so
+``RepairingConverter`` (set as ``converter_cls`` on every stage task) first
+tries, in order:
+
+1. syntax repair: markdown fences and text around the JSON are dropped;
+   comments, trailing commas, Python literals, single or smart quotes,
+   unquoted keys, missing commas and unclosed brackets are fixed;
+2. coercion against the model: keys are matched case-insensitively, lists
+   joined where a string is expected (``CVAnalysisDetails.strengths``),
+   strings split where a list is expected, scores like ``"85/100"`` read as
+   ints, and fields of a nested model found at the top level moved into it.
+
+Only when both fail is the LLM re-asked, at most ``STRUCTURED_OUTPUT_MAX_REASKS``
+times. ``structured_outputs_total`` and ``structured_output_repairs_total``
+give the repair and re-ask rates.
+"""
+
+import json
+import logging
+import os
+import re
+from functools import lru_cache
+from typing import Any, List, Type, Union, get_args, get_origin
+from pydantic import BaseModel, ValidationError
+from app.telemetry import Counter
+
+logger = logging.getLogger(__name__)
+
+STRUCTURED_OUTPUT_MAX_REASKS = int(os.getenv("STRUCTURED_OUTPUT_MAX_REASKS", "1"))  # LLM conversions after local repair fails
+
+STRUCTURED_OUTPUTS = Counter("structured_outputs_total", "Structured stage outputs parsed.", ["schema"])
+STRUCTURED_OUTPUT_REPAIRS = Counter(
+    "structured_output_repairs_total",
+    "Stage outputs that failed validation, by how they were resolved (repaired | reasked | failed).",
+    ["schema", "outcome"],
+)
+
+_FENCE_RE = re.compile(r"```[a-zA-Z]*\s*\n?(.*?)```", re.DOTALL)
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+_LIST_SPLIT_RE = re.compile(r"\s*(?:\n|;)\s*")
+_BULLET_RE = re.compile(r"^(?:[-*•]|\d+[.)])\s+")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+class RepairError(ValueError):
+    """Output that neither parses nor coerces into the expected model."""
+
+
+def _extract_json(text: str) -> str:
+    """The outermost JSON object or array in ``text``, unclosed if the text was cut off."""
+    if "Final Answer:" in text:
+        text = text.rsplit("Final Answer:", 1)[1]
+    fenced = _FENCE_RE.search(text)
+    if fenced and ("{" in fenced.group(1) or "[" in fenced.group(1)):
+        text = fenced.group(1)
+    elif text.lstrip().startswith("```"):
+        # Opening fence without a closing one: the answer was cut off
+        text = text.lstrip()[3:].lstrip("jsonJSON")
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise RepairError("no JSON object in output")
+    start = min(starts)
+    depth, quote, escaped = 0, None, False
+    for i in range(start, len(text)):
+        char = text[i]
+        if quote:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+def _next_significant(text: str, i: int) -> str:
+    while i < len(text) and text[i].isspace():
+        i += 1
+    return text[i] if i < len(text) else ""
+
+
+def _normalize(text: str) -> str:
+    """Rewrite near-JSON into JSON: see the module docstring for what is fixed."""
+    text = text.translate(_SMART_QUOTES)
+    out: List[str] = []
+    stack: List[str] = []
+    i, n = 0, len(text)
+    while i < n:
+        char = text[i]
+        if char in "\"'":
+            # Copy the string, re-quoted with double quotes
+            quote, i = char, i + 1
+            chars = []
+            while i < n and text[i] != quote:
+                if text[i] == "\\" and i + 1 < n:
+                    escaped = text[i + 1]
+                    chars.append(escaped if escaped == "'" else "\\" + escaped)
+                    i += 2
+                    continue
+                if text[i] == '"':
+                    chars.append('\\"')
+                elif text[i] == "\n":
+                    chars.append("\\n")
+                else:
+                    chars.append(text[i])
+                i += 1
+            out.append('"' + "".join(chars) + '"')
+            i += 1
+            if _next_significant(text, i) in ("\"", "'", "{", "["):
+                out.append(",")
+            continue
+        if text.startswith("//", i) or char == "#":
+            while i < n and text[i] != "\n":
+                i += 1
+            continue
+        if text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            continue
+        if char == ",":
+            if _next_significant(text, i + 1) not in ("}", "]", ""):
+                out.append(char)
+            i += 1
+            continue
+        if char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if stack:
+                stack.pop()
+            out.append(char)
+            i += 1
+            if _next_significant(text, i) in ("\"", "'", "{", "["):
+                out.append(",")
+            continue
+        if char.isalpha() or char == "_":
+            j = i
+            while j < n and (text[j].isalnum() or text[j] in "_-"):
+                j += 1
+            word = text[i:j]
+            if _next_significant(text, j) == ":":
+                out.append(json.dumps(word))  # unquoted key
+            else:
+                out.append(_LITERALS.get(word, word))
+            i = j
+            continue
+        out.append(char)
+        i += 1
+    # Cut off mid-answer: drop a dangling separator and close what is open
+    while out and out[-1].strip() in (",", ":", ""):
+        out.pop()
+    return "".join(out) + "".join(reversed(stack))
+
+
+def repair_json(text: str) -> Any:
+    """Parse JSON from a raw LLM answer, repairing its syntax when needed. Raises ``RepairError``."""
+    candidate = _extract_json(text or "")
+    try:
+        return json.loads(candidate, strict=False)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(_normalize(candidate), strict=False)
+    except json.JSONDecodeError as e:
+        raise RepairError(f"unrepairable JSON: {e.msg}") from e
+
+
+def _field_key(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", str(name).strip().lower()).strip("_")
+
+
+def _unwrap_optional(annotation):
+    if get_origin(annotation) is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+def _is_model(annotation) -> bool:
+    return isinstance(annotation, type) and issubclass(annotation, BaseModel)
+
+
+def _as_text(value: Any) -> str:
+    if isinstance(value, list):
+        return "; ".join(_as_text(item) for item in value if item not in (None, ""))
+    if isinstance(value, dict):
+        return "; ".join(f"{key}: {_as_text(item)}" for key, item in value.items())
+    return "" if value is None else str(value)
+
+
+def _as_list(value: Any) -> List[str]:
+    if isinstance(value, str):
+        parts = _LIST_SPLIT_RE.split(value.strip())
+        if len(parts) == 1:
+            parts = value.split(",")
+        return [_BULLET_RE.sub("", part.strip()) for part in parts if part.strip()]
+    if isinstance(value, dict):
+        return [_as_text(item) for item in value.values()]
+    if isinstance(value, list):
+        return [_as_text(item) for item in value if item not in (None, "")]
+    return [] if value is None else [str(value)]
+
+
+def _coerce_value(value: Any, annotation) -> Any:
+    annotation = _unwrap_optional(annotation)
+    if _is_model(annotation):
+        return coerce_to_model(value, annotation)
+    if annotation is str:
+        return value if isinstance(value, str) else _as_text(value)
+    if annotation is int and not isinstance(value, bool):
+        if isinstance(value, float):
+            return round(value)
+        if isinstance(value, str):
+            # "85", "85/100", "85%", "Score: 85"
+            number = _NUMBER_RE.search(value)
+            return round(float(number.group(0))) if number else value
+        return value
+    if get_origin(annotation) in (list, List) and get_args(annotation) == (str,):
+        return _as_list(value)
+    return value
+
+
+def coerce_to_model(data: Any, model: Type[BaseModel]) -> dict:
+    """``data`` reshaped towards ``model``'s fields; validation is left to the caller."""
+    if isinstance(data, list) and len(data) == 1:
+        data = data[0]
+    if not isinstance(data, dict):
+        return data
+    values = {_field_key(key): value for key, value in data.items()}
+    if len(model.model_fields) > 1 and len(values) == 1:
+        # {"CVAnalysis": {...}} style wrapper around the actual answer
+        (key, inner), = values.items()
+        if isinstance(inner, dict) and key not in model.model_fields:
+            values = {_field_key(k): v for k, v in inner.items()}
+    coerced = {}
+    for name, field in model.model_fields.items():
+        annotation = _unwrap_optional(field.annotation)
+        if name in values:
+            coerced[name] = _coerce_value(values[name], annotation)
+        elif _is_model(annotation) and any(key in values for key in annotation.model_fields):
+            # Fields of a nested model given at the top level
+            coerced[name] = coerce_to_model(values, annotation)
+    return coerced
+
+
+def parse_structured(text: str, model: Type[BaseModel]) -> BaseModel:
+    """``text`` as an instance of ``model``, repaired and coerced locally. Raises ``RepairError``."""
+    data = repair_json(text)
+    try:
+        return model.model_validate(data)
+    except ValidationError:
+        pass
+    try:
+        return model.model_validate(coerce_to_model(data, model))
+    except ValidationError as e:
+        raise RepairError(f"{e.error_count()} fields still invalid after coercion") from e
+
+
+def record_structured_output(model: Type[BaseModel]):
+    STRUCTURED_OUTPUTS.inc(schema=model.__name__)
+
+
+def repair_stats() -> dict:
+    """Structured outputs parsed and how many needed repair, a re-ask or failed, over all schemas."""
+    stats = {"outputs": sum(sample.value for sample in STRUCTURED_OUTPUTS.collect().samples)}
+    for outcome in ("repaired", "reasked", "failed"):
+        stats[outcome] = 0
+    for sample in STRUCTURED_OUTPUT_REPAIRS.collect().samples:
+        stats[sample.labels["outcome"]] += sample.value
+    return {key: int(value) for key, value in stats.items()}
+
+
+@lru_cache(maxsize=None)
+def repairing_converter_class() -> type:
+    """``RepairingConverter``, defined on first use: subclassing CrewAI's ``Converter`` imports all of crewai."""
+    from crewai.utilities.converter import Converter, ConverterError
+
+    class RepairingConverter(Converter):
+        """CrewAI output converter that repairs locally and re-asks the LLM only as a last resort."""
+
+        def _convert(self) -> BaseModel:
+            schema = self.model.__name__
+            try:
+                result = parse_structured(self.text, self.model)
+                STRUCTURED_OUTPUT_REPAIRS.inc(schema=schema, outcome="repaired")
+                logger.info(f"🩹 Repaired {schema} output locally")
+                return result
+            except RepairError as e:
+                error = e
+            for attempt in range(STRUCTURED_OUTPUT_MAX_REASKS):
+                logger.warning(f"⚠️ {schema} output not repairable ({error}), asking the LLM to convert it")
+                try:
+                    response = self.llm.call([
+                        {"role": "system", "content": self.instructions},
+                        {"role": "user", "content": self.text},
+                    ])
+                    result = parse_structured(response if isinstance(response, str) else json.dumps(response), self.model)
+                    STRUCTURED_OUTPUT_REPAIRS.inc(schema=schema, outcome="reasked")
+                    return result
+                except RepairError as e:
+                    error = e
+            STRUCTURED_OUTPUT_REPAIRS.inc(schema=schema, outcome="failed")
+            raise ConverterError(f"Failed to convert output into {schema}: {error}")
+
+        def to_pydantic(self, current_attempt=1) -> BaseModel:
+            return self._convert()
+
+        def to_json(self, current_attempt=1) -> Union[dict, ConverterError]:
+            # CrewAI falls back to the raw text when given a ConverterError
+            try:
+                return self._convert().model_dump()
+            except ConverterError as e:
+                return e
+
+    # Found again through the module __getattr__ below, so the class pickles like a module-level one
+    RepairingConverter.__qualname__ = "RepairingConverter"
+    return RepairingConverter
+
+
+def __getattr__(name):
+    if name == "RepairingConverter":
+        return repairing_converter_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,413 @@
+"""Durable review results, idempotency keys and single-flight deduplication.
+
+A finished review is stored under ``review_key``: the upload hash plus a hash
+of the normalized job description, the scoring mode and every model and
+prompt version that shaped the result. Asking for the same review again
+returns the stored ``CVAnalysis`` without running a crew, and identical
+requests that arrive while one is still running wait for it instead of
+starting their own (``SingleFlight``).
+
+Clients may also send an ``Idempotency-Key`` header. The key is bound, per
+tenant, to the review it first came with; reusing it for a different resume
+or job description is refused.
+
+``RESULT_STORE_URL`` selects the backend: ``sqlite:///path/to/results.db``
+(default, shared by every worker on the host) or ``memory://``. Results are
+kept for ``RESULT_TTL_SECONDS`` and idempotency keys for
+``IDEMPOTENCY_KEY_TTL``; expired entries are swept on the first write and
+every ``RESULT_PURGE_EVERY`` writes after it, and ``DELETE /resumes/{sha256}``
+removes both early. The request-path helpers (``stored_review``,
+``review_once``, ...) run the store in a worker thread, off the event loop.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+from app.agents.agent1 import RESUME_ANALYZER_MODEL
+from app.agents.agent2 import JOB_ANALYZER_MODEL
+from app.agents.agent3 import SCORE_GENERATOR_MODEL
+from app.analysis_cache import normalize_job_description
+from app.extraction import EXTRACTOR_VERSION
+from app.tasks.task1 import RESUME_ANALYSIS_PROMPT_VERSION
+from app.tasks.task2 import JOB_ANALYSIS_PROMPT_VERSION
+from app.tasks.task3 import ATS_PROMPT_VERSION
+from app.telemetry import Counter
+
+logger = logging.getLogger(__name__)
+
+RESULT_STORE_URL = os.getenv("RESULT_STORE_URL", "sqlite:///data/results.db")
+RESULT_TTL_SECONDS = int(os.getenv("RESULT_TTL_SECONDS", str(30 * 24 * 3600)))  # stored reviews are deleted after this
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", str(24 * 3600)))
+RESULT_PURGE_EVERY = int(os.getenv("RESULT_PURGE_EVERY", "100"))  # writes between sweeps of expired entries
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+SOURCE_COMPUTED = "computed"    # this request ran the pipeline
+SOURCE_STORED = "stored"        # answered from the result store
+SOURCE_COALESCED = "coalesced"  # waited for an identical request already running
+
+REVIEW_RESULTS = Counter("review_results_total", "Review answers by where they came from.", ["source"])
+
+# Everything besides the inputs that changes what a review returns
+_RESULT_VERSION = "\n".join((
+    EXTRACTOR_VERSION,
+    RESUME_ANALYZER_MODEL, RESUME_ANALYSIS_PROMPT_VERSION,
+    JOB_ANALYZER_MODEL, JOB_ANALYSIS_PROMPT_VERSION,
+    SCORE_GENERATOR_MODEL, ATS_PROMPT_VERSION,
+))
+
+
+class IdempotencyKeyReused(Exception):
+    """The idempotency key is already bound to a different review."""
+
+
+def review_key(resume_sha256: str, job_description: str, scoring_mode: str) -> str:
+    # The upload hash leads the key so a resume's results can be deleted by prefix.
+    payload = "\n".join((_RESULT_VERSION, scoring_mode, normalize_job_description(job_description)))
+    return f"{resume_sha256}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+def idempotency_scope(tenant: str, idempotency_key: str) -> str:
+    return f"{tenant}:{idempotency_key}"
+
+
+class ResultStore(ABC):
+    """Interface every result backend implements. All methods are thread-safe."""
+
+    def __init__(self, ttl_seconds: int = RESULT_TTL_SECONDS, key_ttl_seconds: int = IDEMPOTENCY_KEY_TTL):
+        self.ttl_seconds = ttl_seconds
+        self.key_ttl_seconds = key_ttl_seconds
+        self.purge_every = max(1, RESULT_PURGE_EVERY)
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+    def _purge_due(self) -> bool:
+        """Count a write; true on the first one and every ``purge_every`` after it."""
+        with self._writes_lock:
+            self._writes += 1
+            return self._writes % self.purge_every == 1 % self.purge_every
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[dict]:
+        """The stored result for ``key``, if any and not expired."""
+
+    @abstractmethod
+    def put(self, key: str, result: dict):
+        ...
+
+    @abstractmethod
+    def bind_idempotency_key(self, scope: str, key: str) -> str:
+        """Bind ``scope`` to ``key`` unless already bound; returns the review it is bound to."""
+
+    @abstractmethod
+    def idempotent_key(self, scope: str) -> Optional[str]:
+        """The review ``scope`` is bound to, if any."""
+
+    @abstractmethod
+    def purge_expired(self):
+        ...
+
+    @abstractmethod
+    def purge_resume(self, resume_sha256: str) -> int:
+        """Delete every result and idempotency key for this upload; returns the number removed."""
+
+
+class InMemoryResultStore(ResultStore):
+    def __init__(self, ttl_seconds: int = RESULT_TTL_SECONDS, key_ttl_seconds: int = IDEMPOTENCY_KEY_TTL):
+        super().__init__(ttl_seconds, key_ttl_seconds)
+        self._lock = threading.Lock()
+        self._results: Dict[str, Tuple[float, dict]] = {}  # key -> (stored_at, result)
+        self._keys: Dict[str, Tuple[float, str]] = {}      # scope -> (bound_at, key)
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._results.get(key)
+        if entry is None or (self.ttl_seconds and entry[0] < time.time() - self.ttl_seconds):
+            return None
+        return entry[1]
+
+    def put(self, key: str, result: dict):
+        with self._lock:
+            self._results[key] = (time.time(), result)
+        if self._purge_due():
+            self.purge_expired()
+
+    def bind_idempotency_key(self, scope: str, key: str) -> str:
+        now = time.time()
+        with self._lock:
+            entry = self._keys.get(scope)
+            if entry is None or entry[0] < now - self.key_ttl_seconds:
+                self._keys[scope] = entry = (now, key)
+            return entry[1]
+
+    def idempotent_key(self, scope: str) -> Optional[str]:
+        with self._lock:
+            entry = self._keys.get(scope)
+        if entry is None or entry[0] < time.time() - self.key_ttl_seconds:
+            return None
+        return entry[1]
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            if self.ttl_seconds:
+                for key in [k for k, (stored_at, _) in self._results.items() if stored_at < now - self.ttl_seconds]:
+                    del self._results[key]
+            for scope in [s for s, (bound_at, _) in self._keys.items() if bound_at < now - self.key_ttl_seconds]:
+                del self._keys[scope]
+
+    def purge_resume(self, resume_sha256: str) -> int:
+        prefix = f"{resume_sha256}:"
+        with self._lock:
+            results = [k for k in self._results if k.startswith(prefix)]
+            scopes = [s for s, (_, key) in self._keys.items() if key.startswith(prefix)]
+            for key in results:
+                del self._results[key]
+            for scope in scopes:
+                del self._keys[scope]
+        return len(results) + len(scopes)
+
+
+class SQLiteResultStore(ResultStore):
+    """Results persisted in SQLite so they survive restarts and are shared by every worker."""
+
+    def __init__(self, path: str, ttl_seconds: int = RESULT_TTL_SECONDS, key_ttl_seconds: int = IDEMPOTENCY_KEY_TTL):
+        super().__init__(ttl_seconds, key_ttl_seconds)
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS review_results ("
+                "key TEXT PRIMARY KEY, result TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS idempotency_keys ("
+                "scope TEXT PRIMARY KEY, key TEXT NOT NULL, bound_at REAL NOT NULL)"
+            )
+            # The expiry sweeps range over these
+            conn.execute("CREATE INDEX IF NOT EXISTS review_results_stored_at ON review_results (stored_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idempotency_keys_bound_at ON idempotency_keys (bound_at)")
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation keeps the store safe across threads and processes.
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[dict]:
+        cutoff = time.time() - self.ttl_seconds if self.ttl_seconds else 0
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT result FROM review_results WHERE key = ? AND stored_at >= ?", (key, cutoff)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, result: dict):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO review_results (key, result, stored_at) VALUES (?, ?, ?)",
+                (key, json.dumps(result), time.time()),
+            )
+        if self._purge_due():
+            self.purge_expired()
+
+    def bind_idempotency_key(self, scope: str, key: str) -> str:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM idempotency_keys WHERE scope = ? AND bound_at < ?", (scope, now - self.key_ttl_seconds))
+            conn.execute(
+                "INSERT OR IGNORE INTO idempotency_keys (scope, key, bound_at) VALUES (?, ?, ?)", (scope, key, now)
+            )
+            return conn.execute("SELECT key FROM idempotency_keys WHERE scope = ?", (scope,)).fetchone()[0]
+
+    def idempotent_key(self, scope: str) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT key FROM idempotency_keys WHERE scope = ? AND bound_at >= ?",
+                (scope, time.time() - self.key_ttl_seconds),
+            ).fetchone()
+        return row[0] if row else None
+
+    def purge_expired(self):
+        now = time.time()
+        with self._connect() as conn:
+            if self.ttl_seconds:
+                conn.execute("DELETE FROM review_results WHERE stored_at < ?", (now - self.ttl_seconds,))
+            conn.execute("DELETE FROM idempotency_keys WHERE bound_at < ?", (now - self.key_ttl_seconds,))
+
+    def purge_resume(self, resume_sha256: str) -> int:
+        prefix = f"{resume_sha256}:"
+        with self._connect() as conn:
+            removed = conn.execute(
+                "DELETE FROM review_results WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            ).rowcount
+            removed += conn.execute(
+                "DELETE FROM idempotency_keys WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            ).rowcount
+        return removed
+
+
+def build_result_store(url: str = RESULT_STORE_URL) -> ResultStore:
+    """Create the result store described by ``url`` (``sqlite:///path`` or ``memory://``)."""
+    if url.startswith("sqlite:///"):
+        path = url[len("sqlite:///"):]
+        logger.info(f"🗄️ Using SQLite result store at {path}")
+        return SQLiteResultStore(path)
+    if url in ("", "memory://"):
+        return InMemoryResultStore()
+    raise ValueError(f"Unsupported RESULT_STORE_URL: {url}")
+
+
+result_store = build_result_store()
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key onto one execution. Event-loop only."""
+
+    def __init__(self):
+        self._calls: Dict[str, _Flight] = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._calls.get(key) is flight:
+            del self._calls[key]
+
+    async def do(
+        self, key: str, fn: Callable[[], Awaitable[Any]], cleanup: Optional[Callable[[], None]] = None
+    ) -> Tuple[Any, bool]:
+        """(``fn()``'s result, whether it came from a call already in flight). Errors reach every caller.
+
+        ``fn()`` runs as its own task, so the caller that started it may give up without
+        cancelling the others; it is cancelled only once every caller has given up.
+        ``cleanup`` releases what ``fn`` reads: it runs when the flight this call started
+        is done, however its callers fared, or at once when the call joins one in flight.
+        """
+        flight = self._calls.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._calls[key] = flight
+
+            def done(task, flight=flight):
+                self._forget(key, flight)
+                if cleanup is not None:
+                    cleanup()
+                # Nobody may be waiting; retrieve the exception so asyncio does not log it as lost
+                task.cancelled() or task.exception()
+
+            flight.task.add_done_callback(done)
+        elif cleanup is not None:
+            cleanup()
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), shared
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # The last caller gave up: nobody needs the result any more
+                self._forget(key, flight)
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+
+_in_flight = SingleFlight()
+
+
+class ReviewResult(NamedTuple):
+    result: dict              # CVAnalysis JSON
+    source: str               # SOURCE_COMPUTED | SOURCE_STORED | SOURCE_COALESCED
+    outcome: Optional[Any]    # the pipeline's ReviewOutcome, only when this request computed it
+
+
+async def stored_review(key: str) -> Optional[dict]:
+    """The stored result for ``key``, counted as a store hit. Store errors count as a miss."""
+    try:
+        stored = await asyncio.to_thread(result_store.get, key)
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ Review result store read failed: {e}")
+        return None
+    if stored is not None:
+        REVIEW_RESULTS.inc(source=SOURCE_STORED)
+        logger.info("⚡ Review result store hit, skipping the pipeline")
+    return stored
+
+
+async def review_once(
+    key: str, run: Callable[[], Awaitable[Any]], cleanup: Optional[Callable[[], None]] = None
+) -> ReviewResult:
+    """The stored result for ``key``, the result of an identical review in flight, or ``run()``'s, stored.
+
+    ``cleanup`` (deleting the upload ``run`` reads) is called exactly once, when nothing
+    needs it any more: if this call started the review, only after the review finished,
+    even when this caller gave up first while others still wait for the result.
+    """
+    try:
+        stored = await stored_review(key)
+    except BaseException:
+        if cleanup is not None:
+            cleanup()
+        raise
+    if stored is not None:
+        if cleanup is not None:
+            cleanup()
+        return ReviewResult(stored, SOURCE_STORED, None)
+
+    async def compute():
+        outcome = await run()
+        try:
+            await asyncio.to_thread(result_store.put, key, outcome.result)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Review result store write failed: {e}")
+        return outcome
+
+    outcome, shared = await _in_flight.do(key, compute, cleanup)
+    if shared:
+        REVIEW_RESULTS.inc(source=SOURCE_COALESCED)
+        logger.info("🔗 Joined an identical review already in flight")
+        return ReviewResult(outcome.result, SOURCE_COALESCED, None)
+    REVIEW_RESULTS.inc(source=SOURCE_COMPUTED)
+    return ReviewResult(outcome.result, SOURCE_COMPUTED, outcome)
+
+
+async def bind_idempotency_key(tenant: str, idempotency_key: str, key: str):
+    """Raise ``IdempotencyKeyReused`` if the tenant already used ``idempotency_key`` for another review."""
+    scope = idempotency_scope(tenant, idempotency_key)
+    if await asyncio.to_thread(result_store.bind_idempotency_key, scope, key) != key:
+        raise IdempotencyKeyReused(idempotency_key)
+
+
+def _has_idempotent_result(scope: str) -> bool:
+    key = result_store.idempotent_key(scope)
+    return key is not None and result_store.get(key) is not None
+
+
+async def has_idempotent_result(tenant: str, idempotency_key: str) -> bool:
+    """Whether the review bound to this key has finished, so a retry can be answered from the store."""
+    return await asyncio.to_thread(_has_idempotent_result, idempotency_scope(tenant, idempotency_key))
+
+
+def result_store_stats() -> dict:
+    return {"in_flight": len(_in_flight)}
@@ -0,0 +1,256 @@
+"""Bulk screening: one job description against many resumes, or one resume against many postings.
+
+Every unique resume (by upload hash) and every unique job description (by
+normalized text) is analyzed exactly once, with the analyses fanned out over
+the crew executor. Only the ATS scoring stage runs per pair, and with
+``scoring_mode=local`` it is computed inline without touching the executor
+(see ``app.scoring``). Each crew run holds one of the tenant's concurrency
+slots, the same as a single review, so a batch cannot exceed
+``TENANT_MAX_CONCURRENT``. Results stream
+back as NDJSON, one line per (resume, job) pair in completion order, followed
+by a final summary line.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+from fastapi import APIRouter, File, Form, Header, HTTPException, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from app.analysis_cache import normalize_job_description
+from app.api_utils import queue_full_error, require_api_key, validate_scoring_mode
+from app.executor import crew_executor
+from app.pipeline import analyze_job, analyze_resume, score_review
+from app.scoring import SCORING_MODE_LOCAL
+from app.skill_index import index_resume
+from app.tenants import BUSY_RETRY_AFTER, Lease, Tenant, limiter, release_lease
+from app.uploads import FORM_OVERHEAD, MAX_FILE_SIZE, StoredUpload, cleanup_upload, store_upload
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_RESUMES = int(os.getenv("BATCH_MAX_RESUMES", "50"))
+BATCH_MAX_JOBS = int(os.getenv("BATCH_MAX_JOBS", "50"))
+# Crew runs one batch may have on the executor at once; defaults to the executor's worker count.
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "0")) or crew_executor.max_workers
+# Body size limit for /batch requests, enforced by RequestSizeLimitMiddleware before parsing.
+BATCH_MAX_REQUEST_SIZE = BATCH_MAX_RESUMES * MAX_FILE_SIZE + BATCH_MAX_JOBS * FORM_OVERHEAD
+
+router = APIRouter(prefix="/batch", tags=["batch"])
+
+
+def _ndjson(data: dict) -> str:
+    return json.dumps(data) + "\n"
+
+
+def _index_when_analyzed(tenant: str, resume_sha256: str, task: asyncio.Task):
+    if not task.cancelled() and task.exception() is None:
+        # Off the event loop: the skill index may write to its SQLite store
+        asyncio.get_running_loop().run_in_executor(None, index_resume, tenant, resume_sha256, task.result())
+
+
+class _TenantSlots:
+    """The tenant's concurrency slots held by one batch's crew runs.
+
+    The request's own lease is the first slot; each further concurrent run
+    takes another lease and, while the tenant is at its cap, waits for one
+    of the batch's runs to finish.
+    """
+
+    def __init__(self, tenant: Optional[Tenant], lease: Optional[Lease]):
+        self._tenant = tenant if lease is not None else None  # no lease: limits are off (no keys configured)
+        self._lease = lease
+        self._lease_free = True
+        self._released = asyncio.Event()
+
+    async def _call(self, fn, *args):
+        return await asyncio.to_thread(fn, *args) if limiter.blocking else fn(*args)
+
+    async def acquire(self) -> Optional[Lease]:
+        if self._tenant is None:
+            return None
+        while True:
+            self._released.clear()
+            if self._lease_free:
+                self._lease_free = False
+                return self._lease
+            lease = await self._call(limiter.acquire, self._tenant)
+            if lease is not None:
+                return lease
+            try:
+                await asyncio.wait_for(self._released.wait(), BUSY_RETRY_AFTER)
+            except asyncio.TimeoutError:
+                pass  # another request may have freed a slot
+
+    async def release(self, lease: Optional[Lease]):
+        if lease is None:
+            return
+        if lease is self._lease:
+            self._lease_free = True
+        else:
+            await self._call(release_lease, lease)
+        self._released.set()
+
+
+def _error_detail(exc: BaseException) -> str:
+    if isinstance(exc, HTTPException):
+        return str(exc.detail)
+    return str(exc) or type(exc).__name__
+
+
+async def _stream_pairs(
+    tenant: str,
+    slots: _TenantSlots,
+    resumes: List[Tuple[int, Optional[StoredUpload], Optional[str]]],
+    jobs: List[Tuple[int, str]],
+    scoring_mode: str,
+):
+    """Yield one NDJSON line per (resume, job) pair as its score completes.
+
+    ``resumes`` holds (index, upload, error) per submitted file; files that
+    failed validation carry an error instead of an upload.
+    """
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def _run(fn, *args):
+        async with semaphore:
+            lease = await slots.acquire()
+            try:
+                return await crew_executor.run(fn, *args)
+            finally:
+                await slots.release(lease)
+
+    resume_tasks: Dict[str, asyncio.Task] = {}
+    job_tasks: Dict[str, asyncio.Task] = {}
+    pair_indexes: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+    pending = set()
+    succeeded = 0
+    failed = 0
+
+    async def _score(sha: str, job_key: str):
+        resume_analysis = await resume_tasks[sha]
+        job_analysis = await job_tasks[job_key]
+        if scoring_mode == SCORING_MODE_LOCAL:
+            return score_review(resume_analysis, job_analysis, scoring_mode)
+        return await _run(score_review, resume_analysis, job_analysis, scoring_mode)
+
+    try:
+        # Invalid uploads fail their pairs immediately
+        for resume_index, upload, error in resumes:
+            if upload is None:
+                for job_index, _ in jobs:
+                    failed += 1
+                    yield _ndjson({"resume_index": resume_index, "job_index": job_index, "error": error})
+
+        # One analysis per unique resume and per unique job description
+        for resume_index, upload, _ in resumes:
+            if upload is None:
+                continue
+            if upload.sha256 not in resume_tasks:
+                resume_tasks[upload.sha256] = asyncio.create_task(
+                    _run(analyze_resume, upload.knowledge_identifier, upload.resume_path, upload.sha256)
+                )
+                resume_tasks[upload.sha256].add_done_callback(partial(_index_when_analyzed, tenant, upload.sha256))
+            for job_index, job_description in jobs:
+                job_key = normalize_job_description(job_description)
+                if job_key not in job_tasks:
+                    job_tasks[job_key] = asyncio.create_task(_run(analyze_job, job_description))
+                pair_indexes.setdefault((upload.sha256, job_key), []).append((resume_index, job_index))
+
+        logger.info(
+            f"📦 Batch: {len(resume_tasks)} unique resumes x {len(job_tasks)} unique jobs -> {len(pair_indexes)} scores"
+        )
+        # Only scoring runs per unique pair
+        pair_by_task = {}
+        for pair in pair_indexes:
+            task = asyncio.create_task(_score(*pair))
+            pair_by_task[task] = pair
+            pending.add(task)
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                lines = []
+                exc = task.exception()
+                for resume_index, job_index in pair_indexes[pair_by_task[task]]:
+                    line = {"resume_index": resume_index, "job_index": job_index}
+                    if exc is None:
+                        line["result"] = task.result()
+                        succeeded += 1
+                    else:
+                        line["error"] = _error_detail(exc)
+                        failed += 1
+                    lines.append(_ndjson(line))
+                yield "".join(lines)
+
+        yield _ndjson({"done": True, "succeeded": succeeded, "failed": failed})
+    finally:
+        # Client went away or we finished: stop outstanding work and drop the uploads.
+        for task in [*pending, *resume_tasks.values(), *job_tasks.values()]:
+            task.cancel()
+        for _, upload, _ in resumes:
+            cleanup_upload(upload)
+
+
+async def _store_batch_uploads(resume_files: List[UploadFile]):
+    """Validate and save each file; a bad file becomes an error entry instead of failing the batch."""
+    resumes = []
+    for index, resume_file in enumerate(resume_files):
+        try:
+            resumes.append((index, await store_upload(resume_file), None))
+        except HTTPException as e:
+            logger.warning(f"⚠️ Batch file {index} rejected: {e.detail}")
+            resumes.append((index, None, str(e.detail)))
+    return resumes
+
+
+async def _check_batch_admission(
+    x_api_key: Optional[str], resume_count: int, job_count: int, scoring_mode: Optional[str]
+) -> Tuple[Tenant, str]:
+    """Reject the batch up front; returns the tenant and the resolved scoring mode."""
+    tenant = require_api_key(x_api_key)
+    scoring_mode = validate_scoring_mode(scoring_mode)
+    if resume_count > BATCH_MAX_RESUMES:
+        raise HTTPException(status_code=413, detail=f"Too many resumes. Max {BATCH_MAX_RESUMES} per batch.")
+    if job_count > BATCH_MAX_JOBS:
+        raise HTTPException(status_code=413, detail=f"Too many job descriptions. Max {BATCH_MAX_JOBS} per batch.")
+    if await crew_executor.is_saturated():
+        logger.warning("🚦 Review queue full, rejecting batch")
+        raise queue_full_error(crew_executor.retry_after)
+    return tenant, scoring_mode
+
+
+@router.post("/one-job")
+async def batch_one_job(
+    request: Request,
+    job_description: str = Form(...),
+    resume_files: List[UploadFile] = File(...),
+    scoring_mode: Optional[str] = Form(None),
+    x_api_key: Optional[str] = Header(None)
+):
+    """Score many resumes against one job description. Streams NDJSON."""
+    tenant, scoring_mode = await _check_batch_admission(x_api_key, len(resume_files), 1, scoring_mode)
+    resumes = await _store_batch_uploads(resume_files)
+    slots = _TenantSlots(tenant, getattr(request.state, "tenant_lease", None))
+    return StreamingResponse(
+        _stream_pairs(tenant.name, slots, resumes, [(0, job_description)], scoring_mode), media_type="application/x-ndjson"
+    )
+
+
+@router.post("/one-resume")
+async def batch_one_resume(
+    request: Request,
+    job_descriptions: List[str] = Form(...),
+    resume_file: UploadFile = File(...),
+    scoring_mode: Optional[str] = Form(None),
+    x_api_key: Optional[str] = Header(None)
+):
+    """Score one resume against many job descriptions (repeat the ``job_descriptions`` field). Streams NDJSON."""
+    tenant, scoring_mode = await _check_batch_admission(x_api_key, 1, len(job_descriptions), scoring_mode)
+    resumes = await _store_batch_uploads([resume_file])
+    slots = _TenantSlots(tenant, getattr(request.state, "tenant_lease", None))
+    return StreamingResponse(
+        _stream_pairs(tenant.name, slots, resumes, list(enumerate(job_descriptions)), scoring_mode),
+        media_type="application/x-ndjson",
+    )
@@ -0,0 +1,94 @@
+"""Candidate pool: index analyzed resumes once, then rank the whole pool against new postings.
+
+Ranking uses ``app.skill_index`` and never runs a resume agent: only the job
+description is analyzed (and that analysis is cached), so ranking thousands of
+stored candidates costs one job analysis plus a matrix product. Resumes enter
+the index when they are analyzed by any endpoint, or explicitly via
+``POST /candidates``. Each tenant has its own pool and only ranks the resumes
+it submitted.
+"""
+
+import asyncio
+import logging
+from typing import Optional
+from fastapi import APIRouter, File, Form, Header, HTTPException, UploadFile
+from app.api_utils import llm_unavailable_error, queue_full_error, require_api_key
+from app.executor import QueueFullError, crew_executor
+from app.llm_gateway import LLMUnavailableError
+from app.pipeline import PipelineError, analyze_job, analyze_resume
+from app.skill_index import index_resume, skill_indexes
+from app.uploads import cleanup_upload, log_upload_details, store_upload
+
+logger = logging.getLogger(__name__)
+
+MAX_TOP_K = 500
+
+router = APIRouter(prefix="/candidates", tags=["candidates"])
+
+
+@router.post("")
+async def add_candidate(
+    resume_file: UploadFile = File(...),
+    x_api_key: Optional[str] = Header(None)
+):
+    """Analyze a resume (or reuse its cached analysis) and add it to the skill index."""
+    log_upload_details(resume_file)
+    tenant = require_api_key(x_api_key)
+    if await crew_executor.is_saturated():
+        raise queue_full_error(crew_executor.retry_after)
+
+    upload = await store_upload(resume_file)
+    try:
+        analysis = await crew_executor.run(
+            analyze_resume, upload.knowledge_identifier, upload.resume_path, upload.sha256
+        )
+    except QueueFullError as e:
+        raise queue_full_error(e.retry_after)
+    except LLMUnavailableError as e:
+        raise llm_unavailable_error(e)
+    except PipelineError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        cleanup_upload(upload)
+
+    # The skill index may sync with its SQLite store: keep that off the event loop
+    await asyncio.to_thread(index_resume, tenant.name, upload.sha256, analysis)
+    index = await asyncio.to_thread(skill_indexes.for_tenant, tenant.name)
+    logger.info(f"📇 Candidate {upload.sha256[:12]} indexed ({len(index)} in {tenant.name}'s pool)")
+    return {"resume_sha256": upload.sha256, "keywords": analysis.keywords, "indexed": upload.sha256 in index}
+
+
+@router.post("/rank")
+async def rank_candidates(
+    job_description: str = Form(...),
+    top_k: int = Form(20),
+    x_api_key: Optional[str] = Header(None)
+):
+    """Rank every resume the tenant indexed against a job description with the local scoring engine."""
+    tenant = require_api_key(x_api_key)
+    if not 1 <= top_k <= MAX_TOP_K:
+        raise HTTPException(status_code=422, detail=f"top_k must be between 1 and {MAX_TOP_K}")
+
+    try:
+        job_analysis = await crew_executor.run(analyze_job, job_description)
+    except QueueFullError as e:
+        raise queue_full_error(e.retry_after)
+    except LLMUnavailableError as e:
+        raise llm_unavailable_error(e)
+    except PipelineError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    index = await asyncio.to_thread(skill_indexes.for_tenant, tenant.name)
+    ranked = await asyncio.to_thread(index.rank, job_analysis, top_k)
+    return {
+        "job_analysis": job_analysis.model_dump(),
+        "indexed": len(index),
+        "results": [entry._asdict() for entry in ranked],
+    }
+
+
+@router.get("/stats")
+async def candidate_stats(x_api_key: Optional[str] = Header(None)):
+    tenant = require_api_key(x_api_key)
+    index = await asyncio.to_thread(skill_indexes.for_tenant, tenant.name)
+    return index.stats()
@@ -0,0 +1,28 @@
+"""Liveness and readiness probes.
+
+``/healthz`` answers as soon as the process serves HTTP; ``/readyz`` only
+once warm-up has finished (see ``app.startup``) and until shutdown starts.
+"""
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.startup import readiness
+
+router = APIRouter(tags=["health"])
+
+READYZ_RETRY_AFTER = 5  # seconds advertised while warming up
+
+
+@router.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and its event loop responsive. Never waits for warm-up."""
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+async def readyz():
+    """Readiness: ``200`` once warm-up has finished, ``503`` while starting, warming, failed or stopping."""
+    snapshot = readiness.snapshot()
+    if readiness.ready:
+        return snapshot
+    return JSONResponse(status_code=503, content=snapshot, headers={"Retry-After": str(READYZ_RETRY_AFTER)})
@@ -0,0 +1,115 @@
+"""Prometheus scrape endpoint.
+
+Request, span, token, queue-wait and LLM attempt metrics are recorded as they
+happen (see ``app.telemetry`` and ``app.llm_gateway``); executor, stage pool,
+cache, circuit breaker, tenant, in-flight review, skill index and warm-up figures are read from their
+``stats()`` at scrape time by the collectors below.
+"""
+
+import asyncio
+from typing import Dict, Iterable, List, Tuple
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.cache import cache_stats
+from app.executor import crew_executor
+from app.llm_gateway import gateway_stats
+from app.pool import pool_stats
+from app.results import result_store_stats
+from app.skill_index import skill_indexes
+from app.startup import readiness
+from app.tenants import tenant_stats
+from app.telemetry import METRIC_PREFIX, MetricFamily, Sample, register_collector, render_metrics
+
+router = APIRouter(tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _family(name: str, type: str, help: str, values: List[Tuple[Dict[str, str], float]]) -> MetricFamily:
+    name = METRIC_PREFIX + name
+    return MetricFamily(name, type, help, [Sample(name, labels, value) for labels, value in values])
+
+
+def collect_executor() -> Iterable[MetricFamily]:
+    stats = crew_executor.stats()
+    for field, help in (
+        ("in_flight", "Crew runs executing now."),
+        ("queue_depth", "Crew runs waiting for a worker."),
+        ("max_workers", "Crew executor worker slots."),
+    ):
+        yield _family(f"executor_{field}", "gauge", help, [({}, stats[field])])
+    for field in ("submitted", "completed", "failed", "rejected"):
+        yield _family(f"executor_{field}_total", "counter", f"Crew runs {field}.", [({}, stats[field])])
+    if "work_queue" in stats:
+        yield _family("work_queue_items", "gauge", "Items in the shared review work queue by status.",
+                      [({"status": status}, count) for status, count in stats["work_queue"].items()])
+
+
+def _per_key(prefix: str, label: str, stats: Dict[str, dict], fields) -> Iterable[MetricFamily]:
+    for field, type, help in fields:
+        name = f"{prefix}_{field}" + ("_total" if type == "counter" else "")
+        yield _family(name, type, help, [({label: key}, values[field]) for key, values in stats.items()])
+
+
+def collect_pools() -> Iterable[MetricFamily]:
+    return _per_key("stage_pool", "stage", pool_stats(), (
+        ("idle", "gauge", "Pre-built stage tasks waiting to be checked out."),
+        ("in_use", "gauge", "Stage tasks checked out by running crews."),
+        ("checkouts", "counter", "Stage task checkouts."),
+        ("misses", "counter", "Checkouts that found the pool empty and built a task."),
+        ("discarded", "counter", "Stage tasks dropped instead of returned to the pool."),
+    ))
+
+
+def collect_caches() -> Iterable[MetricFamily]:
+    return _per_key("cache", "cache", cache_stats(), (
+        ("hits", "counter", "Cache lookups that found a value."),
+        ("misses", "counter", "Cache lookups that found nothing."),
+        ("memory_entries", "gauge", "Entries held in the in-memory cache tier."),
+    ))
+
+
+_BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def collect_llm_gateway() -> Iterable[MetricFamily]:
+    stats = gateway_stats()
+    yield _family("llm_circuit_state", "gauge", "LLM circuit breaker state (0 closed, 1 half-open, 2 open).",
+                  [({"model": model}, _BREAKER_STATES[s["state"]]) for model, s in stats.items()])
+    yield _family("llm_consecutive_failures", "gauge", "LLM attempts failed in a row.",
+                  [({"model": model}, s["consecutive_failures"]) for model, s in stats.items()])
+
+
+def collect_tenants() -> Iterable[MetricFamily]:
+    yield _family("tenant_in_flight", "gauge", "Reviews in flight per API key tenant.",
+                  [({"tenant": name}, count) for name, count in tenant_stats().items()])
+
+
+def collect_results() -> Iterable[MetricFamily]:
+    yield _family("reviews_in_flight", "gauge", "Distinct reviews running; identical requests wait on these.",
+                  [({}, result_store_stats()["in_flight"])])
+
+
+def collect_skill_index() -> Iterable[MetricFamily]:
+    yield _family("skill_index_resumes", "gauge", "Resumes in the skill indexes of all tenants.", [({}, len(skill_indexes))])
+
+
+def collect_startup() -> Iterable[MetricFamily]:
+    snapshot = readiness.snapshot()
+    yield _family("ready", "gauge", "1 once warm-up has finished and until shutdown starts.", [({}, int(readiness.ready))])
+    yield _family("warmup_step_seconds", "gauge", "Duration of each startup warm-up step.",
+                  [({"step": step}, ms / 1000) for step, ms in snapshot["warmup_steps_ms"].items()])
+
+
+for _collector in (
+    collect_executor, collect_pools, collect_caches, collect_llm_gateway, collect_tenants, collect_results,
+    collect_skill_index, collect_startup,
+):
+    register_collector(_collector)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of request, stage, token, queue, pool and cache metrics."""
+    # Rendered in a worker thread: several collectors read SQLite (work queue, tenant leases, skill index store)
+    return PlainTextResponse(await asyncio.to_thread(render_metrics), media_type=PROMETHEUS_CONTENT_TYPE)
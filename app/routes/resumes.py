@@ -0,0 +1,47 @@
+"""Privacy operations on data derived from uploaded resumes."""
+
+import asyncio
+import logging
+import re
+import sqlite3
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException
+from app.analysis_cache import purge_resume
+from app.api_utils import require_api_key
+from app.results import result_store
+from app.skill_index import skill_indexes
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/resumes", tags=["resumes"])
+
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+@router.delete("/{resume_sha256}")
+async def delete_resume_data(resume_sha256: str, x_api_key: Optional[str] = Header(None)):
+    """Remove the resume whose bytes hash to ``resume_sha256`` from the tenant's pool and purge what was derived from it.
+
+    Only resumes the tenant submitted can be deleted (404 otherwise). Cached
+    analyses, embeddings and stored reviews are keyed by content, so they are
+    purged once no other tenant still has the same resume in its pool.
+    """
+    tenant = require_api_key(x_api_key)
+    resume_sha256 = resume_sha256.lower()
+    if not _SHA256_RE.match(resume_sha256):
+        raise HTTPException(status_code=422, detail="resume_sha256 must be a hex SHA-256 digest")
+    owners = await asyncio.to_thread(skill_indexes.owners, resume_sha256)
+    if tenant.name not in owners:
+        raise HTTPException(status_code=404, detail="Resume not found")
+    purged = 0
+    if owners == [tenant.name]:
+        # Purge before unindexing, so a failed purge leaves the resume listed and the delete can be retried
+        try:
+            purged = await asyncio.to_thread(purge_resume, resume_sha256)
+            purged += await asyncio.to_thread(result_store.purge_resume, resume_sha256)
+        except sqlite3.Error as e:
+            logger.error(f"💥 Purging resume {resume_sha256[:12]} failed: {e}")
+            raise HTTPException(status_code=503, detail="Could not purge the resume's data, retry the delete")
+    await asyncio.to_thread(skill_indexes.remove, tenant.name, resume_sha256)
+    logger.info(f"🗑️ Resume {resume_sha256[:12]} deleted for tenant {tenant.name} ({purged} entries purged)")
+    return {"resume_sha256": resume_sha256, "purged_entries": purged, "unindexed": True}
@@ -0,0 +1,259 @@
+"""Asynchronous review jobs: submit, poll, or stream progress over SSE.
+
+``POST /reviews`` answers immediately with a job id while the crew runs on the
+executor in the background, so clients no longer hold a connection open for
+the whole pipeline. Reviews already stored or in flight are reused (see
+``app.results``): a stored one yields a job that has already succeeded.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from functools import partial
+from typing import Optional
+from fastapi import APIRouter, File, Form, Header, HTTPException, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from app.api_utils import (
+    idempotency_key_reused_error,
+    queue_full_error,
+    require_api_key,
+    validate_idempotency_key,
+    validate_scoring_mode,
+)
+from app.executor import QueueFullError, crew_executor
+from app.jobs import FINISHED_STATUSES, STATUS_FAILED, STATUS_RUNNING, STATUS_SUCCEEDED, InMemoryJobStore, job_store
+from app.models import CVAnalysis, ReviewJob
+from app.pipeline import ReviewOutcome, run_review
+from app.results import (
+    IdempotencyKeyReused,
+    bind_idempotency_key,
+    has_idempotent_result,
+    review_key,
+    review_once,
+    stored_review,
+)
+from app.skill_index import index_resume
+from app.tenants import Lease, claim_lease, release_lease
+from app.uploads import StoredUpload, cleanup_upload, log_upload_details, store_upload
+
+logger = logging.getLogger(__name__)
+
+JOB_EVENTS_POLL_INTERVAL = float(os.getenv("JOB_EVENTS_POLL_INTERVAL", "0.5"))  # seconds between store polls
+JOB_EVENTS_HEARTBEAT = 15.0  # seconds between SSE keep-alive comments
+
+router = APIRouter(prefix="/reviews", tags=["reviews"])
+
+# Strong references to running background jobs (asyncio only keeps weak ones).
+_background_jobs = set()
+
+
+def _tracked_review(
+    job_id: str,
+    knowledge_identifier: str,
+    resume_path: str,
+    job_description: str,
+    resume_sha256: str,
+    scoring_mode: str,
+) -> ReviewOutcome:
+    """Run the pipeline while recording status and per-stage progress on the job.
+
+    Top-level so it can be pickled for the process executor; with the SQLite
+    store the updates are visible from the worker process too (``check_job_store``).
+    """
+    job_store.update(job_id, status=STATUS_RUNNING)
+    return run_review(
+        knowledge_identifier,
+        resume_path,
+        job_description,
+        resume_sha256=resume_sha256,
+        progress=lambda stage: job_store.add_stage(job_id, stage),
+        scoring_mode=scoring_mode,
+    )
+
+
+async def _run_job(
+    job_id: str,
+    tenant: str,
+    upload: StoredUpload,
+    job_description: str,
+    scoring_mode: str,
+    key: str,
+    lease: Optional[Lease] = None,
+):
+    try:
+        review = await review_once(key, lambda: crew_executor.run(
+            _tracked_review,
+            job_id,
+            upload.knowledge_identifier,
+            upload.resume_path,
+            job_description,
+            upload.sha256,
+            scoring_mode,
+        ), cleanup=partial(cleanup_upload, upload))  # the review deletes it once no identical request reads it
+        outcome = review.outcome
+        await asyncio.to_thread(
+            job_store.update,
+            job_id,
+            status=STATUS_SUCCEEDED,
+            result=CVAnalysis.model_validate(review.result),
+            token_usage=(outcome.token_usage if outcome else None) or {},
+        )
+        await asyncio.to_thread(
+            index_resume, tenant, upload.sha256, outcome.resume_analysis if outcome is not None else None
+        )
+        logger.info(f"✅ Review job {job_id} completed ({review.source})")
+    except QueueFullError:
+        logger.warning(f"🚦 Review job {job_id} rejected: queue full")
+        await asyncio.to_thread(job_store.update, job_id, status=STATUS_FAILED, error="Server busy: review queue is full")
+    except asyncio.CancelledError:
+        await asyncio.to_thread(
+            job_store.update, job_id, status=STATUS_FAILED, error="Server shut down before the review finished"
+        )
+        raise
+    except Exception as e:
+        logger.error(f"💥 Review job {job_id} failed: {e}")
+        await asyncio.to_thread(job_store.update, job_id, status=STATUS_FAILED, error=str(e))
+    finally:
+        release_lease(lease)
+
+
+def check_job_store():
+    """Refuse to start with a per-process job store while crews run in other processes.
+
+    ``_tracked_review`` records progress from wherever the crew runs; a worker
+    process would update its own copy of an in-memory store and the job would
+    never show it.
+    """
+    if crew_executor.mode != "thread" and isinstance(job_store, InMemoryJobStore):
+        raise RuntimeError(
+            f"CREW_EXECUTOR_MODE={crew_executor.mode} needs a job store shared with the worker processes: "
+            "set JOB_STORE_URL=sqlite:///data/jobs.db"
+        )
+
+
+async def cancel_review_jobs():
+    """Cancel background jobs on shutdown so they are marked failed instead of vanishing."""
+    for task in list(_background_jobs):
+        task.cancel()
+    if _background_jobs:
+        await asyncio.gather(*_background_jobs, return_exceptions=True)
+
+
+async def _get_job_or_404(job_id: str, tenant: str) -> ReviewJob:
+    job = await asyncio.to_thread(job_store.get, job_id)
+    # Another tenant's job is reported as missing, so job ids cannot be probed
+    if job is None or job.tenant != tenant:
+        raise HTTPException(status_code=404, detail="Review job not found")
+    return job
+
+
+@router.post("", status_code=202)
+async def submit_review(
+    request: Request,
+    job_description: str = Form(...),
+    resume_file: UploadFile = File(...),
+    scoring_mode: Optional[str] = Form(None),
+    x_api_key: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
+):
+    """Accept a review and return its job id without waiting for the crew."""
+    logger.debug("🚀 Starting POST /reviews")
+    log_upload_details(resume_file)
+    tenant = require_api_key(x_api_key)
+    scoring_mode = validate_scoring_mode(scoring_mode)
+    idempotency_key = validate_idempotency_key(idempotency_key)
+
+    if await crew_executor.is_saturated() and not (idempotency_key and await has_idempotent_result(tenant.name, idempotency_key)):
+        logger.warning("🚦 Review queue full, rejecting request")
+        raise queue_full_error(crew_executor.retry_after)
+
+    upload = await store_upload(resume_file)
+    key = review_key(upload.sha256, job_description, scoring_mode)
+    try:
+        if idempotency_key:
+            await bind_idempotency_key(tenant.name, idempotency_key, key)
+        stored = await stored_review(key)
+    except IdempotencyKeyReused:
+        cleanup_upload(upload)
+        raise idempotency_key_reused_error()
+    except BaseException:
+        cleanup_upload(upload)
+        raise
+
+    job = await asyncio.to_thread(job_store.create, tenant.name)
+    if stored is not None:
+        cleanup_upload(upload)
+        await asyncio.to_thread(index_resume, tenant.name, upload.sha256, None)
+        job = await asyncio.to_thread(
+            job_store.update, job.job_id, status=STATUS_SUCCEEDED, result=CVAnalysis.model_validate(stored)
+        )
+        logger.info(f"✅ Review job {job.job_id} answered from the result store")
+    else:
+        # The tenant's concurrency slot stays taken until the job finishes, not just until this 202
+        lease = claim_lease(request.state)
+        task = asyncio.create_task(_run_job(job.job_id, tenant.name, upload, job_description, scoring_mode, key, lease))
+        _background_jobs.add(task)
+        task.add_done_callback(_background_jobs.discard)
+        logger.info(f"📬 Review job {job.job_id} queued")
+
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "status_url": f"/reviews/{job.job_id}",
+        "events_url": f"/reviews/{job.job_id}/events",
+    }
+
+
+@router.get("/{job_id}", response_model=ReviewJob, response_model_exclude={"tenant"})
+async def get_review(job_id: str, x_api_key: Optional[str] = Header(None)):
+    tenant = require_api_key(x_api_key)
+    return await _get_job_or_404(job_id, tenant.name)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _job_events(job_id: str):
+    sent_stages = 0
+    last_status = None
+    last_sent = time.monotonic()
+    while True:
+        job = await asyncio.to_thread(job_store.get, job_id)
+        if job is None:
+            yield _sse("error", {"detail": "Review job not found"})
+            return
+
+        chunks = [_sse("stage", {"stage": stage}) for stage in job.stages[sent_stages:]]
+        sent_stages = len(job.stages)
+        if job.status != last_status:
+            chunks.append(_sse("status", {"status": job.status}))
+            last_status = job.status
+        if job.status in FINISHED_STATUSES:
+            final_event = "result" if job.status == STATUS_SUCCEEDED else "error"
+            chunks.append(_sse(final_event, job.model_dump(mode="json", exclude={"tenant"})))
+
+        if chunks:
+            yield "".join(chunks)
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= JOB_EVENTS_HEARTBEAT:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+
+        if job.status in FINISHED_STATUSES:
+            return
+        await asyncio.sleep(JOB_EVENTS_POLL_INTERVAL)
+
+
+@router.get("/{job_id}/events")
+async def stream_review_events(job_id: str, x_api_key: Optional[str] = Header(None)):
+    """Server-sent events: one ``stage`` event per finished task, then ``result`` or ``error``."""
+    tenant = require_api_key(x_api_key)
+    await _get_job_or_404(job_id, tenant.name)
+    return StreamingResponse(
+        _job_events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,244 @@
+"""Production launcher: API processes plus review worker processes sharing a durable queue.
+
+    python -m app.run serve --api-workers 2 --review-workers 4   # supervisor, runs until drained
+    python -m app.run drain                                      # graceful stop, e.g. before a deploy
+    python -m app.run status                                     # queue depth and supervisor pid
+    python -m app.run worker                                     # one review worker (what serve starts)
+    python -m app.run imports                                    # where `import app.main` spends its time
+
+``serve`` runs uvicorn with ``--api-workers`` processes in ``queue`` executor
+mode: they accept uploads and enqueue review calls in ``WORK_QUEUE_DB``
+(``app.work_queue``), and ``--review-workers`` worker processes, each with
+warm stage pools, run them (``app.worker``). Stores that must be shared
+between processes default to SQLite files under ``data/``. A worker that
+dies is restarted, and whatever it was running is run again by another.
+
+``drain`` (or SIGTERM / Ctrl+C on ``serve``) stops the API from accepting
+connections, lets requests in flight finish within ``--drain-timeout``, then
+drains the workers. Reviews still queued stay in the queue for the next
+start. Signals are POSIX; on Windows ``drain`` stops the processes outright.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("app.run")
+
+RUN_PID_FILE = os.getenv("RUN_PID_FILE", "data/run.pid")
+RESTART_BACKOFF_MAX = 30.0  # seconds between restarts of a worker that keeps dying
+
+# What serve shares between processes; explicit settings win.
+_SHARED_DEFAULTS = {
+    "CREW_EXECUTOR_MODE": "queue",
+    "WORK_QUEUE_DB": "data/work_queue.db",
+    "JOB_STORE_URL": "sqlite:///data/jobs.db",
+    "ANALYSIS_CACHE_DB": "data/analysis_cache.db",
+    "RATE_LIMIT_URL": "sqlite:///data/rate_limits.db",
+    "SKILL_INDEX_DB": "data/skill_index.db",
+    "SKILL_INDEX_DIR": "data/skill_index",
+}
+
+
+def _read_pid() -> Optional[int]:
+    try:
+        with open(RUN_PID_FILE, encoding="utf-8") as f:
+            pid = int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+    return pid if _alive(pid) else None
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def _stop(process: subprocess.Popen, timeout: float, name: str):
+    """SIGTERM ``process``, kill it if it is still running after ``timeout`` seconds."""
+    if process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        logger.warning(f"⚠️ {name} still running after {timeout:.0f}s, killing it")
+        process.kill()
+        process.wait()
+
+
+class Supervisor:
+    """Starts the API and the review workers, restarts workers that die, drains everything on SIGTERM."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.env = dict(os.environ)
+        self.api: Optional[subprocess.Popen] = None
+        self.workers: Dict[int, subprocess.Popen] = {}
+        self.restarts: Dict[int, int] = {}
+        self.next_start: Dict[int, float] = {}
+        self.draining = False
+
+    def _api_command(self) -> List[str]:
+        a = self.args
+        return [
+            sys.executable, "-m", "uvicorn", "app.main:app", "--host", a.host, "--port", str(a.port),
+            "--workers", str(a.api_workers), "--timeout-graceful-shutdown", str(int(a.drain_timeout)),
+        ]
+
+    def _start_worker(self, index: int):
+        command = [sys.executable, "-m", "app.run", "worker", "--name", f"worker-{index}"]
+        if self.args.threads:
+            command += ["--threads", str(self.args.threads)]
+        self.workers[index] = subprocess.Popen(command, env=self.env, start_new_session=True)
+
+    def _drain(self, *_):
+        self.draining = True
+
+    def run(self) -> int:
+        os.makedirs(os.path.dirname(os.path.abspath(RUN_PID_FILE)), exist_ok=True)
+        with open(RUN_PID_FILE, "w", encoding="utf-8") as f:
+            f.write(str(os.getpid()))
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._drain)
+        try:
+            for index in range(self.args.review_workers):
+                self._start_worker(index)
+            # Own sessions: a terminal Ctrl+C reaches only the supervisor, which drains in order
+            self.api = subprocess.Popen(self._api_command(), env=self.env, start_new_session=True)
+            logger.info(
+                f"🚀 Serving on {self.args.host}:{self.args.port} with {self.args.api_workers} API and "
+                f"{self.args.review_workers} review worker processes (pid {os.getpid()})"
+            )
+            return self._supervise()
+        finally:
+            self._shutdown()
+            try:
+                os.remove(RUN_PID_FILE)
+            except OSError:
+                pass
+
+    def _supervise(self) -> int:
+        while not self.draining:
+            if self.api.poll() is not None:
+                logger.error(f"❌ API exited with code {self.api.returncode}, stopping")
+                return self.api.returncode or 1
+            now = time.monotonic()
+            for index, process in list(self.workers.items()):
+                if process.poll() is None:
+                    continue
+                if index not in self.next_start:
+                    self.restarts[index] = self.restarts.get(index, 0) + 1
+                    delay = min(RESTART_BACKOFF_MAX, 2 ** (self.restarts[index] - 1))
+                    logger.error(f"💀 Review worker {index} exited with code {process.returncode}, restarting in {delay:.0f}s")
+                    self.next_start[index] = now + delay
+                elif now >= self.next_start[index]:
+                    del self.next_start[index]
+                    self._start_worker(index)
+            time.sleep(1)
+        return 0
+
+    def _shutdown(self):
+        logger.info("🛑 Draining: API first, so requests in flight can still reach the workers")
+        timeout = self.args.drain_timeout
+        if self.api is not None:
+            _stop(self.api, timeout + 10, "API")
+        for process in self.workers.values():
+            if process.poll() is None:
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for index, process in self.workers.items():
+            _stop(process, max(0.0, deadline - time.monotonic()), f"Review worker {index}")
+        logger.info("👋 Drained")
+
+
+def drain(timeout: float) -> int:
+    pid = _read_pid()
+    if pid is None:
+        print(f"No running launcher found (pid file {RUN_PID_FILE})")
+        return 1
+    os.kill(pid, signal.SIGTERM)
+    print(f"Draining launcher {pid}...")
+    deadline = time.monotonic() + timeout
+    while _alive(pid):
+        if time.monotonic() > deadline:
+            print(f"Launcher {pid} still draining after {timeout:.0f}s")
+            return 1
+        time.sleep(0.5)
+    print("Drained")
+    return 0
+
+
+def status() -> int:
+    from app.work_queue import WorkQueue
+
+    pid = _read_pid()
+    print(f"launcher: {'running, pid ' + str(pid) if pid else 'not running'}")
+    path = os.environ["WORK_QUEUE_DB"]
+    if os.path.exists(path):
+        counts = WorkQueue(path).counts()
+        print("work queue: " + ", ".join(f"{count} {status}" for status, count in counts.items()))
+    else:
+        print(f"work queue: {path} does not exist yet")
+    return 0
+
+
+def imports(module: str, top: int) -> int:
+    from app.startup import format_import_profile, import_profile
+
+    print(format_import_profile(module, import_profile(module), top))
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the API and review workers until drained")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument("--api-workers", type=int, default=1, help="uvicorn worker processes")
+    serve.add_argument("--review-workers", type=int, default=os.cpu_count() or 1, help="review worker processes")
+    serve.add_argument("--threads", type=int, default=0, help="reviews per worker process (default WORKER_THREADS)")
+    serve.add_argument("--drain-timeout", type=float, default=120.0, help="seconds in-flight work gets to finish")
+    worker = commands.add_parser("worker", help="run one review worker process")
+    worker.add_argument("--name", default="worker")
+    worker.add_argument("--threads", type=int, default=0)
+    stop = commands.add_parser("drain", help="gracefully stop a running `serve`")
+    stop.add_argument("--timeout", type=float, default=300.0, help="seconds to wait for it to exit")
+    commands.add_parser("status", help="show the launcher pid and work queue depth")
+    profile = commands.add_parser("imports", help="profile import time in a fresh interpreter")
+    profile.add_argument("--module", default="app.main")
+    profile.add_argument("--top", type=int, default=20, help="rows per table")
+    args = parser.parse_args(argv)
+
+    for name, value in _SHARED_DEFAULTS.items():
+        os.environ.setdefault(name, value)
+    if args.command == "worker":
+        from app.worker import WORKER_THREADS, run_worker
+
+        run_worker(args.name, args.threads or WORKER_THREADS)
+        return 0
+    if args.command == "drain":
+        return drain(args.timeout)
+    if args.command == "status":
+        return status()
+    if args.command == "imports":
+        return imports(args.module, args.top)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    return Supervisor(args).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
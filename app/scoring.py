@@ -0,0 +1,244 @@
+"""Deterministic local ATS scoring.
+
+Scores a ResumeAnalysis against a JobAnalysis by weighted term overlap of the
+job's keywords, requirements and responsibilities, after normalization,
+synonym folding and light suffix stemming. Pure Python, no I/O: the same
+inputs always give the same score, in microseconds instead of an LLM call.
+
+Scoring modes (``SCORING_MODE`` default, overridable per request):
+
+- ``llm``    the score generator agent computes score and feedback (original behaviour)
+- ``local``  score and feedback both come from this module
+- ``hybrid`` score from this module, strengths/weaknesses/summary written by the agent
+"""
+
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional
+from app.models import CVAnalysis, CVAnalysisDetails, JobAnalysis, ResumeAnalysis
+
+SCORING_MODE_LOCAL = "local"
+SCORING_MODE_LLM = "llm"
+SCORING_MODE_HYBRID = "hybrid"
+SCORING_MODES = (SCORING_MODE_LOCAL, SCORING_MODE_LLM, SCORING_MODE_HYBRID)
+
+SCORING_MODE = os.getenv("SCORING_MODE", SCORING_MODE_LLM).lower()
+
+# Share of the score per job analysis section; empty sections are left out and the rest renormalized.
+SECTION_WEIGHTS = {
+    "keywords": 0.5,
+    "requirements": 0.35,
+    "responsibilities": 0.15,
+}
+# Fraction of an item's terms the resume must cover for it to count as a strength.
+MATCH_THRESHOLD = 0.5
+MAX_FEEDBACK_ITEMS = 8
+
+# Aliases folded to one canonical spelling before tokenizing (keys and values already normalized).
+SYNONYMS = {
+    "js": "javascript",
+    "ecmascript": "javascript",
+    "ts": "typescript",
+    "node": "nodejs",
+    "node.js": "nodejs",
+    "react.js": "react",
+    "reactjs": "react",
+    "vue.js": "vue",
+    "vuejs": "vue",
+    "angularjs": "angular",
+    "golang": "go",
+    "py": "python",
+    "c sharp": "c#",
+    "csharp": "c#",
+    "cpp": "c++",
+    "dotnet": ".net",
+    "asp.net": ".net",
+    "postgres": "postgresql",
+    "psql": "postgresql",
+    "mongo": "mongodb",
+    "ms sql": "mssql",
+    "sql server": "mssql",
+    "k8s": "kubernetes",
+    "aws": "amazon web services",
+    "gcp": "google cloud platform",
+    "google cloud": "google cloud platform",
+    "azure cloud": "azure",
+    "ci/cd": "continuous integration continuous delivery",
+    "cicd": "continuous integration continuous delivery",
+    "ml": "machine learning",
+    "dl": "deep learning",
+    "ai": "artificial intelligence",
+    "nlp": "natural language processing",
+    "llm": "large language model",
+    "llms": "large language model",
+    "oop": "object oriented programming",
+    "object-oriented": "object oriented",
+    "front-end": "frontend",
+    "front end": "frontend",
+    "back-end": "backend",
+    "back end": "backend",
+    "full-stack": "fullstack",
+    "full stack": "fullstack",
+    "restful": "rest",
+    "rest api": "rest",
+    "rest apis": "rest",
+    "ux": "user experience",
+    "ui": "user interface",
+    "qa": "quality assurance",
+    "bsc": "bachelor",
+    "b.sc": "bachelor",
+    "bachelors": "bachelor",
+    "bachelor's": "bachelor",
+    "msc": "master",
+    "m.sc": "master",
+    "masters": "master",
+    "master's": "master",
+    "phd": "doctorate",
+    "cs": "computer science",
+    "scrum": "agile scrum",
+}
+
+# Filler that appears in most postings and says nothing about fit.
+STOPWORDS = frozenset("""
+a an and or the of for to in on at by with from as is are be been being this that these those
+it its our your their we you they will would should must can could may might
+experience experienced years year yrs plus strong solid good excellent proven
+knowledge ability able skill skills working work using use including etc such
+familiarity familiar understanding proficiency proficient hands demonstrated
+preferred required requirement requirements nice have has having least minimum
+related relevant similar other various new well within across team
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.']*")
+_SYNONYM_RE = re.compile(
+    r"(?<![a-z0-9+#.])("
+    + "|".join(re.escape(alias) for alias in sorted(SYNONYMS, key=len, reverse=True))
+    + r")(?![a-z0-9+#])"
+)
+# (suffix, replacement), longest first; only applied to plain alphabetic tokens.
+_SUFFIXES = (
+    ("izations", "ize"), ("ization", "ize"), ("ational", "ate"), ("ations", "ate"), ("ation", "ate"),
+    ("nesses", ""), ("ness", ""), ("ments", ""), ("ment", ""), ("ities", ""), ("ity", ""),
+    ("ings", ""), ("ing", ""), ("ies", "y"), ("ers", ""), ("er", ""), ("ed", ""), ("ly", ""),
+    ("es", "e"), ("s", ""),
+)
+# "es" is a whole plural suffix only after these ("boxes", "batches"); elsewhere it is "e" + "s" ("databases")
+_SIBILANTS = ("ss", "us", "x", "z", "ch", "sh")
+
+
+class SectionMatch(NamedTuple):
+    matched: List[str]     # job items covered at or above MATCH_THRESHOLD
+    missing: List[str]     # job items below it
+    coverage: float        # mean term coverage across the section's items, 0..1
+
+
+class LocalScore(NamedTuple):
+    ats_score: int
+    sections: Dict[str, SectionMatch]
+
+    def to_cv_analysis(self) -> CVAnalysis:
+        return CVAnalysis(ats_score=self.ats_score, analysis=local_feedback(self))
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase NFKC text with aliases folded to their canonical spelling."""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = " ".join(text.split())
+    return _SYNONYM_RE.sub(lambda m: SYNONYMS[m.group(1)], text)
+
+
+def stem(token: str) -> str:
+    if not token.isalpha():
+        return token
+    if len(token) <= 4:
+        # Short plurals ("apis", "jobs"); three letters are left alone ("aws", "gcs")
+        if len(token) == 4 and token.endswith("s") and not token.endswith(("ss", "us")):
+            return token[:-1]
+        return token
+    for suffix, replacement in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            base = token[: len(token) - len(suffix)]
+            if suffix == "es" and base.endswith(_SIBILANTS):
+                return base
+            if suffix == "s" and base.endswith(("s", "u")):
+                return token  # "process", "class", "status": not plurals
+            return base + replacement
+    return token
+
+
+@lru_cache(maxsize=8192)
+def terms(text: str) -> FrozenSet[str]:
+    """Stemmed content terms of a phrase: stopwords and bare numbers ("5+", "3") dropped."""
+    result = set()
+    for token in _TOKEN_RE.findall(normalize_text(text)):
+        token = token.rstrip(".'")
+        if not token or token in STOPWORDS or token.rstrip("+").isdigit():
+            continue
+        result.add(stem(token))
+    return frozenset(result)
+
+
+def _match_section(items: Iterable[str], resume_terms: FrozenSet[str]) -> SectionMatch:
+    matched, missing, coverages = [], [], []
+    for item in items:
+        item_terms = terms(item)
+        if not item_terms:
+            continue
+        coverage = len(item_terms & resume_terms) / len(item_terms)
+        coverages.append(coverage)
+        (matched if coverage >= MATCH_THRESHOLD else missing).append(item)
+    coverage = sum(coverages) / len(coverages) if coverages else 0.0
+    return SectionMatch(matched, missing, coverage)
+
+
+def score_locally(resume_analysis: ResumeAnalysis, job_analysis: JobAnalysis) -> LocalScore:
+    """Weighted overlap score (0-100) of the job analysis terms found in the resume analysis."""
+    resume_terms = terms(" ; ".join([*resume_analysis.keywords, resume_analysis.summary]))
+    sections = {
+        section: _match_section(getattr(job_analysis, section), resume_terms)
+        for section in SECTION_WEIGHTS
+    }
+    weighted = total_weight = 0.0
+    for section, weight in SECTION_WEIGHTS.items():
+        if sections[section].matched or sections[section].missing:
+            weighted += weight * sections[section].coverage
+            total_weight += weight
+    ats_score = round(100 * weighted / total_weight) if total_weight else 0
+    return LocalScore(ats_score, sections)
+
+
+def _join(items: List[str]) -> str:
+    shown = items[:MAX_FEEDBACK_ITEMS]
+    extra = len(items) - len(shown)
+    return "; ".join(shown) + (f"; and {extra} more" if extra > 0 else "")
+
+
+def local_feedback(score: LocalScore) -> CVAnalysisDetails:
+    """Template strengths/weaknesses/summary listing what matched and what is missing."""
+    keywords = score.sections["keywords"]
+    requirements = score.sections["requirements"]
+    responsibilities = score.sections["responsibilities"]
+    strengths = keywords.matched + requirements.matched
+    weaknesses = keywords.missing + requirements.missing
+    summary = (
+        f"ATS score {score.ats_score}/100 from term overlap: "
+        f"{len(keywords.matched)}/{len(keywords.matched) + len(keywords.missing)} keywords, "
+        f"{len(requirements.matched)}/{len(requirements.matched) + len(requirements.missing)} requirements and "
+        f"{len(responsibilities.matched)}/{len(responsibilities.matched) + len(responsibilities.missing)} "
+        f"responsibilities matched."
+    )
+    return CVAnalysisDetails(
+        strengths=_join(strengths) or "No direct matches with the job requirements found.",
+        weaknesses=_join(weaknesses) or "No missing keywords or requirements found.",
+        summary=summary,
+    )
+
+
+def resolve_scoring_mode(scoring_mode: Optional[str]) -> str:
+    """Per-request mode, falling back to SCORING_MODE. Raises ValueError for unknown modes."""
+    mode = (scoring_mode or SCORING_MODE).strip().lower()
+    if mode not in SCORING_MODES:
+        raise ValueError(f"Unknown scoring mode {scoring_mode!r}; expected one of {', '.join(SCORING_MODES)}")
+    return mode
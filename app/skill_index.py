@@ -0,0 +1,553 @@
+"""Vectorized skill index for ranking stored resumes against a job posting.
+
+Every indexed resume is reduced to the same stemmed, synonym-folded terms the
+local scoring engine uses (``app.scoring.terms`` over its keywords and
+summary), so a ranked score equals ``score_locally`` for that resume without
+running any agent.
+
+Layout, all NumPy:
+
+- a vocabulary mapping term -> column id
+- a forward CSR matrix (resume row -> term ids), i.e. one sparse bit-vector per resume
+- an inverted CSR index (term id -> resume rows) used to build the hit matrix
+
+Scoring a JobAnalysis is one scatter over the job terms' postings and one
+matrix product against the job's item/term incidence matrix.
+
+Adds go to a small in-memory delta segment and removes tombstone base rows;
+both are merged into the base arrays on ``compact()``, which also runs before
+every save. ``save()`` writes plain ``.npy`` files plus ``meta.json`` (every
+``SKILL_INDEX_SAVE_EVERY`` changes in a background thread, and on shutdown)
+and ``load()`` memory-maps them, so startup cost does not grow with the index.
+
+Every tenant has its own index (``SkillIndexes``): a tenant only ranks and
+removes the resumes it submitted itself.
+
+With ``SKILL_INDEX_DB`` set, adds and removes go to a SQLite changelog shared
+by every API process (``SkillIndexStore``), and each process replays the
+changes it has not seen before answering from its in-memory indexes, so every
+process ranks and deletes the same pool. With ``SKILL_INDEX_DIR`` as well,
+every tenant's index is saved there together with the changelog ``seq`` it
+covers (``snapshot.json``), one process at a time; a process starting up
+memory-maps the snapshot and replays only the newer changes.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote, unquote
+import numpy as np
+from app.models import JobAnalysis, ResumeAnalysis
+from app.scoring import SECTION_WEIGHTS, terms
+
+logger = logging.getLogger(__name__)
+
+SKILL_INDEX_DIR = os.getenv("SKILL_INDEX_DIR")  # e.g. data/skill_index, one subdirectory per tenant; unset = memory only
+SKILL_INDEX_DB = os.getenv("SKILL_INDEX_DB")  # e.g. data/skill_index.db, shared by every API process; wins over SKILL_INDEX_DIR
+SKILL_INDEX_SAVE_EVERY = int(os.getenv("SKILL_INDEX_SAVE_EVERY", "100"))  # changes between saves
+SKILL_INDEX_DELTA_MAX = int(os.getenv("SKILL_INDEX_DELTA_MAX", "1000"))  # delta rows before compaction
+
+_ARRAYS = ("indptr", "indices", "inv_indptr", "inv_rows")
+_META_FILE = "meta.json"
+_SNAPSHOT_FILE = "snapshot.json"  # changelog seq the tenant indexes under SKILL_INDEX_DIR cover
+
+
+class RankedResume(NamedTuple):
+    resume_sha256: str
+    ats_score: int                  # same value score_locally would give
+    coverage: Dict[str, float]      # mean term coverage per job analysis section, 0..1
+
+
+def _empty_int(dtype=np.int32) -> np.ndarray:
+    return np.zeros(0, dtype=dtype)
+
+
+def resume_terms(analysis: ResumeAnalysis) -> List[str]:
+    """The terms a resume is indexed under."""
+    return sorted(terms(" ; ".join([*analysis.keywords, analysis.summary])))
+
+
+class SkillIndex:
+    """Thread-safe term index over resume analyses, keyed by resume SHA-256."""
+
+    def __init__(self, path: Optional[str] = None, autosave: bool = True):
+        self.path = path
+        self.autosave = autosave  # save every SKILL_INDEX_SAVE_EVERY changes; off when SkillIndexes saves them together
+        self._lock = threading.RLock()
+        self._vocab: Dict[str, int] = {}
+        self._terms: List[str] = []
+        # Base segment (possibly memory-mapped)
+        self._ids: List[str] = []
+        self._row_of: Dict[str, int] = {}
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._indices = _empty_int()
+        self._inv_indptr = np.zeros(1, dtype=np.int64)
+        self._inv_rows = _empty_int()
+        self._alive = np.zeros(0, dtype=bool)
+        # Delta segment: resumes added since the last compaction
+        self._delta: Dict[str, np.ndarray] = {}
+        self._changes = 0
+        self._saving = False
+        self._version: Optional[str] = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self._alive.sum()) + len(self._delta)
+
+    def __contains__(self, resume_sha256: str) -> bool:
+        with self._lock:
+            row = self._row_of.get(resume_sha256)
+            return resume_sha256 in self._delta or (row is not None and bool(self._alive[row]))
+
+    def _term_ids(self, resume_terms: Iterable[str]) -> np.ndarray:
+        ids = []
+        for term in resume_terms:
+            term_id = self._vocab.get(term)
+            if term_id is None:
+                term_id = self._vocab[term] = len(self._terms)
+                self._terms.append(term)
+            ids.append(term_id)
+        return np.array(sorted(ids), dtype=np.int32)
+
+    def add(self, resume_sha256: str, analysis: ResumeAnalysis):
+        """Index (or re-index) one resume."""
+        self.add_terms(resume_sha256, resume_terms(analysis))
+
+    def add_terms(self, resume_sha256: str, resume_terms: Iterable[str]):
+        """Index (or re-index) one resume from its ``resume_terms``."""
+        with self._lock:
+            self._tombstone(resume_sha256)
+            self._delta[resume_sha256] = self._term_ids(resume_terms)
+            self._changed()
+            if len(self._delta) >= SKILL_INDEX_DELTA_MAX:
+                self.compact()
+
+    def remove(self, resume_sha256: str) -> bool:
+        """Drop a resume from the index. Returns whether it was indexed."""
+        with self._lock:
+            removed = self._delta.pop(resume_sha256, None) is not None
+            removed = self._tombstone(resume_sha256) or removed
+            if removed:
+                self._changed()
+            return removed
+
+    def _tombstone(self, resume_sha256: str) -> bool:
+        row = self._row_of.get(resume_sha256)
+        if row is None or not self._alive[row]:
+            return False
+        self._alive[row] = False
+        return True
+
+    def _changed(self):
+        self._changes += 1
+        if self.path and self.autosave and self._changes >= SKILL_INDEX_SAVE_EVERY and not self._saving:
+            # Saved in the background so the request that crossed the threshold does not wait for the write
+            self._saving = True
+            threading.Thread(target=self._save_in_background, name="skill-index-save", daemon=True).start()
+
+    def _save_in_background(self):
+        try:
+            self.save()
+        except Exception as e:
+            logger.warning(f"⚠️ Skill index save failed: {e}")
+        finally:
+            self._saving = False
+
+    def compact(self):
+        """Merge live base rows and the delta segment into fresh in-memory CSR arrays."""
+        with self._lock:
+            ids, rows = [], []
+            for row, resume_sha256 in enumerate(self._ids):
+                if self._alive[row]:
+                    ids.append(resume_sha256)
+                    rows.append(self._indices[self._indptr[row]:self._indptr[row + 1]])
+            for resume_sha256, term_ids in self._delta.items():
+                ids.append(resume_sha256)
+                rows.append(term_ids)
+
+            lengths = np.array([len(r) for r in rows], dtype=np.int64)
+            indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=indptr[1:])
+            indices = np.concatenate(rows).astype(np.int32) if rows else _empty_int()
+
+            # Inverted index: sort (term, row) pairs by term
+            row_ids = np.repeat(np.arange(len(rows), dtype=np.int32), lengths)
+            order = np.argsort(indices, kind="stable")
+            inv_rows = row_ids[order]
+            inv_indptr = np.zeros(len(self._terms) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(indices, minlength=len(self._terms)), out=inv_indptr[1:])
+
+            self._ids = ids
+            self._row_of = {resume_sha256: row for row, resume_sha256 in enumerate(ids)}
+            self._indptr, self._indices = indptr, indices
+            self._inv_indptr, self._inv_rows = inv_indptr, inv_rows
+            self._alive = np.ones(len(ids), dtype=bool)
+            self._delta = {}
+
+    def _hit_matrix(self, job_term_ids: np.ndarray) -> np.ndarray:
+        """Rows = base rows then delta rows, columns = job terms; True where the resume has the term."""
+        base_rows = len(self._ids)
+        hits = np.zeros((base_rows + len(self._delta), len(job_term_ids)), dtype=np.float64)
+        known_terms = len(self._inv_indptr) - 1
+        for col, term_id in enumerate(job_term_ids):
+            if term_id < known_terms:
+                hits[self._inv_rows[self._inv_indptr[term_id]:self._inv_indptr[term_id + 1]], col] = 1.0
+        for offset, term_ids in enumerate(self._delta.values()):
+            hits[base_rows + offset] = np.isin(job_term_ids, term_ids)
+        return hits
+
+    def rank(self, job_analysis: JobAnalysis, top_k: int = 20) -> List[RankedResume]:
+        """Score every indexed resume against the job and return the ``top_k`` best, highest first."""
+        items = []  # (section, terms) per non-empty job item, as score_locally sees them
+        for section in SECTION_WEIGHTS:
+            for item in getattr(job_analysis, section):
+                item_terms = terms(item)
+                if item_terms:
+                    items.append((section, item_terms))
+
+        with self._lock:
+            ids = [*self._ids, *self._delta]
+            alive = np.concatenate([self._alive, np.ones(len(self._delta), dtype=bool)])
+            if not items or not alive.any():
+                return []
+
+            # Item/term incidence: column i has a 1 for every known term of item i
+            job_term_ids = sorted({self._vocab[t] for _, item_terms in items for t in item_terms if t in self._vocab})
+            column = {term_id: col for col, term_id in enumerate(job_term_ids)}
+            incidence = np.zeros((len(job_term_ids), len(items)), dtype=np.float64)
+            for i, (_, item_terms) in enumerate(items):
+                for t in item_terms:
+                    if t in self._vocab:
+                        incidence[column[self._vocab[t]], i] = 1.0
+            sizes = np.array([len(item_terms) for _, item_terms in items], dtype=np.float64)
+
+            # (resumes x items) fraction of each item's terms the resume covers
+            item_coverage = self._hit_matrix(np.array(job_term_ids, dtype=np.int64)) @ incidence / sizes
+
+        sections = {}
+        weighted = np.zeros(len(ids), dtype=np.float64)
+        total_weight = 0.0
+        for section, weight in SECTION_WEIGHTS.items():
+            cols = [i for i, (s, _) in enumerate(items) if s == section]
+            if cols:
+                sections[section] = item_coverage[:, cols].mean(axis=1)
+                weighted += weight * sections[section]
+                total_weight += weight
+        score = np.where(alive, weighted / total_weight, -1.0)
+
+        live = int(alive.sum())
+        top_k = max(0, min(top_k, live))
+        if top_k == 0:
+            return []
+        best = np.argpartition(-score, top_k - 1)[:top_k] if top_k < len(score) else np.arange(len(score))
+        best = best[np.lexsort((best, -score[best]))]  # score desc, then insertion order
+        return [
+            RankedResume(
+                ids[row],
+                round(100 * float(score[row])),
+                {section: round(float(values[row]), 4) for section, values in sections.items()},
+            )
+            for row in best
+        ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "resumes": len(self),
+                "vocabulary": len(self._terms),
+                "base_rows": len(self._ids),
+                "delta_rows": len(self._delta),
+                "tombstones": int((~self._alive).sum()),
+                "nonzeros": int(len(self._indices) + sum(len(v) for v in self._delta.values())),
+                "path": self.path,
+                "version": self._version,
+            }
+
+    def save(self):
+        """Compact and write the index under ``self.path``; the previous version stays valid until meta.json is swapped."""
+        if not self.path:
+            return
+        with self._lock:
+            self.compact()
+            os.makedirs(self.path, exist_ok=True)
+            version = uuid.uuid4().hex[:12]
+            arrays = {
+                "indptr": self._indptr,
+                "indices": self._indices,
+                "inv_indptr": self._inv_indptr,
+                "inv_rows": self._inv_rows,
+            }
+            for name, array in arrays.items():
+                np.save(os.path.join(self.path, f"{name}.{version}.npy"), np.ascontiguousarray(array))
+            meta = {"version": version, "terms": self._terms, "ids": self._ids}
+            tmp_path = os.path.join(self.path, _META_FILE + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, os.path.join(self.path, _META_FILE))
+            self._version = version
+            self._changes = 0
+
+            # Old versions are no longer referenced by meta.json
+            for filename in os.listdir(self.path):
+                if filename.endswith(".npy") and f".{version}." not in filename:
+                    try:
+                        os.remove(os.path.join(self.path, filename))
+                    except OSError as e:
+                        logger.warning(f"⚠️ Could not remove old skill index file {filename}: {e}")
+            logger.info(f"💾 Skill index saved: {len(self._ids)} resumes, {len(self._terms)} terms ({version})")
+
+    @classmethod
+    def load(cls, path: str, autosave: bool = True) -> "SkillIndex":
+        """Memory-map a saved index; a missing or unreadable index starts empty."""
+        index = cls(path, autosave)
+        meta_path = os.path.join(path, _META_FILE)
+        if not os.path.exists(meta_path):
+            return index
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            version = meta["version"]
+            arrays = {
+                name: np.load(os.path.join(path, f"{name}.{version}.npy"), mmap_mode="r")
+                for name in _ARRAYS
+            }
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"⚠️ Could not load skill index from {path} ({e}), starting empty")
+            return index
+
+        index._terms = meta["terms"]
+        index._vocab = {term: term_id for term_id, term in enumerate(index._terms)}
+        index._ids = meta["ids"]
+        index._row_of = {resume_sha256: row for row, resume_sha256 in enumerate(index._ids)}
+        index._indptr, index._indices = arrays["indptr"], arrays["indices"]
+        index._inv_indptr, index._inv_rows = arrays["inv_indptr"], arrays["inv_rows"]
+        index._alive = np.ones(len(index._ids), dtype=bool)
+        index._version = version
+        logger.info(f"📚 Skill index loaded: {len(index._ids)} resumes, {len(index._terms)} terms ({version})")
+        return index
+
+
+class SkillIndexStore:
+    """Every tenant's adds and removes in SQLite, shared by all API processes.
+
+    One row per tenant and resume, holding its terms or NULL once removed.
+    Rewriting a row gives it a new ``seq``, so a process catches up by
+    replaying the rows after the last ``seq`` it applied.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS skill_index_entries ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, tenant TEXT NOT NULL, resume_sha256 TEXT NOT NULL, "
+                "terms TEXT, UNIQUE (tenant, resume_sha256))"
+            )
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation keeps the store safe across threads and processes.
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def put(self, tenant: str, resume_sha256: str, resume_terms: Optional[List[str]]):
+        """Record the resume's terms for ``tenant``, or its removal when ``resume_terms`` is ``None``."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO skill_index_entries (tenant, resume_sha256, terms) VALUES (?, ?, ?)",
+                (tenant, resume_sha256, None if resume_terms is None else json.dumps(resume_terms)),
+            )
+
+    @contextmanager
+    def exclusive(self):
+        """Hold the store's write lock, so one process at a time saves snapshots."""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            finally:
+                conn.execute("ROLLBACK")
+        finally:
+            conn.close()
+
+    def changes(self, after: int) -> List[Tuple[int, str, str, Optional[List[str]]]]:
+        """(seq, tenant, resume, terms or ``None``) of every row written after ``after``, oldest first."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT seq, tenant, resume_sha256, terms FROM skill_index_entries WHERE seq > ? ORDER BY seq",
+                (after,),
+            ).fetchall()
+        return [(seq, tenant, sha, None if data is None else json.loads(data)) for seq, tenant, sha, data in rows]
+
+
+class SkillIndexes:
+    """One ``SkillIndex`` per tenant, persisted under ``directory/<tenant>`` and kept in sync through a ``store``."""
+
+    def __init__(self, directory: Optional[str] = None, store: Optional[SkillIndexStore] = None):
+        self.directory = directory
+        self.store = store
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._seq = 0  # last store change applied
+        self._unsaved = 0  # store changes applied since the last snapshot
+        self._saving = False
+        self._indexes: Dict[str, SkillIndex] = {}
+        if not directory or not os.path.isdir(directory):
+            return
+        if os.path.exists(os.path.join(directory, _META_FILE)):
+            logger.warning(f"⚠️ Ignoring the skill index in {directory}: it predates per-tenant indexes")
+        if store is not None:
+            self._seq = self._snapshot_seq()
+            if not self._seq:
+                # Indexes saved without the store are not in its changelog; it is replayed from the start
+                return
+        for name in sorted(os.listdir(directory)):
+            if os.path.isdir(os.path.join(directory, name)):
+                self._indexes[unquote(name)] = SkillIndex.load(os.path.join(directory, name), store is None)
+        if store is not None:
+            logger.info(f"📚 Skill index snapshot covers store changes up to {self._seq}")
+
+    def _snapshot_seq(self) -> int:
+        try:
+            with open(os.path.join(self.directory, _SNAPSHOT_FILE), encoding="utf-8") as f:
+                return int(json.load(f)["seq"])
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"⚠️ Unreadable skill index snapshot in {self.directory} ({e}), replaying the store")
+            return 0
+
+    def _index(self, tenant: str) -> SkillIndex:
+        with self._lock:
+            index = self._indexes.get(tenant)
+            if index is None:
+                path = os.path.join(self.directory, quote(tenant, safe="")) if self.directory else None
+                index = self._indexes[tenant] = SkillIndex(path, autosave=self.store is None)
+            return index
+
+    def sync(self):
+        """Apply the changes other processes made to the store since the last sync."""
+        if self.store is None:
+            return
+        with self._sync_lock:
+            try:
+                changes = self.store.changes(self._seq)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Skill index store read failed, answering from this process's copy: {e}")
+                return
+            for seq, tenant, resume_sha256, resume_terms in changes:
+                if resume_terms is None:
+                    self._index(tenant).remove(resume_sha256)
+                else:
+                    self._index(tenant).add_terms(resume_sha256, resume_terms)
+                self._seq = seq
+            self._unsaved += len(changes)
+            if self.directory and self._unsaved >= SKILL_INDEX_SAVE_EVERY and not self._saving:
+                self._saving = True
+                threading.Thread(target=self._save_in_background, name="skill-index-save", daemon=True).start()
+
+    def _save_in_background(self):
+        try:
+            self.save()
+        except Exception as e:
+            logger.warning(f"⚠️ Skill index snapshot failed: {e}")
+        finally:
+            self._saving = False
+
+    def for_tenant(self, tenant: str) -> SkillIndex:
+        self.sync()
+        return self._index(tenant)
+
+    def add(self, tenant: str, resume_sha256: str, analysis: ResumeAnalysis):
+        if self.store is None:
+            self._index(tenant).add(resume_sha256, analysis)
+            return
+        self.store.put(tenant, resume_sha256, resume_terms(analysis))
+        self.sync()
+
+    def remove(self, tenant: str, resume_sha256: str) -> bool:
+        """Drop a resume from the tenant's index. Returns whether it was indexed."""
+        if self.store is None:
+            return self._index(tenant).remove(resume_sha256)
+        if resume_sha256 not in self.for_tenant(tenant):
+            return False
+        self.store.put(tenant, resume_sha256, None)
+        self.sync()
+        return True
+
+    def owners(self, resume_sha256: str) -> List[str]:
+        """Tenants whose index holds the resume."""
+        self.sync()
+        with self._lock:
+            indexes = list(self._indexes.items())
+        return [tenant for tenant, index in indexes if resume_sha256 in index]
+
+    def __len__(self) -> int:
+        self.sync()
+        with self._lock:
+            indexes = list(self._indexes.values())
+        return sum(len(index) for index in indexes)
+
+    def save(self):
+        """Save every tenant's index; with a store, as one snapshot unless a newer one is already saved."""
+        if self.store is None:
+            with self._lock:
+                indexes = list(self._indexes.values())
+            for index in indexes:
+                index.save()
+            return
+        if not self.directory:
+            return
+        # No changes are applied while saving, so every tenant's index is at the same seq
+        with self._sync_lock, self.store.exclusive():
+            if self._snapshot_seq() >= self._seq:
+                self._unsaved = 0
+                return
+            with self._lock:
+                indexes = list(self._indexes.values())
+            for index in indexes:
+                index.save()
+            # Written last: a crash before this replays changes the tenant indexes may already hold, which is harmless
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = os.path.join(self.directory, _SNAPSHOT_FILE + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"seq": self._seq}, f)
+            os.replace(tmp_path, os.path.join(self.directory, _SNAPSHOT_FILE))
+            self._unsaved = 0
+            logger.info(f"💾 Skill index snapshot saved at store change {self._seq}")
+
+
+skill_indexes = SkillIndexes(SKILL_INDEX_DIR, SkillIndexStore(SKILL_INDEX_DB) if SKILL_INDEX_DB else None)
+
+
+def index_resume(tenant: str, resume_sha256: Optional[str], analysis: Optional[ResumeAnalysis]):
+    """Add a resume the tenant submitted to its index. Never raises.
+
+    Without ``analysis`` (an answer from the result store or a coalesced
+    request) the cached analysis of the resume is used, when there is one.
+    """
+    if not resume_sha256:
+        return
+    try:
+        if analysis is None:
+            # Imported here: the analysis cache pulls in the agent modules
+            from app.analysis_cache import get_cached_resume_analysis
+
+            analysis = get_cached_resume_analysis(resume_sha256)
+            if analysis is None:
+                return
+        skill_indexes.add(tenant, resume_sha256, analysis)
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to index resume {resume_sha256[:12]}: {e}")
@@ -0,0 +1,175 @@
+"""Startup warm-up, readiness and import-time profiling.
+
+Importing ``app.main`` loads neither crewai, litellm nor crewai_tools: they
+are imported on first use by the agent and task builders, the LLM gateway
+and the crew runner, so the server is up and ``/healthz`` answers in well
+under a second. ``warm_up`` then does what the first review would otherwise
+pay for: it imports crewai, fills the stage pools (``app.pool``) and loads
+the tokenizer, timing each step. ``STARTUP_WARMUP`` decides when:
+
+- ``background`` (default): the server answers at once and ``/readyz`` says
+  ``503`` until warm-up has finished, so load balancers wait for it;
+- ``blocking``: the server starts accepting requests after warm-up;
+- ``off``: nothing is loaded before a request needs it.
+
+``python -m app.run imports`` reports where import time goes.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+WARMUP_BACKGROUND = "background"
+WARMUP_BLOCKING = "blocking"
+WARMUP_OFF = "off"
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", WARMUP_BACKGROUND).lower()  # "background", "blocking" or "off"
+
+STATE_STARTING = "starting"
+STATE_WARMING = "warming"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+STATE_STOPPING = "stopping"
+
+_STARTED_AT = time.monotonic()
+
+
+class Readiness:
+    """Warm-up progress of this process, as reported by ``/readyz``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = STATE_STARTING
+        self.steps: Dict[str, float] = {}  # step -> seconds
+        self.error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == STATE_READY
+
+    def set_state(self, state: str, error: Optional[str] = None):
+        with self._lock:
+            # Once stopping, a late warm-up never makes the process ready again
+            if self.state != STATE_STOPPING:
+                self.state = state
+                self.error = error
+
+    def record_step(self, step: str, seconds: float):
+        with self._lock:
+            self.steps[step] = seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            snapshot = {
+                "status": self.state,
+                "warmup_mode": STARTUP_WARMUP,
+                "uptime_seconds": round(time.monotonic() - _STARTED_AT, 3),
+                "warmup_steps_ms": {step: round(seconds * 1000, 1) for step, seconds in self.steps.items()},
+            }
+            if self.error:
+                snapshot["error"] = self.error
+            return snapshot
+
+
+readiness = Readiness()
+_warm_up_task: Optional[asyncio.Task] = None
+
+
+def _import_crewai():
+    import crewai  # noqa: F401  (also loads litellm)
+
+
+def warm_up(pools: bool = True):
+    """Load the heavy dependencies, fill the stage pools and load the tokenizer, timing each step.
+
+    ``pools=False`` (API processes in ``queue`` executor mode) skips all of it: the review
+    workers build the prompts and run the crews there, so nothing is left to warm and the
+    process is ready at once. Failures are logged and leave the process not ready.
+    """
+    # Imported here: app.pool pulls in the task and agent modules
+    from app.pool import warm_pools
+    from app.token_budget import warm_tokenizer
+
+    steps = [("imports", _import_crewai), ("stage_pools", warm_pools), ("tokenizer", warm_tokenizer)] if pools else []
+    readiness.set_state(STATE_WARMING)
+    started = time.perf_counter()
+    for step, fn in steps:
+        step_started = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            logger.exception(f"💥 Warm-up step {step} failed: {e}")
+            readiness.set_state(STATE_FAILED, f"{step}: {type(e).__name__}: {e}")
+            return
+        readiness.record_step(step, time.perf_counter() - step_started)
+    readiness.set_state(STATE_READY)
+    timings = ", ".join(f"{step} {seconds:.2f}s" for step, seconds in readiness.steps.items())
+    logger.info(f"🔥 Warm-up finished in {time.perf_counter() - started:.2f}s ({timings})")
+
+
+async def start_warm_up(pools: bool = True):
+    """Run ``warm_up`` the way ``STARTUP_WARMUP`` says; called from the app lifespan."""
+    global _warm_up_task
+    if STARTUP_WARMUP == WARMUP_OFF:
+        readiness.set_state(STATE_READY)
+    elif STARTUP_WARMUP == WARMUP_BLOCKING:
+        await asyncio.to_thread(warm_up, pools)
+    elif STARTUP_WARMUP == WARMUP_BACKGROUND:
+        _warm_up_task = asyncio.create_task(asyncio.to_thread(warm_up, pools))
+    else:
+        raise ValueError(f"Unsupported STARTUP_WARMUP: {STARTUP_WARMUP}")
+
+
+def mark_stopping():
+    """Report not ready from now on, so load balancers stop routing here during shutdown."""
+    readiness.set_state(STATE_STOPPING)
+
+
+class ImportTiming(NamedTuple):
+    module: str
+    self_seconds: float
+    cumulative_seconds: float
+    depth: int  # 0 = imported directly by the profiled statement
+
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_profile(module: str = "app.main") -> List[ImportTiming]:
+    """Import timings of ``module`` in a fresh interpreter (``python -X importtime``), in import order."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env={**os.environ, "PYTHONWARNINGS": "ignore"},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    timings = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            timings.append(ImportTiming(name, int(own) / 1e6, int(cumulative) / 1e6, (len(indent) - 1) // 2))
+    return timings
+
+
+def format_import_profile(module: str, timings: List[ImportTiming], top: int = 20) -> str:
+    """Total import time, the slowest top-level packages by own time and the slowest modules overall."""
+    total = next((t.cumulative_seconds for t in reversed(timings) if t.module == module), 0.0)
+    packages: Dict[str, float] = {}
+    for timing in timings:
+        root = timing.module.split(".", 1)[0]
+        packages[root] = packages.get(root, 0.0) + timing.self_seconds
+    lines = [f"import {module}: {total:.3f}s, {len(timings)} modules", "", "by package (own time):"]
+    for root, seconds in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        lines.append(f"  {seconds:8.3f}s  {root}")
+    lines += ["", "slowest modules (including their imports):"]
+    for timing in sorted(timings, key=lambda t: -t.cumulative_seconds)[:top]:
+        lines.append(f"  {timing.cumulative_seconds:8.3f}s  {'  ' * min(timing.depth, 8)}{timing.module}")
+    return "\n".join(lines)
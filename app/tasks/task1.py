@@ -1,36 +1,47 @@
-from crewai import Task
+import hashlib
+from typing import Optional
 from app.agents.agent1 import build_resume_analyzer_agent
 from app.PDF_RAG import create_pdf_rag_tool
 from app.models import ResumeAnalysis
-from crewai.knowledge.source.pdf_knowledge_source import PDFKnowledgeSource
+from app.repair import repairing_converter_class
 
 TASK_DESCRIPTION = (
-    "Read ONLY the resume located at {resume_path}. "
-    "You MUST treat this execution as fully isolated: no prior resumes, no cached memory, and no external documents exist. "
-    "Analyze the entire document (experience, education, skills, certifications, projects). "
-    "Strict Rules:\n"
-    "- Only include information explicitly present in the PDF.\n"
-    "- Do NOT infer or hallucinate missing dates, employers, degrees, or skills.\n"
-    "- Every keyword MUST appear verbatim (case-insensitive) or as a simple stem (e.g., 'analyzing' vs 'analyze').\n"
-    "- If uncertain whether a concept is present, exclude it.\n"
-    "- No external knowledge injection.\n"
-    "Flexibility:\n"
-    "- Include ALL relevant keywords: technical, tools, methodologies, domains, soft skills, certifications.\n"
-    "- The keyword list length is flexible—prefer completeness over brevity.\n"
-    "Quality:\n"
-    "- JSON only. No comments, no markdown, no surrounding text.\n"
-    "- Preserve meaning; keep summary factual and grounded in text."
+    "Analyze ONLY the resume at {resume_path} (experience, education, skills, certifications, projects). "
+    "Nothing else exists: no prior resumes, memory or outside knowledge.\n"
+    "Rules:\n"
+    "- Use only what the resume states; never infer dates, employers, degrees or skills. If unsure, exclude it.\n"
+    "- Every keyword must appear verbatim (case-insensitive) or as a simple stem ('analyzing'/'analyze').\n"
+    "- Include ALL relevant keywords (technical, tools, methods, domains, soft skills, certifications); "
+    "prefer completeness.\n"
+    "- Factual summary. JSON only: no markdown, comments or surrounding text."
 )
 
 EXPECTED_OUTPUT = "{\"summary\": \"...\", \"keywords\": [\"Skill1\", \"Skill2\", \"Certification\", \"Tool\"] }"
 
-def build_resume_analysis_task(path : str):
+# Appended when the extracted text is injected into the prompt instead of read through knowledge RAG.
+RESUME_TEXT_INPUT = (
+    "\nThe full text extracted from that PDF follows; it is the complete and only content of the resume.\n"
+    "Resume text:\n{resume_text}\n"
+)
+
+# Changes whenever the prompt changes, so cached analyses from older prompts are never reused.
+RESUME_ANALYSIS_PROMPT_VERSION = hashlib.sha256(
+    (TASK_DESCRIPTION + RESUME_TEXT_INPUT + EXPECTED_OUTPUT).encode("utf-8")
+).hexdigest()[:12]
+
+def build_resume_analysis_task(path : Optional[str] = None):
+    """Resume analysis task. Without ``path`` the agent has no knowledge source and reads
+    the extracted text from the ``resume_text`` kickoff input instead."""
+    from crewai import Task
+
     agent = build_resume_analyzer_agent(path)
+    description = TASK_DESCRIPTION if path else TASK_DESCRIPTION + RESUME_TEXT_INPUT
     return Task(
-        description=TASK_DESCRIPTION,
+        description=description,
         expected_output=EXPECTED_OUTPUT,
         agent=agent,
-        output_json=ResumeAnalysis
+        output_json=ResumeAnalysis,
+        converter_cls=repairing_converter_class()
     )
 
 # Backwards compatibility variable (will be rebuilt per request in main)
@@ -1,21 +1,44 @@
-from crewai import Task
-from app.agents.agent2 import job_analyzer_agent
+import hashlib
+from app.agents import agent2
+from app.agents.agent2 import build_job_analyzer_agent
 from app.models import JobAnalysis
+from app.repair import repairing_converter_class
 
-job_analysis_task = Task(
-    description=(
-        "Analyze the provided job description: {job_description}. "
-        "Notes:\n"
-        "- Extract ALL relevant keywords, not just technical ones (include tools, methodologies, industries, certifications, soft skills, etc.).\n"
-        "- Responsibilities should describe what the candidate will do if hired.\n"
-        "- Requirements should describe what the candidate must already have (skills, education, years of experience).\n"
-        "- Do not add information that is not explicitly in the job description."
-    ),
-    expected_output=(
-        "{\"keywords\": [\"Java\", \"Spring Boot\", \"AWS\", \"Agile\"], "
-        "\"responsibilities\": [\"Design scalable APIs\", \"Collaborate with product team\"], "
-        "\"requirements\": [\"5+ years experience\", \"Bachelor’s in Computer Science\"] }"
-    ),
-    agent=job_analyzer_agent,
-    output_json=JobAnalysis
+JOB_ANALYSIS_DESCRIPTION = (
+    "Analyze this job description:\n{job_description}\n"
+    "Rules:\n"
+    "- keywords: ALL relevant ones, not only technical (tools, methods, industries, certifications, soft skills).\n"
+    "- responsibilities: what the hire will do. requirements: what they must already have "
+    "(skills, education, years of experience).\n"
+    "- Nothing that is not explicitly in the job description."
 )
+
+EXPECTED_JOB_OUTPUT = (
+    "{\"keywords\": [\"Java\", \"Spring Boot\", \"AWS\", \"Agile\"], "
+    "\"responsibilities\": [\"Design scalable APIs\", \"Collaborate with product team\"], "
+    "\"requirements\": [\"5+ years experience\", \"Bachelor’s in Computer Science\"] }"
+)
+
+# Changes whenever the prompt changes, so cached analyses from older prompts are never reused.
+JOB_ANALYSIS_PROMPT_VERSION = hashlib.sha256(
+    (JOB_ANALYSIS_DESCRIPTION + EXPECTED_JOB_OUTPUT).encode("utf-8")
+).hexdigest()[:12]
+
+def build_job_analysis_task(agent=None):
+    """Job analysis task with its own agent unless one is given (see app.pool)."""
+    from crewai import Task
+
+    return Task(
+        description=JOB_ANALYSIS_DESCRIPTION,
+        expected_output=EXPECTED_JOB_OUTPUT,
+        agent=agent or build_job_analyzer_agent(),
+        output_json=JobAnalysis,
+        converter_cls=repairing_converter_class()
+    )
+
+# Backwards compatibility variable, built on first access
+def __getattr__(name):
+    if name == "job_analysis_task":
+        globals()[name] = build_job_analysis_task(agent2.job_analyzer_agent)
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
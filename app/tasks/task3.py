@@ -1,27 +1,84 @@
-from crewai import Task
-from app.agents.agent3 import score_generator_agent
-from app.tasks.task2 import job_analysis_task
-from app.models import CVAnalysis
+import hashlib
+from app.agents.agent3 import build_score_generator_agent
+from app.models import CVAnalysis, CVAnalysisDetails
+from app.repair import repairing_converter_class
 
 ATS_DESCRIPTION = (
-    "Use the outputs from the resume analysis (parsed resume JSON) and job description analysis. "
-    "Compute an ATS score (0-100) based on overlap of keywords, responsibilities, and requirements. "
+    "Compute an ATS score (0-100) for the resume analysis against the job description analysis, "
+    "from the overlap of keywords, responsibilities and requirements.\n"
     "Rules:\n"
-    "- strengths & weaknesses are STRING lists (semicolon or newline separated).\n"
-    "- Base scoring primarily on factual overlap but do not expect full accuracy between keywords; do not hallucinate.\n"
-    "- Keep summary concise and grounded.\n"
+    "- strengths & weaknesses are STRINGS (semicolon or newline separated lists).\n"
+    "- Score on factual overlap; keywords need not match exactly. Do not hallucinate.\n"
+    "- Concise, grounded summary.\n"
+)
+
+# Appended when an analysis is passed as kickoff input instead of task context.
+RESUME_ANALYSIS_INPUT = (
+    "\nResume analysis (JSON): {resume_analysis_json}\n"
+)
+JOB_ANALYSIS_INPUT = (
+    "\nJob description analysis (JSON): {job_analysis_json}\n"
 )
 
 EXPECTED_ATS_OUTPUT = "{\"ats_score\": 0-100, \"analysis\": {\"strengths\": \"...\", \"weaknesses\": \"...\", \"summary\": \"...\"} }"
 
-def build_ats_score_task(resume_analysis_task):
+def build_ats_score_task(resume_analysis_task=None, job_task=None, agent=None):
+    """ATS scoring task. An analysis without a task in the same crew is read from the
+    ``resume_analysis_json`` / ``job_analysis_json`` kickoff input instead. Gets its own
+    agent unless one is given (see app.pool)."""
+    from crewai import Task
+
+    description = ATS_DESCRIPTION
+    context = []
+    if resume_analysis_task is None:
+        description += RESUME_ANALYSIS_INPUT
+    else:
+        context.append(resume_analysis_task)
+    if job_task is None:
+        description += JOB_ANALYSIS_INPUT
+    else:
+        context.append(job_task)
     return Task(
-        description=ATS_DESCRIPTION,
+        description=description,
         expected_output=EXPECTED_ATS_OUTPUT,
-        agent=score_generator_agent,
-        context=[resume_analysis_task, job_analysis_task],
-        output_json=CVAnalysis
+        agent=agent or build_score_generator_agent(),
+        context=context,
+        output_json=CVAnalysis,
+        converter_cls=repairing_converter_class()
+    )
+
+# Hybrid scoring: the score is fixed by app.scoring, the agent only writes the feedback.
+ATS_FEEDBACK_DESCRIPTION = (
+    "The ATS score for this resume against the job description has already been computed: {ats_score}/100.\n"
+    "Job items matched by the resume: {matched_items}\n"
+    "Job items missing from the resume: {missing_items}\n"
+    "Write the structured feedback for this score from these items and the resume analysis below.\n"
+    "Rules:\n"
+    "- Do not recompute or mention a different score.\n"
+    "- strengths & weaknesses are STRINGS (semicolon or newline separated lists).\n"
+    "- Ground every point in the items above; do not hallucinate.\n"
+    "- Concise, grounded summary.\n"
+) + RESUME_ANALYSIS_INPUT
+
+EXPECTED_ATS_FEEDBACK_OUTPUT = "{\"strengths\": \"...\", \"weaknesses\": \"...\", \"summary\": \"...\"}"
+
+def build_ats_feedback_task(agent=None):
+    """Feedback-only task for hybrid scoring; inputs: ats_score, matched_items, missing_items and resume_analysis_json."""
+    from crewai import Task
+
+    return Task(
+        description=ATS_FEEDBACK_DESCRIPTION,
+        expected_output=EXPECTED_ATS_FEEDBACK_OUTPUT,
+        agent=agent or build_score_generator_agent(),
+        output_json=CVAnalysisDetails,
+        converter_cls=repairing_converter_class()
     )
 
+# Changes whenever a scoring prompt changes, so stored results from older prompts are never reused.
+ATS_PROMPT_VERSION = hashlib.sha256(
+    (ATS_DESCRIPTION + RESUME_ANALYSIS_INPUT + JOB_ANALYSIS_INPUT + EXPECTED_ATS_OUTPUT
+     + ATS_FEEDBACK_DESCRIPTION + EXPECTED_ATS_FEEDBACK_OUTPUT).encode("utf-8")
+).hexdigest()[:12]
+
 # Backwards compatibility variable
 ats_score_task = None
\ No newline at end of file
@@ -0,0 +1,322 @@
+"""Trace ids, timing spans and Prometheus-style metrics.
+
+Every HTTP request gets a trace id (``X-Trace-Id`` response header, taken from
+an incoming ``traceparent`` or ``X-Trace-Id`` when present). ``span(name)``
+times a block of work under that trace: the duration goes into the
+``resume_reviewer_span_duration_seconds`` histogram and the log, and, when
+``OTEL_EXPORTER_OTLP_ENDPOINT`` is set, into an OpenTelemetry span exported
+over OTLP/HTTP to that collector. ``render_metrics`` renders every metric
+plus the registered collectors in the Prometheus text format for ``/metrics``.
+
+The trace id lives in a context variable; worker threads see it when they are
+started through ``contextvars.copy_context`` (``app.executor`` and
+``app.pipeline`` do). Metrics are per process, so spans run in
+``CREW_EXECUTOR_MODE=process`` workers are not visible on ``/metrics``.
+"""
+
+import contextvars
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")  # e.g. http://localhost:4318; unset = no export
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "resume-reviewer")
+
+TRACE_ID_HEADER = "X-Trace-Id"
+METRIC_PREFIX = "resume_reviewer_"
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+_TRACE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+trace_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+
+
+def current_trace_id() -> Optional[str]:
+    return trace_id_var.get()
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+# --- metrics -----------------------------------------------------------------
+
+LabelValues = Tuple[str, ...]
+
+
+class Sample(NamedTuple):
+    name: str
+    labels: Dict[str, str]
+    value: float
+
+
+class MetricFamily(NamedTuple):
+    name: str
+    type: str          # counter | gauge | histogram
+    help: str
+    samples: List[Sample]
+
+
+def _label_key(labelnames: Tuple[str, ...], labels: Dict[str, str]) -> LabelValues:
+    if set(labels) != set(labelnames):
+        raise ValueError(f"expected labels {labelnames}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names."""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = METRIC_PREFIX + name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> MetricFamily:
+        with self._lock:
+            items = list(self._values.items())
+        samples = [Sample(self.name, dict(zip(self.labelnames, key)), value) for key, value in items]
+        return MetricFamily(self.name, "counter", self.help, samples)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed set of label names."""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DURATION_BUCKETS):
+        self.name = METRIC_PREFIX + name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelValues, list] = {}  # key -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += 1
+            state[-1] += value
+
+    def collect(self) -> MetricFamily:
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        samples = []
+        for key, state in items:
+            labels = dict(zip(self.labelnames, key))
+            for bound, count in zip(self.buckets, state):
+                samples.append(Sample(self.name + "_bucket", {**labels, "le": _format_value(bound)}, count))
+            samples.append(Sample(self.name + "_bucket", {**labels, "le": "+Inf"}, state[-2]))
+            samples.append(Sample(self.name + "_count", labels, state[-2]))
+            samples.append(Sample(self.name + "_sum", labels, state[-1]))
+        return MetricFamily(self.name, "histogram", self.help, samples)
+
+
+_metrics: List = []
+_collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+
+
+def register_collector(collector: Callable[[], Iterable[MetricFamily]]):
+    """Add a callable that reports metric families computed at scrape time (queue depth, cache sizes...)."""
+    _collectors.append(collector)
+
+
+def _format_value(value: float) -> str:
+    if value != value:
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_metrics() -> str:
+    """Every metric and collector in the Prometheus text exposition format (0.0.4)."""
+    families = [metric.collect() for metric in _metrics]
+    for collector in _collectors:
+        try:
+            families.extend(collector())
+        except Exception as e:
+            logger.warning(f"⚠️ Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+    lines = []
+    for family in families:
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.type}")
+        for sample in family.samples:
+            labels = ",".join(f'{k}="{_escape_label(str(v))}"' for k, v in sample.labels.items())
+            lines.append(f"{sample.name}{{{labels}}} {_format_value(sample.value)}" if labels else f"{sample.name} {_format_value(sample.value)}")
+    return "\n".join(lines) + "\n"
+
+
+SPAN_DURATION = Histogram("span_duration_seconds", "Duration of traced units of work (upload, extraction, stages...).", ["span"])
+SPAN_ERRORS = Counter("span_errors_total", "Traced units of work that raised.", ["span"])
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens used by stage crews.", ["stage", "kind"])
+LLM_REQUESTS = Counter("llm_requests_total", "Successful LLM requests made by stage crews.", ["stage"])
+QUEUE_WAIT = Histogram("queue_wait_seconds", "Time crew runs waited for an executor worker.")
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests handled.", ["method", "route", "status"])
+HTTP_DURATION = Histogram("http_request_duration_seconds", "HTTP request latency.", ["method", "route"])
+
+
+def record_token_usage(stage: str, usage) -> None:
+    """Count the ``UsageMetrics`` of one crew run under ``stage``."""
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens", "cached_prompt_tokens"):
+        value = getattr(usage, kind, 0) or 0
+        if value:
+            LLM_TOKENS.inc(value, stage=stage, kind=kind.replace("_tokens", ""))
+    requests = getattr(usage, "successful_requests", 0) or 0
+    if requests:
+        LLM_REQUESTS.inc(requests, stage=stage)
+
+
+# --- OpenTelemetry (optional) ------------------------------------------------
+
+_tracer = None
+_tracer_provider = None
+
+
+def _init_otel():
+    """Own tracer provider exporting to ``OTEL_EXPORTER_OTLP_ENDPOINT`` (CrewAI's global one is left alone)."""
+    global _tracer, _tracer_provider
+    if not OTEL_EXPORTER_OTLP_ENDPOINT or os.getenv("OTEL_SDK_DISABLED", "").lower() == "true":
+        return
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError as e:
+        logger.warning(f"⚠️ OTEL_EXPORTER_OTLP_ENDPOINT is set but OpenTelemetry is not installed ({e}), spans not exported")
+        return
+    endpoint = OTEL_EXPORTER_OTLP_ENDPOINT.rstrip("/")
+    if not endpoint.endswith("/v1/traces"):
+        endpoint += "/v1/traces"
+    _tracer_provider = TracerProvider(resource=Resource.create({"service.name": OTEL_SERVICE_NAME}))
+    _tracer_provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
+    _tracer = _tracer_provider.get_tracer("resume-reviewer")
+    logger.info(f"🔭 Exporting traces to {endpoint}")
+
+
+def shutdown_tracing():
+    """Flush pending spans; called on app shutdown."""
+    if _tracer_provider is not None:
+        _tracer_provider.shutdown()
+
+
+_init_otel()
+
+
+# --- spans -------------------------------------------------------------------
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[None]:
+    """Time a block of work under the current trace; ``attributes`` go to the log and the OTel span."""
+    otel_span = _tracer.start_as_current_span(name, attributes=attributes) if _tracer is not None else None
+    if otel_span is not None:
+        otel_span.__enter__()
+    started = time.perf_counter()
+    exc_info = (None, None, None)
+    try:
+        yield
+    except BaseException:
+        exc_info = sys.exc_info()
+        SPAN_ERRORS.inc(span=name)
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        SPAN_DURATION.observe(duration, span=name)
+        failed = exc_info[0] is not None
+        logger.debug(
+            f"⏱️ span {name} {duration * 1000:.1f}ms{' (failed)' if failed else ''}",
+            extra={"trace_id": current_trace_id(), "span": name, "duration_ms": round(duration * 1000, 1), **attributes},
+        )
+        if otel_span is not None:
+            otel_span.__exit__(*exc_info)
+
+
+def _incoming_trace_id(headers: Dict[bytes, bytes]) -> Optional[str]:
+    traceparent = headers.get(b"traceparent", b"").decode("latin-1")
+    parts = traceparent.split("-")
+    if len(parts) == 4 and _TRACE_ID_RE.match(parts[1]) and parts[1] != "0" * 32:
+        return parts[1]
+    candidate = headers.get(TRACE_ID_HEADER.lower().encode(), b"").decode("latin-1").strip().lower()
+    return candidate if _TRACE_ID_RE.match(candidate) else None
+
+
+class TraceMiddleware:
+    """Assign each HTTP request a trace id, echo it in ``X-Trace-Id`` and record request metrics.
+
+    Add it last so it wraps every other middleware (413 rejections get a trace id too).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        otel_cm = None
+        if _tracer is not None:
+            from opentelemetry.trace import SpanKind
+            from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+
+            carrier = {k.decode("latin-1"): v.decode("latin-1") for k, v in headers.items()}
+            parent = TraceContextTextMapPropagator().extract(carrier)
+            otel_cm = _tracer.start_as_current_span(
+                f"{scope['method']} {scope['path']}", context=parent, kind=SpanKind.SERVER
+            )
+            otel_trace_id = otel_cm.__enter__().get_span_context().trace_id
+            trace_id = format(otel_trace_id, "032x") if otel_trace_id else None
+        else:
+            trace_id = None
+        trace_id = trace_id or _incoming_trace_id(headers) or new_trace_id()
+        token = trace_id_var.set(trace_id)
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_trace_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (TRACE_ID_HEADER.lower().encode(), trace_id.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUESTS.inc(method=scope["method"], route=route_path, status=str(status))
+            HTTP_DURATION.observe(time.perf_counter() - started, method=scope["method"], route=route_path)
+            trace_id_var.reset(token)
+            if otel_cm is not None:
+                otel_cm.__exit__(None, None, None)
@@ -0,0 +1,409 @@
+"""API keys, per-key rate limits and concurrent-review caps.
+
+Each API key belongs to a tenant. ``API_KEYS`` lists them as comma-separated
+``tenant:key`` pairs; the single ``API_KEY`` still works as tenant
+``default``. Every tenant gets a token bucket (``TENANT_RATE_LIMIT_RPS`` and
+``TENANT_RATE_LIMIT_BURST``) and a cap on reviews in flight
+(``TENANT_MAX_CONCURRENT``). ``TENANT_LIMITS`` overrides them per tenant as
+``tenant=rps/burst/max_concurrent``, where 0 means unlimited.
+
+``RATE_LIMIT_URL`` selects where the counters live. ``memory://`` (the
+default) is per process. ``sqlite:///path/to/limits.db`` is shared by the
+workers on one host. ``redis://host:6379/0`` is shared across hosts and
+needs the ``redis`` package.
+
+``TenantLimitMiddleware`` checks the key, the bucket and the cap from the
+request headers alone, so a rejected client never gets its body read.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional, Tuple
+from app.telemetry import Counter
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL", "memory://")
+TENANT_RATE_LIMIT_RPS = float(os.getenv("TENANT_RATE_LIMIT_RPS", "1.0"))  # expensive requests per second per key
+TENANT_RATE_LIMIT_BURST = int(os.getenv("TENANT_RATE_LIMIT_BURST", "20"))
+TENANT_MAX_CONCURRENT = int(os.getenv("TENANT_MAX_CONCURRENT", "8"))  # reviews in flight per key
+# A slot whose release never arrived (crashed worker) is reclaimed after this many seconds.
+TENANT_LEASE_TTL = int(os.getenv("TENANT_LEASE_TTL", "900"))
+BUSY_RETRY_AFTER = 5  # seconds suggested to a tenant at its concurrency cap
+
+DEFAULT_TENANT = "default"
+# (method, path prefix) of the endpoints that start crew runs; everything else is not limited here
+LIMITED_ROUTES = (("POST", "/run-crew"), ("POST", "/reviews"), ("POST", "/batch"), ("POST", "/candidates"))
+
+TENANT_REJECTIONS = Counter("tenant_rejections_total", "Requests refused before reading the body.", ["tenant", "reason"])
+
+
+class Tenant(NamedTuple):
+    name: str
+    rate: float           # tokens per second; 0 = unlimited
+    burst: int
+    max_concurrent: int   # 0 = unlimited
+
+
+class Lease(NamedTuple):
+    tenant: str
+    lease_id: str
+
+
+def _parse_limits(spec: str) -> Dict[str, Tuple[float, int, int]]:
+    limits = {}
+    for item in (spec or "").split(","):
+        name, sep, values = item.strip().partition("=")
+        if not sep:
+            continue
+        try:
+            rate, burst, max_concurrent = values.split("/")
+            limits[name.strip()] = (float(rate), int(burst), int(max_concurrent))
+        except ValueError:
+            logger.warning(f"⚠️ Ignoring invalid TENANT_LIMITS entry {item!r}")
+    return limits
+
+
+@lru_cache(maxsize=4)
+def _registry(api_key: Optional[str], api_keys: Optional[str], limit_spec: Optional[str]) -> Dict[str, Tenant]:
+    limits = _parse_limits(limit_spec)
+    keys = {}
+    if api_key:
+        keys[DEFAULT_TENANT] = api_key
+    for item in (api_keys or "").split(","):
+        name, sep, key = item.strip().partition(":")
+        if sep and name and key:
+            keys[name.strip()] = key.strip()
+        elif item.strip():
+            logger.warning("⚠️ Ignoring an API_KEYS entry that is not tenant:key")
+    registry = {}
+    for name, key in keys.items():
+        rate, burst, max_concurrent = limits.get(name, (TENANT_RATE_LIMIT_RPS, TENANT_RATE_LIMIT_BURST, TENANT_MAX_CONCURRENT))
+        # Keyed by digest: the dict lookup never compares raw secrets byte by byte
+        registry[hashlib.sha256(key.encode()).hexdigest()] = Tenant(name, rate, burst, max_concurrent)
+    return registry
+
+
+def tenants() -> Dict[str, Tenant]:
+    """Configured tenants by SHA-256 of their key (re-read when the environment changes)."""
+    return _registry(os.getenv("API_KEY"), os.getenv("API_KEYS"), os.getenv("TENANT_LIMITS"))
+
+
+def tenant_for_key(api_key: Optional[str]) -> Optional[Tenant]:
+    if not api_key:
+        return None
+    return tenants().get(hashlib.sha256(api_key.encode()).hexdigest())
+
+
+# --- backends ------------------------------------------------------------------
+
+class LimiterBackend(ABC):
+    """Token buckets and concurrency leases per tenant. All methods are thread-safe."""
+
+    blocking = True  # calls do I/O; the middleware runs them off the event loop
+
+    @abstractmethod
+    def take(self, tenant: Tenant) -> float:
+        """Take one token; 0 on success, else seconds until a token is available."""
+
+    @abstractmethod
+    def acquire(self, tenant: Tenant) -> Optional[Lease]:
+        """A concurrency slot, or None when the tenant is at its cap."""
+
+    @abstractmethod
+    def release(self, lease: Lease):
+        ...
+
+    @abstractmethod
+    def in_flight(self, tenant: str) -> int:
+        ...
+
+
+def _refill(tokens: float, updated: float, now: float, tenant: Tenant) -> Tuple[float, float]:
+    """(tokens after taking one, seconds to wait); a positive wait leaves the bucket untouched."""
+    tokens = min(tenant.burst, tokens + max(0.0, now - updated) * tenant.rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / tenant.rate
+
+
+class InMemoryLimiter(LimiterBackend):
+    blocking = False
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._leases: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, tenant: Tenant) -> float:
+        if tenant.rate <= 0:
+            return 0.0
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get(tenant.name, (float(tenant.burst), now))
+            tokens, wait = _refill(tokens, updated, now, tenant)
+            self._buckets[tenant.name] = (tokens, now)
+        return wait
+
+    def acquire(self, tenant: Tenant) -> Optional[Lease]:
+        now = time.time()
+        with self._lock:
+            leases = self._leases.setdefault(tenant.name, {})
+            for lease_id in [lid for lid, expires in leases.items() if expires < now]:
+                del leases[lease_id]
+            if tenant.max_concurrent > 0 and len(leases) >= tenant.max_concurrent:
+                return None
+            lease = Lease(tenant.name, uuid.uuid4().hex)
+            leases[lease.lease_id] = now + TENANT_LEASE_TTL
+        return lease
+
+    def release(self, lease: Lease):
+        with self._lock:
+            self._leases.get(lease.tenant, {}).pop(lease.lease_id, None)
+
+    def in_flight(self, tenant: str) -> int:
+        with self._lock:
+            return len(self._leases.get(tenant, {}))
+
+
+class SQLiteLimiter(LimiterBackend):
+    """Counters in SQLite so every worker process on the host shares the same limits."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # WAL cannot be switched on inside a transaction
+        conn = sqlite3.connect(path, timeout=5)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+        finally:
+            conn.close()
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tenant_buckets (tenant TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tenant_leases (lease_id TEXT PRIMARY KEY, tenant TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS tenant_leases_tenant ON tenant_leases (tenant)")
+
+    @contextmanager
+    def _transaction(self):
+        # Short-lived connection per operation; BEGIN IMMEDIATE serializes the read-modify-write across processes.
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def take(self, tenant: Tenant) -> float:
+        if tenant.rate <= 0:
+            return 0.0
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT tokens, updated_at FROM tenant_buckets WHERE tenant = ?", (tenant.name,)).fetchone()
+            tokens, wait = _refill(*(row or (float(tenant.burst), now)), now, tenant)
+            conn.execute(
+                "INSERT OR REPLACE INTO tenant_buckets (tenant, tokens, updated_at) VALUES (?, ?, ?)",
+                (tenant.name, tokens, now),
+            )
+        return wait
+
+    def acquire(self, tenant: Tenant) -> Optional[Lease]:
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM tenant_leases WHERE tenant = ? AND expires_at < ?", (tenant.name, now))
+            if tenant.max_concurrent > 0:
+                (count,) = conn.execute("SELECT COUNT(*) FROM tenant_leases WHERE tenant = ?", (tenant.name,)).fetchone()
+                if count >= tenant.max_concurrent:
+                    return None
+            lease = Lease(tenant.name, uuid.uuid4().hex)
+            conn.execute(
+                "INSERT INTO tenant_leases (lease_id, tenant, expires_at) VALUES (?, ?, ?)",
+                (lease.lease_id, tenant.name, now + TENANT_LEASE_TTL),
+            )
+        return lease
+
+    def release(self, lease: Lease):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM tenant_leases WHERE lease_id = ?", (lease.lease_id,))
+
+    def in_flight(self, tenant: str) -> int:
+        with self._transaction() as conn:
+            (count,) = conn.execute(
+                "SELECT COUNT(*) FROM tenant_leases WHERE tenant = ? AND expires_at >= ?", (tenant, time.time())
+            ).fetchone()
+        return count
+
+
+_REDIS_TAKE = """
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = math.min(burst, (tonumber(state[1]) or burst) + math.max(0, now - (tonumber(state[2]) or now)) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+_REDIS_ACQUIRE = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+local limit = tonumber(ARGV[2])
+if limit > 0 and redis.call('ZCARD', KEYS[1]) >= limit then return 0 end
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return 1
+"""
+
+
+class RedisLimiter(LimiterBackend):
+    """Counters in Redis (or a compatible server) shared by every worker on every host; atomic via Lua."""
+
+    def __init__(self, url: str, prefix: str = "resume-reviewer:limits:"):
+        import redis  # optional dependency, only needed for this backend
+
+        self._client = redis.Redis.from_url(url, socket_timeout=2)
+        self._prefix = prefix
+        self._take = self._client.register_script(_REDIS_TAKE)
+        self._acquire = self._client.register_script(_REDIS_ACQUIRE)
+
+    def take(self, tenant: Tenant) -> float:
+        if tenant.rate <= 0:
+            return 0.0
+        wait = self._take(keys=[f"{self._prefix}bucket:{tenant.name}"], args=[tenant.rate, tenant.burst, time.time()])
+        return float(wait)
+
+    def acquire(self, tenant: Tenant) -> Optional[Lease]:
+        now = time.time()
+        lease = Lease(tenant.name, uuid.uuid4().hex)
+        granted = self._acquire(
+            keys=[f"{self._prefix}leases:{tenant.name}"],
+            args=[now, tenant.max_concurrent, now + TENANT_LEASE_TTL, lease.lease_id, TENANT_LEASE_TTL],
+        )
+        return lease if granted else None
+
+    def release(self, lease: Lease):
+        self._client.zrem(f"{self._prefix}leases:{lease.tenant}", lease.lease_id)
+
+    def in_flight(self, tenant: str) -> int:
+        return self._client.zcount(f"{self._prefix}leases:{tenant}", time.time(), "+inf")
+
+
+def build_limiter(url: str = RATE_LIMIT_URL) -> LimiterBackend:
+    """Create the limiter described by ``url`` (``memory://``, ``sqlite:///path`` or ``redis://...``)."""
+    if url.startswith("sqlite:///"):
+        path = url[len("sqlite:///"):]
+        logger.info(f"🗄️ Using SQLite rate limits at {path}")
+        return SQLiteLimiter(path)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        logger.info("🗄️ Using Redis rate limits")
+        return RedisLimiter(url)
+    if url in ("", "memory://"):
+        return InMemoryLimiter()
+    raise ValueError(f"Unsupported RATE_LIMIT_URL: {url}")
+
+
+limiter = build_limiter()
+
+
+def tenant_stats() -> Dict[str, int]:
+    """Reviews in flight per configured tenant."""
+    return {tenant.name: limiter.in_flight(tenant.name) for tenant in tenants().values()}
+
+
+# --- middleware ----------------------------------------------------------------
+
+def claim_lease(state) -> Optional[Lease]:
+    """Take over the request's concurrency slot (e.g. for a background job); the caller must ``release_lease`` it."""
+    lease = getattr(state, "tenant_lease", None)
+    state.tenant_lease = None
+    return lease
+
+
+def release_lease(lease: Optional[Lease]):
+    """Free a claimed slot. Never raises."""
+    if lease is None:
+        return
+    try:
+        limiter.release(lease)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not release concurrency slot of {lease.tenant}: {e}")
+
+
+class TenantLimitMiddleware:
+    """Authenticate, rate limit and cap concurrent reviews per API key before the request body is read.
+
+    Only ``LIMITED_ROUTES`` are checked. The concurrency slot is held until the
+    response is sent, or handed to a background job with ``claim_lease``.
+    When no key is configured at all, requests pass through and the routes
+    answer 500 as before.
+    """
+
+    def __init__(self, app, routes=LIMITED_ROUTES):
+        self.app = app
+        self.routes = routes
+
+    def _is_limited(self, scope) -> bool:
+        return any(scope["method"] == method and scope["path"].startswith(prefix) for method, prefix in self.routes)
+
+    async def _call(self, fn, *args):
+        return await asyncio.to_thread(fn, *args) if limiter.blocking else fn(*args)
+
+    async def _reject(self, send, status: int, detail: str, retry_after: Optional[float] = None):
+        body = json.dumps({"detail": detail}).encode()
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        if retry_after is not None:
+            headers.append((b"retry-after", str(max(1, int(retry_after + 0.999))).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._is_limited(scope) or not tenants():
+            return await self.app(scope, receive, send)
+
+        api_key = dict(scope["headers"]).get(b"x-api-key", b"").decode("latin-1")
+        tenant = tenant_for_key(api_key)
+        if tenant is None:
+            logger.warning("🚫 Invalid API key provided")
+            TENANT_REJECTIONS.inc(tenant="-", reason="unauthorized")
+            return await self._reject(send, 401, "Invalid API Key")
+
+        wait = await self._call(limiter.take, tenant)
+        if wait > 0:
+            logger.warning(f"🚦 Rate limit reached for tenant {tenant.name}")
+            TENANT_REJECTIONS.inc(tenant=tenant.name, reason="rate_limited")
+            return await self._reject(send, 429, "Rate limit exceeded for this API key.", wait)
+
+        lease = await self._call(limiter.acquire, tenant)
+        if lease is None:
+            logger.warning(f"🚦 Tenant {tenant.name} at its limit of {tenant.max_concurrent} concurrent reviews")
+            TENANT_REJECTIONS.inc(tenant=tenant.name, reason="concurrency")
+            return await self._reject(send, 429, "Too many reviews in progress for this API key.", BUSY_RETRY_AFTER)
+
+        # Starlette exposes scope["state"] as request.state
+        state = scope.setdefault("state", {})
+        state["tenant"] = tenant.name
+        state["tenant_lease"] = lease
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if state.get("tenant_lease") is not None:
+                await self._call(release_lease, state["tenant_lease"])
@@ -0,0 +1,205 @@
+"""Local token counting and per-stage prompt budgets.
+
+Tokens are counted with the cl100k tokenizer file bundled with litellm (a
+close proxy for Gemini's; no network needed), loaded through tiktoken without
+importing litellm itself, falling back to ~4 characters per token. Before anything reaches a prompt:
+
+- resume text loses lines repeated across pages (headers, footers, contact
+  blocks) and bare page numbers;
+- job descriptions also lose equal-opportunity and similar boilerplate, and
+  are cut to ``JOB_DESCRIPTION_MAX_TOKENS``;
+- analyses handed to the ATS stage keep only the fields it reads, with
+  duplicate items removed and at most ``ANALYSIS_MAX_ITEMS`` per list.
+
+``TokenLedger`` adds up the tokens each stage reports, per review.
+"""
+
+import contextvars
+import importlib.util
+import json
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+JOB_DESCRIPTION_MAX_TOKENS = int(os.getenv("JOB_DESCRIPTION_MAX_TOKENS", "3000"))
+ANALYSIS_MAX_ITEMS = int(os.getenv("ANALYSIS_MAX_ITEMS", "50"))  # list items per analysis field sent to the scorer
+ANALYSIS_ITEM_MAX_CHARS = 200
+
+TRUNCATION_MARKER = "\n[...]"
+
+_PAGE_NUMBER_RE = re.compile(r"^(page\s*)?\d{1,3}(\s*(/|of)\s*\d{1,3})?$", re.IGNORECASE)
+# Lines that say nothing about the role; dropped from job descriptions.
+_JOB_BOILERPLATE_RE = re.compile(
+    r"equal (employment )?opportunity|\beeo\b|affirmative action|without regard to|reasonable accommodation"
+    r"|e-verify|drug[- ]free workplace|privacy (notice|policy)|applicant data|recruitment agenc",
+    re.IGNORECASE,
+)
+# Lines shorter than this (e.g. bullets like "- Python") may legitimately repeat in different sections.
+_MIN_DEDUPE_CHARS = 25
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _load_encoding():
+    import tiktoken
+
+    # Where litellm keeps its copy of the encoding file (and points tiktoken when it is imported);
+    # importing litellm just for that would take seconds
+    if "TIKTOKEN_CACHE_DIR" not in os.environ:
+        spec = importlib.util.find_spec("litellm")
+        if spec is not None and spec.submodule_search_locations:
+            bundled = os.path.join(spec.submodule_search_locations[0], "litellm_core_utils", "tokenizers")
+            os.environ["TIKTOKEN_CACHE_DIR"] = os.getenv("CUSTOM_TIKTOKEN_CACHE_DIR", bundled)
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def _get_encoding():
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                _encoding = _load_encoding()
+            except Exception as e:
+                logger.warning(f"⚠️ Tokenizer unavailable ({e}), estimating tokens from length")
+                _encoding = False
+        return _encoding
+
+
+def warm_tokenizer():
+    """Load the tokenizer now (about 2 s) rather than in the first request."""
+    _get_encoding()
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    # ~4 characters per token for English prose
+    return len(text) // 4 + 1
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """``text`` cut to about ``max_tokens`` tokens at a line break, with a marker when anything was cut."""
+    if max_tokens <= 0 or count_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding:
+        head = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    else:
+        head = text[: max_tokens * 4]
+    cut = head.rfind("\n")
+    if cut > len(head) // 2:
+        head = head[:cut]
+    return head.rstrip() + TRUNCATION_MARKER
+
+
+def _compact_lines(text: str, drop: Optional[re.Pattern] = None) -> str:
+    kept: List[str] = []
+    seen = set()
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if stripped and _PAGE_NUMBER_RE.match(stripped):
+            continue
+        if drop is not None and drop.search(stripped):
+            continue
+        key = " ".join(stripped.casefold().split())
+        if len(key) >= _MIN_DEDUPE_CHARS:
+            if key in seen:
+                continue
+            seen.add(key)
+        if stripped or (kept and kept[-1]):
+            kept.append(line)
+    return "\n".join(kept).strip()
+
+
+def compact_resume_text(text: str) -> str:
+    """Cleaned resume text minus repeated lines and page numbers."""
+    return _compact_lines(text)
+
+
+def compact_job_description(text: str) -> str:
+    """Cleaned job description minus boilerplate and repeated lines, cut to ``JOB_DESCRIPTION_MAX_TOKENS``."""
+    return truncate_tokens(_compact_lines(text, drop=_JOB_BOILERPLATE_RE), JOB_DESCRIPTION_MAX_TOKENS)
+
+
+def cap_items(items: Iterable[str], max_items: int = ANALYSIS_MAX_ITEMS) -> List[str]:
+    """Case-insensitively unique, non-empty items, each at most ``ANALYSIS_ITEM_MAX_CHARS``, at most ``max_items``."""
+    capped, seen = [], set()
+    for item in items:
+        item = " ".join(str(item).split())[:ANALYSIS_ITEM_MAX_CHARS]
+        if item and item.casefold() not in seen:
+            seen.add(item.casefold())
+            capped.append(item)
+            if len(capped) == max_items:
+                break
+    return capped
+
+
+def compact_analysis_json(analysis: BaseModel, fields: Iterable[str]) -> str:
+    """Minified JSON of ``fields`` only, lists passed through ``cap_items``."""
+    data = {}
+    for field in fields:
+        value = getattr(analysis, field)
+        data[field] = cap_items(value) if isinstance(value, list) else value
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+class TokenLedger:
+    """Prompt/completion tokens per stage for one review. Thread-safe: stages may run in parallel."""
+
+    def __init__(self):
+        self._stages: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, prompt_tokens: int, completion_tokens: int):
+        with self._lock:
+            entry = self._stages.setdefault(stage, {"prompt": 0, "completion": 0})
+            entry["prompt"] += prompt_tokens
+            entry["completion"] += completion_tokens
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """{stage: {"prompt", "completion"}} plus a "total" entry."""
+        with self._lock:
+            stages = {stage: dict(entry) for stage, entry in self._stages.items()}
+        stages["total"] = {
+            "prompt": sum(entry["prompt"] for entry in stages.values()),
+            "completion": sum(entry["completion"] for entry in stages.values()),
+        }
+        return stages
+
+
+_ledger: contextvars.ContextVar[Optional[TokenLedger]] = contextvars.ContextVar("token_ledger", default=None)
+
+
+@contextmanager
+def token_ledger() -> Iterator[TokenLedger]:
+    """Collect the token usage of every stage run in this context (and in contexts copied from it)."""
+    ledger = TokenLedger()
+    token = _ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _ledger.reset(token)
+
+
+def record_stage_tokens(stage: str, usage) -> None:
+    """Add a crew's ``UsageMetrics`` to the current ledger, if any."""
+    ledger = _ledger.get()
+    if ledger is not None and usage is not None:
+        ledger.add(stage, usage.prompt_tokens or 0, usage.completion_tokens or 0)
+
+
+def token_usage_header(usage: Dict[str, Dict[str, int]]) -> str:
+    """``X-Token-Usage`` value, e.g. ``resume_analysis;prompt=812;completion=95, total;prompt=...``."""
+    return ", ".join(
+        f"{stage};prompt={entry['prompt']};completion={entry['completion']}" for stage, entry in usage.items()
+    )
@@ -0,0 +1,176 @@
+"""Upload validation, storage and cleanup shared by the review endpoints.
+
+Uploads are streamed in chunks: the size limit is enforced while reading, the
+SHA-256 is computed on the fly, and the bytes are written exactly once to a
+temp file under ``UPLOAD_DIR`` (tmpfs when available). The crew reads that
+file directly by absolute path, so there is no second copy into
+``knowledge/``, no fsync and no polling for the file to appear.
+``RequestSizeLimitMiddleware`` rejects oversized bodies before the multipart
+parser buffers them.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, NamedTuple, Optional
+from fastapi import HTTPException, UploadFile
+from app.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+MAX_FILE_SIZE = 2 * 1024 * 1024  # 2 MB
+UPLOAD_CHUNK_SIZE = 256 * 1024
+# Allowance for the other form fields and multipart framing on top of the file bytes.
+FORM_OVERHEAD = int(os.getenv("FORM_OVERHEAD", str(256 * 1024)))
+MAX_REQUEST_SIZE = MAX_FILE_SIZE + FORM_OVERHEAD
+
+_TMPFS_DIR = "/dev/shm"
+
+
+def _default_upload_dir() -> str:
+    # RAM-backed when the host has it; otherwise the writable mount from .platform.app.yaml
+    if os.path.isdir(_TMPFS_DIR) and os.access(_TMPFS_DIR, os.W_OK):
+        return os.path.join(_TMPFS_DIR, "resume-reviewer")
+    return os.path.normpath(os.path.join("web", "uploads"))
+
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR") or _default_upload_dir()
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+ALLOWED_CONTENT_TYPES = {"application/pdf", "application/x-pdf"}
+
+
+class StoredUpload(NamedTuple):
+    resume_path: str            # absolute path of the saved upload
+    knowledge_identifier: str   # path handed to PDFKnowledgeSource (absolute, so no knowledge/ prefix)
+    sha256: str                 # hash of the uploaded bytes, keys the resume caches
+
+
+def log_upload_details(resume_file: Optional[UploadFile]):
+    if resume_file:
+        logger.debug(
+            f"📎 File: {resume_file.filename} ({resume_file.content_type}, "
+            f"{resume_file.size if hasattr(resume_file, 'size') else 'unknown'} bytes)"
+        )
+    else:
+        logger.error("❌ No resume file received")
+        raise HTTPException(status_code=422, detail="No resume file provided")
+
+
+def _file_too_large(size: int) -> HTTPException:
+    logger.warning(f"❌ File too large: {size} > {MAX_FILE_SIZE}")
+    return HTTPException(status_code=413, detail="File too large. Max 2 MB allowed.")
+
+
+async def store_upload(resume_file: UploadFile) -> StoredUpload:
+    """Validate the uploaded PDF and write it once for the crew.
+
+    Raises HTTPException (413/415/422) on invalid uploads. Partially written
+    files are removed before the exception propagates.
+    """
+    # Validate content type first: rejecting it costs nothing
+    content_type = resume_file.content_type
+    if not content_type or content_type.lower() not in ALLOWED_CONTENT_TYPES:
+        logger.warning(f"❌ Invalid content type: {content_type}")
+        raise HTTPException(status_code=415, detail="Only PDF uploads are accepted.")
+
+    if resume_file.size is not None and resume_file.size > MAX_FILE_SIZE:
+        raise _file_too_large(resume_file.size)
+
+    # Unique, sanitized filename (never trust the client's)
+    original_filename = os.path.basename(resume_file.filename or "resume.pdf")
+    base = os.path.splitext(original_filename)[0][:50]  # truncate base to avoid overly long names
+    fd, resume_path = tempfile.mkstemp(prefix=f"{base}_", suffix=".pdf", dir=UPLOAD_DIR)
+    resume_path = os.path.abspath(resume_path)
+    logger.debug(f"💾 Streaming {original_filename} -> {resume_path}")
+
+    digest = hashlib.sha256()
+    file_size = 0
+    try:
+        with span("upload"), os.fdopen(fd, "wb") as buffer:
+            while chunk := await resume_file.read(UPLOAD_CHUNK_SIZE):
+                file_size += len(chunk)
+                if file_size > MAX_FILE_SIZE:
+                    raise _file_too_large(file_size)
+                digest.update(chunk)
+                buffer.write(chunk)
+        if file_size == 0:
+            logger.error("❌ Empty file received")
+            raise HTTPException(status_code=422, detail="Empty file received")
+    except BaseException:
+        _remove(resume_path)
+        raise
+
+    logger.info(f"✅ File saved ({file_size} bytes, {file_size / 1024:.2f} KB)")
+    return StoredUpload(resume_path, resume_path, digest.hexdigest())
+
+
+def _remove(path: str):
+    try:
+        if path and os.path.exists(path):
+            os.remove(path)
+            logger.debug(f"🗑️ Cleaned up file: {path}")
+    except OSError as e:
+        logger.warning(f"⚠️ Cleanup failed: {e}")
+
+
+def cleanup_upload(upload: Optional[StoredUpload]):
+    """Delete the saved upload. Never raises."""
+    if upload is not None:
+        _remove(upload.resume_path)
+
+
+class RequestSizeLimitMiddleware:
+    """Reject request bodies over a size limit before they are parsed.
+
+    Checks ``Content-Length`` up front and counts bytes as they are received,
+    so chunked uploads without a length are cut off too. ``limits`` maps path
+    prefixes to their own limit (longest prefix wins); everything else gets
+    ``max_body_size``.
+    """
+
+    def __init__(self, app, max_body_size: int = MAX_REQUEST_SIZE, limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.limits = sorted((limits or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+    def _limit_for(self, path: str) -> int:
+        for prefix, limit in self.limits:
+            if path.startswith(prefix):
+                return limit
+        return self.max_body_size
+
+    async def _reject(self, send, limit: int):
+        body = json.dumps({"detail": f"Request body too large. Max {limit} bytes."}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            return await self.app(scope, receive, send)
+
+        limit = self._limit_for(scope["path"])
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            logger.warning(f"❌ Request body too large: {int(content_length)} > {limit} ({scope['path']})")
+            return await self._reject(send, limit)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    logger.warning(f"❌ Request body exceeded {limit} bytes while streaming ({scope['path']})")
+                    raise HTTPException(status_code=413, detail=f"Request body too large. Max {limit} bytes.")
+            return message
+
+        return await self.app(scope, limited_receive, send)
@@ -0,0 +1,235 @@
+"""Durable SQLite work queue between API processes and review worker processes.
+
+Used by the ``queue`` executor mode (see ``app.executor`` and ``app.run``):
+an API process enqueues a pickled call, a worker process claims it under a
+lease, runs it and writes back the pickled result or, when it raised, the
+error's type, message and ``retry_after`` (``dump_error``), and the API
+process picks that up, rebuilds the exception (``load_error``) and deletes
+the item. ``enqueue`` refuses new items once ``max_pending`` are queued or
+running, so admission is bounded across every API process.
+
+A worker keeps extending the lease of what it is running. If it dies, the
+lease runs out and another worker claims the item again, up to
+``WORK_QUEUE_MAX_ATTEMPTS`` runs in total; after that the item fails. Queued
+items survive restarts of every process.
+
+Payloads are pickles, so the database file must only be writable by the
+service itself.
+"""
+
+import importlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+WORK_QUEUE_DB = os.getenv("WORK_QUEUE_DB", "data/work_queue.db")
+WORK_QUEUE_LEASE = float(os.getenv("WORK_QUEUE_LEASE", "60"))  # seconds a claim lasts without a heartbeat
+WORK_QUEUE_MAX_ATTEMPTS = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "3"))  # runs before an item whose workers keep dying fails
+WORK_QUEUE_RETENTION = float(os.getenv("WORK_QUEUE_RETENTION", "3600"))  # finished items nobody collected are deleted after this
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUSES = (STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED)
+
+
+class WorkerLost(RuntimeError):
+    """The item's worker died on every attempt."""
+
+
+class WorkItem(NamedTuple):
+    item_id: int
+    payload: bytes
+    attempts: int  # runs started so far, this one included
+
+
+def dump_error(error: BaseException) -> bytes:
+    """``error`` as JSON fields; pickling would drop attributes its ``__init__`` sets, such as ``retry_after``."""
+    cls = type(error)
+    return json.dumps({
+        "type": f"{cls.__module__}.{cls.__qualname__}",
+        "message": str(error),
+        "retry_after": getattr(error, "retry_after", None),
+    }).encode("utf-8")
+
+
+def load_error(data: bytes) -> Exception:
+    """The exception ``dump_error`` described, or a ``RuntimeError`` carrying its text if its type cannot be loaded."""
+    fields = json.loads(data)
+    module_name, _, name = fields["type"].rpartition(".")
+    try:
+        cls = getattr(importlib.import_module(module_name), name)
+    except (ImportError, AttributeError, ValueError):
+        cls = None
+    fallback = RuntimeError(f"{fields['type']}: {fields['message']}")
+    if not (isinstance(cls, type) and issubclass(cls, Exception)):
+        return fallback
+    try:
+        # Bypass __init__: exception constructors take all sorts of arguments
+        error = cls.__new__(cls)
+        Exception.__init__(error, fields["message"])
+    except Exception:
+        return fallback
+    if fields.get("retry_after") is not None:
+        error.retry_after = fields["retry_after"]
+    return error
+
+
+class WorkQueue:
+    """All methods are safe across threads and processes."""
+
+    def __init__(self, path: str, lease_seconds: float = WORK_QUEUE_LEASE, max_attempts: int = WORK_QUEUE_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS work_items ("
+                    "item_id INTEGER PRIMARY KEY AUTOINCREMENT, status TEXT NOT NULL, payload BLOB NOT NULL, "
+                    "attempts INTEGER NOT NULL DEFAULT 0, worker TEXT, lease_until REAL, result BLOB, "
+                    "enqueued_at REAL NOT NULL, finished_at REAL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS work_items_status ON work_items (status, item_id)")
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        # Short-lived connection per operation; BEGIN IMMEDIATE serializes claims across processes.
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def enqueue(self, payload: bytes, max_pending: Optional[int] = None) -> Optional[int]:
+        """The new item's id, or ``None`` when ``max_pending`` items are already queued or running."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM work_items WHERE status IN (?, ?) AND finished_at < ?",
+                (STATUS_DONE, STATUS_FAILED, now - WORK_QUEUE_RETENTION),
+            )
+            if max_pending is not None and self._pending(conn) >= max_pending:
+                return None
+            return conn.execute(
+                "INSERT INTO work_items (status, payload, enqueued_at) VALUES (?, ?, ?)", (STATUS_QUEUED, payload, now)
+            ).lastrowid
+
+    def claim(self, worker: str) -> Optional[WorkItem]:
+        """The oldest queued item (or one whose worker's lease ran out), now leased to ``worker``."""
+        now = time.time()
+        with self._transaction() as conn:
+            abandoned = conn.execute(
+                "UPDATE work_items SET status = ?, result = ?, finished_at = ? "
+                "WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (STATUS_FAILED, dump_error(WorkerLost(f"worker died on all {self.max_attempts} attempts")), now,
+                 STATUS_RUNNING, now, self.max_attempts),
+            ).rowcount
+            if abandoned:
+                logger.error(f"💀 {abandoned} work item(s) failed after {self.max_attempts} lost workers")
+            row = conn.execute(
+                "SELECT item_id, payload, attempts, status FROM work_items "
+                "WHERE status = ? OR (status = ? AND lease_until < ?) ORDER BY item_id LIMIT 1",
+                (STATUS_QUEUED, STATUS_RUNNING, now),
+            ).fetchone()
+            if row is None:
+                return None
+            if row[3] == STATUS_RUNNING:
+                logger.warning(f"♻️ Work item {row[0]} lost its worker, running it again")
+            conn.execute(
+                "UPDATE work_items SET status = ?, worker = ?, attempts = attempts + 1, lease_until = ? WHERE item_id = ?",
+                (STATUS_RUNNING, worker, now + self.lease_seconds, row[0]),
+            )
+        return WorkItem(row[0], row[1], row[2] + 1)
+
+    def extend_leases(self, worker: str) -> int:
+        """Heartbeat: renew the lease of everything ``worker`` is running."""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE work_items SET lease_until = ? WHERE worker = ? AND status = ?",
+                (time.time() + self.lease_seconds, worker, STATUS_RUNNING),
+            ).rowcount
+
+    def _finish(self, item_id: int, status: str, result: bytes):
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE work_items SET status = ?, result = ?, finished_at = ?, lease_until = NULL "
+                "WHERE item_id = ? AND status = ?",
+                (status, result, time.time(), item_id, STATUS_RUNNING),
+            )
+
+    def complete(self, item_id: int, result: bytes):
+        self._finish(item_id, STATUS_DONE, result)
+
+    def fail(self, item_id: int, error: bytes):
+        self._finish(item_id, STATUS_FAILED, error)
+
+    def collect(self, item_id: int) -> Optional[Tuple[bool, bytes]]:
+        """(succeeded, pickled result or ``dump_error`` JSON) once the item finished, deleting it; ``None`` until then."""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT status, result FROM work_items WHERE item_id = ? AND status IN (?, ?)",
+                (item_id, STATUS_DONE, STATUS_FAILED),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM work_items WHERE item_id = ?", (item_id,))
+        return row[0] == STATUS_DONE, row[1]
+
+    def cancel(self, item_id: int) -> bool:
+        """Drop the item if no worker has claimed it yet. A running one finishes and expires uncollected."""
+        with self._transaction() as conn:
+            return conn.execute(
+                "DELETE FROM work_items WHERE item_id = ? AND status = ?", (item_id, STATUS_QUEUED)
+            ).rowcount > 0
+
+    @staticmethod
+    def _pending(conn) -> int:
+        return conn.execute(
+            "SELECT COUNT(*) FROM work_items WHERE status IN (?, ?)", (STATUS_QUEUED, STATUS_RUNNING)
+        ).fetchone()[0]
+
+    def pending(self) -> int:
+        """Items queued or running, across every process."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            return self._pending(conn)
+        finally:
+            conn.close()
+
+    def counts(self) -> Dict[str, int]:
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM work_items GROUP BY status").fetchall()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(rows)
+        return counts
+
+
+_work_queue: Optional[WorkQueue] = None
+
+
+def get_work_queue() -> WorkQueue:
+    """The queue at ``WORK_QUEUE_DB``, opened on first use so other executor modes never create the file."""
+    global _work_queue
+    if _work_queue is None:
+        _work_queue = WorkQueue(WORK_QUEUE_DB)
+        logger.info(f"🗄️ Using SQLite work queue at {WORK_QUEUE_DB}")
+    return _work_queue
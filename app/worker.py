@@ -0,0 +1,137 @@
+"""Review worker process: runs the crew calls API processes put on the work queue.
+
+Started by ``python -m app.run serve`` (one per ``--review-workers``) or on
+its own with ``python -m app.run worker``. Each worker builds its stage pools
+and loads the tokenizer once, then runs up to ``WORKER_THREADS`` queued calls
+at a time while a heartbeat keeps their leases alive (see ``app.work_queue``).
+
+SIGTERM or SIGINT drains the worker: it claims nothing new, finishes what it
+is running and exits. Anything still queued waits for the next worker.
+
+An outcome the queue could not record (a ``sqlite3.Error``) is kept and
+written again on every heartbeat, so the loop thread keeps running and the
+caller still gets its answer once the store recovers.
+"""
+
+import logging
+import os
+import pickle
+import signal
+import socket
+import sqlite3
+import threading
+from typing import Dict, Optional, Tuple
+from app.log_config import configure_logging, stop_logging
+from app.work_queue import WorkItem, WorkQueue, dump_error, get_work_queue
+
+logger = logging.getLogger(__name__)
+
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "2"))  # queued reviews one worker process runs at once
+WORKER_POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "0.5"))  # seconds between claims when the queue is empty
+
+
+class ReviewWorker:
+    def __init__(self, name: str, queue: Optional[WorkQueue] = None, threads: int = WORKER_THREADS):
+        # The pid keeps a restarted worker from renewing leases its dead predecessor held
+        self.name = f"{name}@{socket.gethostname()}:{os.getpid()}"
+        self.queue = queue or get_work_queue()
+        self.threads = max(1, threads)
+        self._draining = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._unrecorded: Dict[int, Tuple[bool, bytes]] = {}  # item_id -> (succeeded, result or error)
+
+    def drain(self):
+        if not self._draining.is_set():
+            logger.info(f"🛑 Worker {self.name} draining: finishing running reviews, claiming no more")
+        self._draining.set()
+
+    def run(self):
+        """Warm up, then process the queue until drained."""
+        # Imported here so the queue and launcher modules stay light
+        from app.startup import warm_up
+
+        warm_up(pools=True)
+        heartbeat = threading.Thread(target=self._heartbeat, name=f"{self.name}-heartbeat", daemon=True)
+        heartbeat.start()
+        loops = [
+            threading.Thread(target=self._loop, name=f"review-worker-{i}") for i in range(self.threads)
+        ]
+        for loop in loops:
+            loop.start()
+        logger.info(f"👷 Worker {self.name} ready with {self.threads} threads")
+        for loop in loops:
+            loop.join()
+        self._stopped.set()
+        self._record_pending()
+        logger.info(f"👋 Worker {self.name} stopped")
+
+    def _heartbeat(self):
+        while not self._stopped.wait(self.queue.lease_seconds / 3):
+            try:
+                self.queue.extend_leases(self.name)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Lease heartbeat failed: {e}")
+            self._record_pending()
+
+    def _loop(self):
+        while not self._draining.is_set():
+            try:
+                item = self.queue.claim(self.name)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Work queue claim failed: {e}")
+                item = None
+            if item is None:
+                self._draining.wait(WORKER_POLL_INTERVAL)
+                continue
+            self._execute(item)
+
+    def _execute(self, item: WorkItem):
+        logger.debug(f"🤖 Running work item {item.item_id} (attempt {item.attempts})")
+        try:
+            call = pickle.loads(item.payload)
+            result = pickle.dumps(call[0](*call[1:]))
+        except Exception as e:
+            logger.error(f"💥 Work item {item.item_id} failed: {e}")
+            self._record(item.item_id, False, dump_error(e))
+            return
+        self._record(item.item_id, True, result)
+
+    def _record(self, item_id: int, succeeded: bool, data: bytes) -> bool:
+        """Write the outcome to the queue; on a store error keep it for the heartbeat to retry."""
+        try:
+            if succeeded:
+                self.queue.complete(item_id, data)
+            else:
+                self.queue.fail(item_id, data)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Could not record work item {item_id}, will retry: {e}")
+            with self._lock:
+                self._unrecorded[item_id] = (succeeded, data)
+            return False
+        return True
+
+    def _record_pending(self):
+        with self._lock:
+            pending = list(self._unrecorded.items())
+            self._unrecorded.clear()
+        for item_id, (succeeded, data) in pending:
+            if self._record(item_id, succeeded, data):
+                logger.info(f"✅ Recorded work item {item_id} after a retry")
+
+
+def run_worker(name: str = "worker", threads: int = WORKER_THREADS):
+    """Entry point of a worker process."""
+    configure_logging()
+    worker = ReviewWorker(name, threads=threads)
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: worker.drain())
+    try:
+        worker.run()
+    finally:
+        from app.llm_http import close_llm_http_client
+        from app.telemetry import shutdown_tracing
+
+        close_llm_http_client()
+        shutdown_tracing()
+        stop_logging()
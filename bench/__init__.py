@@ -0,0 +1 @@
+"""Offline benchmark and load-test harness for the review API (see ``bench/load.py``)."""
@@ -0,0 +1,122 @@
+"""Synthetic resumes (as real, text-extractable PDFs) and job descriptions.
+
+Everything is derived from a seed, so two runs with the same arguments send
+byte-identical uploads and hit the caches the same way.
+"""
+
+import random
+from typing import List, NamedTuple
+
+SKILLS = [
+    "Python", "Django", "FastAPI", "Flask", "SQL", "PostgreSQL", "MySQL", "Redis", "Kafka", "Docker",
+    "Kubernetes", "Terraform", "AWS", "GCP", "Azure", "Linux", "Git", "CI/CD", "React", "TypeScript",
+    "JavaScript", "Node.js", "Go", "Rust", "Java", "Spring", "Scala", "Spark", "Airflow", "pandas",
+    "NumPy", "PyTorch", "TensorFlow", "scikit-learn", "MLOps", "GraphQL", "REST", "gRPC", "Celery",
+    "RabbitMQ", "Elasticsearch", "MongoDB", "Snowflake", "dbt", "Tableau", "Agile", "Scrum",
+    "Leadership", "Mentoring", "Communication",
+]
+
+_TITLES = ["Software Engineer", "Backend Engineer", "Data Engineer", "ML Engineer", "Platform Engineer"]
+_COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella Labs", "Hooli", "Stark Industries", "Wayne Tech"]
+_DUTIES = [
+    "Built and maintained {0} services handling millions of requests per day.",
+    "Designed data pipelines with {0} and {1} for analytics teams.",
+    "Migrated legacy workloads to {0}, cutting infrastructure cost by 30%.",
+    "Led a team of four engineers delivering {0} features on schedule.",
+    "Improved test coverage of the {0} codebase from 40% to 85%.",
+    "Introduced {0} monitoring and on-call runbooks for production incidents.",
+]
+
+_LINES_PER_PAGE = 60
+
+
+class Resume(NamedTuple):
+    name: str
+    skills: List[str]
+    pdf: bytes
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(lines: List[str]) -> bytes:
+    """Minimal multi-page PDF (Helvetica, 60 lines per page) that pdfplumber can extract."""
+    pages = [lines[i:i + _LINES_PER_PAGE] for i in range(0, len(lines), _LINES_PER_PAGE)] or [[]]
+    font_id = 3
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        font_id: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    kids = []
+    next_id = 4
+    for page_lines in pages:
+        body = "BT /F1 10 Tf 12 TL 50 760 Td " + " ".join(f"({_escape(line)}) Tj T*" for line in page_lines) + " ET"
+        stream = body.encode("latin-1", "replace")
+        page_id, content_id = next_id, next_id + 1
+        next_id += 2
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        objects[page_id] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (content_id, font_id)
+        )
+        kids.append(b"%d 0 R" % page_id)
+    objects[2] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % len(kids)
+
+    out = b"%PDF-1.4\n"
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += b"%d 0 obj\n" % obj_id + objects[obj_id] + b"\nendobj\n"
+    xref = len(out)
+    size = max(objects) + 1
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % size
+    out += b"".join(b"%010d 00000 n \n" % offsets[i] for i in range(1, size))
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref)
+    return out
+
+
+def make_resume(index: int, rng: random.Random, oversized: bool = False) -> Resume:
+    """One resume; ``oversized`` pads it past the inline limit so it takes the RAG path."""
+    name = f"Candidate {index:05d}"
+    skills = rng.sample(SKILLS, rng.randint(6, 14))
+    lines = [
+        name,
+        f"{rng.choice(_TITLES)} | candidate{index:05d}@example.com",
+        "",
+        "Summary",
+        f"Engineer with {rng.randint(1, 15)} years of experience in {', '.join(skills[:3])}.",
+        "",
+        "Experience",
+    ]
+    for _ in range(rng.randint(2, 4)):
+        lines.append(f"{rng.choice(_TITLES)}, {rng.choice(_COMPANIES)} ({rng.randint(2008, 2020)} - {rng.randint(2021, 2025)})")
+        for _ in range(3):
+            lines.append("- " + rng.choice(_DUTIES).format(*rng.sample(skills, 2)))
+    lines += ["", "Skills", ", ".join(skills), "", "Education", "BSc Computer Science, State University"]
+    if oversized:
+        # ~40k characters, well above RESUME_INLINE_MAX_TOKENS at 4 characters per token
+        while sum(len(line) for line in lines) < 40_000:
+            lines.append("- " + rng.choice(_DUTIES).format(*rng.sample(skills, 2)))
+    return Resume(name, skills, write_pdf(lines))
+
+
+def make_job_description(index: int, rng: random.Random) -> str:
+    skills = rng.sample(SKILLS, rng.randint(4, 8))
+    return (
+        f"{rng.choice(_TITLES)} (posting {index})\n"
+        f"We are looking for an engineer to join {rng.choice(_COMPANIES)}.\n"
+        "Responsibilities:\n"
+        + "".join("- " + rng.choice(_DUTIES).format(*rng.sample(skills, 2)) + "\n" for _ in range(3))
+        + "Requirements:\n"
+        f"- {rng.randint(2, 8)}+ years of professional experience\n"
+        f"- Strong knowledge of {', '.join(skills)}\n"
+    )
+
+
+def build_corpus(resumes: int, jobs: int, seed: int = 0, oversized_fraction: float = 0.0):
+    """``resumes`` PDFs and ``jobs`` job descriptions, deterministic for a given seed."""
+    rng = random.Random(seed)
+    resume_list = [make_resume(i, rng, oversized=rng.random() < oversized_fraction) for i in range(resumes)]
+    job_list = [make_job_description(i, rng) for i in range(jobs)]
+    return resume_list, job_list
@@ -0,0 +1,287 @@
+"""Offline evaluation of review scores against labeled fixtures.
+
+Runs the review pipeline (``app.pipeline.run_review``: all three stages, the
+stage pools, prompt compaction, structured-output repair and scoring) over a
+directory of labeled cases, with every model call answered from a recording
+(``bench.replay``). No network, no API key, and the same scores on every run,
+so it can gate every change:
+
+    python -m bench.evaluate                                   # replay bench/fixtures/eval
+    python -m bench.evaluate --replay-latency --compare bench/eval_baseline.json
+    python -m bench.evaluate --replay-latency --output bench/eval_baseline.json   # refresh the baseline
+    python -m bench.evaluate --record --repeats 3              # (re-)record against the configured model
+
+The fixture directory holds ``cases.json``::
+
+    {"cases": [{"id": "...", "resume": "resumes/a.pdf", "job_description": "jobs/a.txt",
+                "expected_score": [60, 85], "scoring_mode": "llm"}]}
+
+(paths relative to the directory, ``scoring_mode`` optional) and the
+recording, ``replay.json``. Each case runs ``--repeats`` times and the report
+gives, per case and overall: score mean and spread across repeats, agreement
+with the expected band, tokens and latency per review, and the throughput at
+``--parallelism`` concurrent reviews. Without ``--replay-latency`` answers
+come back at once, so latency and throughput only measure the app's own
+overhead and vary more from run to run.
+
+A prompt, model or CrewAI change alters the requests, which then miss the
+recording and fail the case: re-record with ``--record`` (with
+``GEMINI_API_KEY`` set, or ``LLM_BASE_URL`` pointing at another
+Gemini-compatible endpoint) and commit the new ``replay.json``.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional, Tuple
+
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")  # chromadb
+
+from bench.load import compare, peak_rss_mb, summarize
+from bench.replay import MODE_RECORD, MODE_REPLAY, ReplayCache, install_replay, replay_repeat
+
+logger = logging.getLogger("bench")
+
+EVAL_FORMAT_VERSION = 1
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "eval")
+# Metrics checked by --compare: (path in the results, True when higher is better)
+EVAL_COMPARED_METRICS = [
+    (("agreement",), True),
+    (("tokens_per_review",), False),
+    (("latency_ms", "p95"), False),
+    (("throughput_rps",), True),
+]
+
+
+class Case(NamedTuple):
+    case_id: str
+    resume_path: str
+    resume_sha256: str
+    job_description: str
+    expected_score: Tuple[int, int]  # inclusive band
+    scoring_mode: Optional[str]
+
+
+class Run(NamedTuple):
+    case_id: str
+    repeat: int
+    score: Optional[int]
+    latency_ms: float
+    prompt_tokens: int
+    completion_tokens: int
+    error: Optional[str] = None
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m bench.evaluate", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="directory with cases.json (default bench/fixtures/eval)")
+    parser.add_argument("--replay", default=None, help="recording file (default <fixtures>/replay.json)")
+    parser.add_argument("--repeats", type=int, default=3, help="runs per case (default 3)")
+    parser.add_argument("--parallelism", type=int, default=4, help="reviews run at once (default 4)")
+    parser.add_argument("--cases", default=None, help="comma-separated case ids to run (default all)")
+    parser.add_argument("--record", action="store_true", help="call the real model for requests not recorded yet and save them")
+    parser.add_argument("--replay-latency", action="store_true", help="sleep each answer's recorded latency, for realistic throughput")
+    parser.add_argument("--min-agreement", type=float, default=0.0, help="exit 1 when fewer runs than this land in their band (0-1)")
+    parser.add_argument("--output", default="bench/last_eval.json", help="results JSON (default bench/last_eval.json)")
+    parser.add_argument("--compare", default=None, help="baseline results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression for --compare (default 0.15)")
+    parser.add_argument("--verbose", action="store_true", help="keep app logs and crew output")
+    return parser.parse_args(argv)
+
+
+def load_cases(fixtures: str, only: Optional[List[str]] = None) -> List[Case]:
+    with open(os.path.join(fixtures, "cases.json"), encoding="utf-8") as f:
+        entries = json.load(f)["cases"]
+    cases = []
+    for entry in entries:
+        if only and entry["id"] not in only:
+            continue
+        resume_path = os.path.join(fixtures, entry["resume"])
+        with open(resume_path, "rb") as f:
+            resume_sha256 = hashlib.sha256(f.read()).hexdigest()
+        with open(os.path.join(fixtures, entry["job_description"]), encoding="utf-8") as f:
+            job_description = f.read()
+        low, high = entry["expected_score"]
+        cases.append(Case(entry["id"], resume_path, resume_sha256, job_description, (low, high), entry.get("scoring_mode")))
+    if only and len(cases) != len(only):
+        missing = set(only) - {case.case_id for case in cases}
+        raise SystemExit(f"unknown case ids: {', '.join(sorted(missing))}")
+    return cases
+
+
+def run_case(case: Case, repeat: int) -> Run:
+    from app.pipeline import run_review
+
+    started = time.perf_counter()
+    try:
+        with replay_repeat(repeat):
+            outcome = run_review(
+                os.path.basename(case.resume_path), case.resume_path, case.job_description,
+                case.resume_sha256, scoring_mode=case.scoring_mode,
+            )
+    except Exception as e:
+        return Run(case.case_id, repeat, None, (time.perf_counter() - started) * 1000, 0, 0, f"{type(e).__name__}: {e}")
+    total = (outcome.token_usage or {}).get("total", {})
+    return Run(
+        case.case_id, repeat, int(outcome.result["ats_score"]), (time.perf_counter() - started) * 1000,
+        total.get("prompt", 0), total.get("completion", 0),
+    )
+
+
+def _in_band(run: Run, cases: List[Case]) -> bool:
+    low, high = next(case.expected_score for case in cases if case.case_id == run.case_id)
+    return low <= run.score <= high
+
+
+def _evaluate(args: argparse.Namespace, cases: List[Case]) -> dict:
+    import app.pipeline as pipeline
+    from app.pool import warm_pools
+
+    # Every repeat must ask the agents: an analysis cached by the previous repeat would hide their variance
+    pipeline.get_cached_job_analysis = lambda job_description: None
+    pipeline.get_cached_resume_analysis = lambda resume_sha256: None
+    warm_pools()
+
+    jobs = [(case, repeat) for repeat in range(args.repeats) for case in cases]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.parallelism, thread_name_prefix="eval") as executor:
+        runs = list(executor.map(lambda job: run_case(*job), jobs))
+    duration = time.perf_counter() - started
+
+    report = {}
+    for case in cases:
+        case_runs = [run for run in runs if run.case_id == case.case_id]
+        succeeded = [run for run in case_runs if run.error is None]
+        scores = [run.score for run in succeeded]
+        low, high = case.expected_score
+        report[case.case_id] = {
+            "expected_score": [low, high],
+            "scores": scores,
+            "score_mean": round(statistics.fmean(scores), 2) if scores else None,
+            "score_stdev": round(statistics.pstdev(scores), 2) if scores else None,
+            # Share of repeats in the band; failed runs count as misses
+            "agreement": round(sum(low <= score <= high for score in scores) / len(case_runs), 3),
+            "band_distance": max(max(low - score, score - high, 0) for score in scores) if scores else None,
+            "tokens": {
+                "prompt": round(statistics.fmean(run.prompt_tokens for run in succeeded), 1),
+                "completion": round(statistics.fmean(run.completion_tokens for run in succeeded), 1),
+            } if succeeded else None,
+            "latency_ms": round(statistics.fmean(run.latency_ms for run in succeeded), 1) if succeeded else None,
+            "errors": [run.error for run in case_runs if run.error],
+        }
+
+    succeeded = [run for run in runs if run.error is None]
+    stdevs = [entry["score_stdev"] for entry in report.values() if entry["score_stdev"] is not None]
+    return {
+        "cases": report,
+        "runs": {"sent": len(runs), "succeeded": len(succeeded), "failed": len(runs) - len(succeeded)},
+        "agreement": round(sum(_in_band(run, cases) for run in succeeded) / len(runs), 3),
+        "score_stdev": {"mean": round(statistics.fmean(stdevs), 2), "max": max(stdevs)} if stdevs else {},
+        "tokens_per_review": round(statistics.fmean(run.prompt_tokens + run.completion_tokens for run in succeeded), 1)
+        if succeeded else None,
+        "latency_ms": summarize([run.latency_ms for run in succeeded]),
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(succeeded) / duration, 2) if duration else None,
+    }
+
+
+def print_report(results: dict):
+    runs = results["runs"]
+    print(f"\n{'case':<24}{'expected':>10}{'mean':>8}{'stdev':>7}{'agree':>7}{'tokens':>8}{'ms':>9}")
+    for case_id, entry in results["cases"].items():
+        low, high = entry["expected_score"]
+        mean = "-" if entry["score_mean"] is None else f"{entry['score_mean']:.1f}"
+        stdev = "-" if entry["score_stdev"] is None else f"{entry['score_stdev']:.1f}"
+        tokens = "-" if entry["tokens"] is None else f"{entry['tokens']['prompt'] + entry['tokens']['completion']:.0f}"
+        latency = "-" if entry["latency_ms"] is None else f"{entry['latency_ms']:.1f}"
+        flag = "" if entry["agreement"] == 1 else "  MISS"
+        print(f"{case_id:<24}{f'{low}-{high}':>10}{mean:>8}{stdev:>7}{entry['agreement']:>7.0%}{tokens:>8}{latency:>9}{flag}")
+        for error in entry["errors"]:
+            print(f"  {error}")
+    stdev = results["score_stdev"]
+    print(f"\n{runs['succeeded']}/{runs['sent']} runs succeeded in {results['duration_s']} s "
+          f"-> {results['throughput_rps']} reviews/s at parallelism {results['config']['parallelism']}")
+    print(f"agreement with labels {results['agreement']:.1%}, score stdev mean {stdev.get('mean', '-')} "
+          f"max {stdev.get('max', '-')}, {results['tokens_per_review']} tokens/review, "
+          f"latency p50 {results['latency_ms'].get('p50', '-')} ms p95 {results['latency_ms'].get('p95', '-')} ms")
+    replay = results["replay"]
+    print(f"replay: {replay['hits']} hits, {replay['misses']} misses, {replay['recorded']} recorded ({replay['keys']} requests)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.repeats < 1 or args.parallelism < 1:
+        raise SystemExit("--repeats and --parallelism must be at least 1")
+
+    fixtures = os.path.abspath(args.fixtures)
+    cases = load_cases(fixtures, args.cases.split(",") if args.cases else None)
+    replay_path = args.replay or os.path.join(fixtures, "replay.json")
+    cache = ReplayCache(replay_path)
+    # The resume path is part of the prompt; the recording must not depend on where the repo lives
+    install_replay(cache, MODE_RECORD if args.record else MODE_REPLAY, [fixtures + os.sep], args.replay_latency)
+
+    with contextlib.ExitStack() as stack:
+        if not args.verbose:
+            logging.disable(logging.CRITICAL)
+            devnull = stack.enter_context(open(os.devnull, "w"))
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+        outcome = _evaluate(args, cases)
+    logging.disable(logging.NOTSET)
+    if args.record:
+        cache.save()
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare", "tolerance", "verbose")}
+    config["fixtures"] = os.path.relpath(fixtures)
+    config["replay"] = os.path.relpath(replay_path)
+    results = {
+        "format": EVAL_FORMAT_VERSION,
+        "config": config,
+        "platform": {
+            "python": platform.python_version(),
+            "system": platform.system(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        **outcome,
+        "peak_rss_mb": peak_rss_mb(),
+        "replay": cache.stats(),
+    }
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+    print_report(results)
+    if args.output:
+        print(f"\nresults written to {args.output}")
+    if args.record:
+        print(f"recording written to {replay_path}")
+
+    failures = []
+    if results["runs"]["failed"]:
+        failures.append(f"{results['runs']['failed']} run(s) failed")
+    if results["agreement"] < args.min_agreement:
+        failures.append(f"agreement {results['agreement']:.1%} below --min-agreement {args.min_agreement:.0%}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance, EVAL_COMPARED_METRICS)
+        if regressions:
+            failures.append(f"{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+    for failure in failures:
+        print(f"\n{failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""Local Gemini-compatible model server with injectable latency and failures.
+
+Serves ``POST /v1beta/models/{model}:generateContent`` with the same answers
+as ``bench.fakes.FakeLLM``, so the real LLM call path (litellm, the shared
+HTTP pool and ``app.llm_gateway``) can be exercised offline:
+
+    python -m bench.fake_llm_server --port 8090 --rate-limited 0.2 --slow 0.05
+    LLM_BASE_URL=http://127.0.0.1:8090 python -m bench.load --llm-base-url http://127.0.0.1:8090
+
+``--fail-model`` makes every call to one model return 503, to exercise the
+circuit breaker and ``LLM_FALLBACK_MODEL``.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List, NamedTuple, Optional
+from bench.fakes import fake_answer
+
+_PATH_RE = re.compile(r"^/v1beta/models/([^/:]+):generateContent")
+
+
+class ServerBehaviour(NamedTuple):
+    latency: float = 0.2            # seconds per call
+    jitter: float = 0.25            # +/- fraction of the latency, uniform
+    rate_limited: float = 0.0       # probability of a 429
+    errors: float = 0.0             # probability of a 500
+    slow: float = 0.0               # probability of a slow-tail response
+    slow_seconds: float = 10.0
+    retry_after: int = 1            # Retry-After sent with 429s
+    fail_models: tuple = ()         # models that always answer 503
+    malformed: float = 0.0          # probability of a near-JSON answer (see ``bench.fakes.malform``)
+
+
+def _texts(value) -> Iterator[str]:
+    """Every ``text`` field in a Gemini request body, in order."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key == "text" and isinstance(item, str):
+                yield item
+            else:
+                yield from _texts(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _texts(item)
+
+
+def _error(code: int, status: str, message: str) -> dict:
+    return {"error": {"code": code, "message": message, "status": status}}
+
+
+class FakeModelServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, behaviour: ServerBehaviour, seed: int = 0):
+        super().__init__(address, _Handler)
+        self.behaviour = behaviour
+        self.outcomes = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        """(delay in seconds, outcome) for the next call."""
+        b = self.behaviour
+        with self._lock:
+            roll = self._rng.random()
+            delay = b.latency * (1 + self._rng.uniform(-b.jitter, b.jitter))
+            slow = self._rng.random() < b.slow
+        if roll < b.rate_limited:
+            return 0.0, "rate_limited"
+        if roll < b.rate_limited + b.errors:
+            return delay, "error"
+        return (b.slow_seconds if slow else delay), ("slow" if slow else "ok")
+
+    def malformed(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.behaviour.malformed
+
+    def record(self, outcome: str):
+        with self._lock:
+            self.outcomes[outcome] += 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeModelServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: dict, headers: Optional[dict] = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        match = _PATH_RE.match(self.path)
+        if not match:
+            self._reply(404, _error(404, "NOT_FOUND", f"unknown path {self.path}"))
+            return
+        model = match.group(1)
+        if model in self.server.behaviour.fail_models:
+            self.server.record("unavailable")
+            self._reply(503, _error(503, "UNAVAILABLE", f"{model} is overloaded"))
+            return
+
+        delay, outcome = self.server.sample()
+        time.sleep(delay)
+        self.server.record(outcome)
+        if outcome == "rate_limited":
+            self._reply(429, _error(429, "RESOURCE_EXHAUSTED", "Quota exceeded"),
+                        {"Retry-After": str(self.server.behaviour.retry_after)})
+            return
+        if outcome == "error":
+            self._reply(500, _error(500, "INTERNAL", "injected failure"))
+            return
+
+        prompt = "\n".join(_texts(json.loads(body or b"{}")))
+        _, reply = fake_answer(prompt, malformed=self.server.malformed())
+        prompt_tokens, reply_tokens = len(prompt) // 4, len(reply) // 4
+        self._reply(200, {
+            "candidates": [{"content": {"parts": [{"text": reply}], "role": "model"}, "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {
+                "promptTokenCount": prompt_tokens,
+                "candidatesTokenCount": reply_tokens,
+                "totalTokenCount": prompt_tokens + reply_tokens,
+            },
+            "modelVersion": model,
+        })
+
+
+def start_server(behaviour: ServerBehaviour, host: str = "127.0.0.1", port: int = 0, seed: int = 0) -> FakeModelServer:
+    """Serve in a daemon thread; ``port=0`` picks a free port (see ``server.server_address``)."""
+    server = FakeModelServer((host, port), behaviour, seed)
+    threading.Thread(target=server.serve_forever, name="fake-llm-server", daemon=True).start()
+    return server
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.25)
+    parser.add_argument("--rate-limited", type=float, default=0.0, help="share of calls answered 429")
+    parser.add_argument("--errors", type=float, default=0.0, help="share of calls answered 500")
+    parser.add_argument("--slow", type=float, default=0.0, help="share of calls delayed by --slow-seconds")
+    parser.add_argument("--slow-seconds", type=float, default=10.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--malformed", type=float, default=0.0, help="share of answers sent as near-JSON")
+    parser.add_argument("--fail-model", action="append", default=[], help="model name that always answers 503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    behaviour = ServerBehaviour(
+        latency=args.latency, jitter=args.jitter, rate_limited=args.rate_limited, errors=args.errors,
+        slow=args.slow, slow_seconds=args.slow_seconds, retry_after=args.retry_after,
+        fail_models=tuple(args.fail_model), malformed=args.malformed,
+    )
+    server = FakeModelServer((args.host, args.port), behaviour, args.seed)
+    print(f"Fake Gemini API on http://{args.host}:{server.server_address[1]} ({behaviour})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Outcomes: {dict(server.outcomes)}")
+
+
+if __name__ == "__main__":
+    main()
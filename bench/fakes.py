@@ -0,0 +1,256 @@
+"""Deterministic local stand-ins for the Gemini LLM and the Google embedder.
+
+``install_fakes`` swaps them into the agent and embedder factories, so the
+whole app (pools, crews, caches, scoring) runs unchanged while model calls
+cost a configurable sleep instead of a network round trip and quota.
+Answers are derived from the prompt (skills named in the resume or job text),
+so scores vary across the corpus the way real ones would.
+"""
+
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from typing import List, NamedTuple, Optional, Tuple
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from crewai.llms.base_llm import BaseLLM
+from bench.corpus import SKILLS
+
+EMBEDDING_DIMENSIONS = 768
+
+_SKILL_PATTERNS = [(skill, re.compile(r"(?<![\w/.+-])" + re.escape(skill) + r"(?![\w/+-])")) for skill in SKILLS]
+_RESUME_JSON_RE = re.compile(r"Resume analysis \(JSON\): (\{.*\})")
+_JOB_JSON_RE = re.compile(r"Job description analysis \(JSON\): (\{.*\})")
+_MATCHED_RE = re.compile(r"Job items matched by the resume: (.*)")
+_MISSING_RE = re.compile(r"Job items missing from the resume: (.*)")
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class FakeLatency(NamedTuple):
+    mean: float = 0.2             # seconds per call
+    jitter: float = 0.25          # +/- fraction of the mean, uniform
+    failure_rate: float = 0.0     # probability that a call raises
+    malformed_rate: float = 0.0   # probability that an answer comes back as near-JSON (see ``malform``)
+
+
+class FakeStats:
+    """Thread-safe call counters, reported alongside the benchmark results."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = Counter()
+        self.failures = Counter()
+        self.embedded_texts = 0
+
+    def record(self, kind: str, failed: bool = False):
+        with self._lock:
+            self.calls[kind] += 1
+            if failed:
+                self.failures[kind] += 1
+
+    def record_embeddings(self, count: int):
+        with self._lock:
+            self.embedded_texts += count
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "llm_calls": dict(self.calls),
+                "llm_failures": dict(self.failures),
+                "embedded_texts": self.embedded_texts,
+            }
+
+
+stats = FakeStats()
+
+
+class _Sampler:
+    def __init__(self, latency: FakeLatency, seed: int):
+        self.latency = latency
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        """(delay in seconds, whether to fail)"""
+        with self._lock:
+            spread = self._rng.uniform(-self.latency.jitter, self.latency.jitter)
+            fail = self._rng.random() < self.latency.failure_rate
+        return max(0.0, self.latency.mean * (1 + spread)), fail
+
+    def malformed(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.latency.malformed_rate
+
+
+def find_skills(text: str) -> List[str]:
+    return [skill for skill, pattern in _SKILL_PATTERNS if pattern.search(text)]
+
+
+def _section_items(text: str, heading: str) -> List[str]:
+    items = []
+    in_section = False
+    for line in text.splitlines():
+        if line.strip().rstrip(":").lower() == heading:
+            in_section = True
+        elif in_section and line.startswith("- "):
+            items.append(line[2:].strip())
+        elif in_section and items:
+            break
+    return items
+
+
+def _embedded_json(pattern: re.Pattern, text: str) -> dict:
+    match = pattern.search(text)
+    if not match:
+        return {}
+    try:
+        return json.loads(match.group(1))
+    except json.JSONDecodeError:
+        return {}
+
+
+def _resume_answer(text: str) -> dict:
+    skills = find_skills(text)
+    return {"summary": f"Engineer experienced in {', '.join(skills[:3]) or 'software'}.", "keywords": skills}
+
+
+def _job_answer(text: str) -> dict:
+    return {
+        "keywords": find_skills(text),
+        "responsibilities": _section_items(text, "responsibilities"),
+        "requirements": _section_items(text, "requirements"),
+    }
+
+
+def _feedback(resume_keywords: List[str], job_keywords: List[str]) -> dict:
+    matched = [k for k in job_keywords if k in resume_keywords]
+    missing = [k for k in job_keywords if k not in resume_keywords]
+    return {
+        "strengths": "; ".join(matched) or "None",
+        "weaknesses": "; ".join(missing) or "None",
+        "summary": f"Matches {len(matched)} of {len(job_keywords)} job keywords.",
+    }
+
+
+def _listed_items(pattern: re.Pattern, text: str) -> List[str]:
+    match = pattern.search(text)
+    items = match.group(1).split("; ") if match else []
+    return [item for item in items if item and item != "none"]
+
+
+def _ats_answer(text: str, feedback_only: bool) -> dict:
+    if feedback_only:
+        # Hybrid scoring lists the matched and missing job items instead of sending the job analysis
+        matched, missing = _listed_items(_MATCHED_RE, text), _listed_items(_MISSING_RE, text)
+        return _feedback(matched, matched + missing)
+    resume_keywords = _embedded_json(_RESUME_JSON_RE, text).get("keywords", [])
+    job_keywords = _embedded_json(_JOB_JSON_RE, text).get("keywords", [])
+    feedback = _feedback(resume_keywords, job_keywords)
+    matched = sum(1 for k in job_keywords if k in resume_keywords)
+    return {"ats_score": round(100 * matched / len(job_keywords)) if job_keywords else 0, "analysis": feedback}
+
+
+def malform(answer: dict) -> str:
+    """``answer`` the way models often get it wrong: fenced, lists for strings, trailing commas."""
+    def listify(value):
+        if isinstance(value, dict):
+            return {key: listify(item) for key, item in value.items()}
+        if isinstance(value, str) and "; " in value:
+            return value.split("; ")
+        return value
+    text = json.dumps(listify(answer), indent=2)
+    return "```json\n" + re.sub(r"\n(\s*)([}\]])", r",\n\1\2", text) + "\n```"
+
+
+def fake_answer(text: str, malformed: bool = False) -> Tuple[str, str]:
+    """(stage kind, ``Final Answer`` reply) for an agent prompt."""
+    # CrewAI opens the system prompt with "You are <role>."
+    if "Job Description Analyzer" in text:
+        kind, answer = "job_analysis", _job_answer(text)
+    elif "ATS Score Generator" in text and "already been computed" in text:
+        kind, answer = "ats_feedback", _ats_answer(text, feedback_only=True)
+    elif "ATS Score Generator" in text:
+        kind, answer = "ats_score", _ats_answer(text, feedback_only=False)
+    else:
+        kind, answer = "resume_analysis", _resume_answer(text)
+    body = malform(answer) if malformed else json.dumps(answer)
+    return kind, "Thought: I now can give a great answer\nFinal Answer: " + body
+
+
+class FakeLLM(BaseLLM):
+    """Answers each agent's prompt locally after a sampled delay."""
+
+    def __init__(self, sampler: _Sampler, model: str = "bench/fake-llm"):
+        super().__init__(model=model, temperature=0)
+        self._sampler = sampler
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, from_task=None, from_agent=None):
+        text = messages if isinstance(messages, str) else "\n".join(str(m.get("content", "")) for m in messages)
+        kind, reply = fake_answer(text, malformed=self._sampler.malformed())
+        delay, fail = self._sampler.sample()
+        time.sleep(delay)
+        stats.record(kind, failed=fail)
+        if fail:
+            raise RuntimeError(f"bench: injected {kind} LLM failure")
+        return reply
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def get_context_window_size(self) -> int:
+        return 1_000_000
+
+
+class FakeEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Hashed bag-of-words vectors (unit length) after a sampled delay per batch."""
+
+    def __init__(self, sampler: _Sampler):
+        self._sampler = sampler
+
+    def __call__(self, input: Documents) -> Embeddings:
+        delay, fail = self._sampler.sample()
+        time.sleep(delay)
+        if fail:
+            raise RuntimeError("bench: injected embedder failure")
+        stats.record_embeddings(len(input))
+        vectors = []
+        for text in input:
+            vector = [0.0] * EMBEDDING_DIMENSIONS
+            for token in _TOKEN_RE.findall(text.lower()):
+                bucket = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=4).digest(), "little")
+                vector[bucket % EMBEDDING_DIMENSIONS] += 1.0
+            norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+            vectors.append([x / norm for x in vector])
+        return vectors
+
+
+def install_fakes(llm: Optional[FakeLatency], embedder: Optional[FakeLatency] = None, seed: int = 0):
+    """Route every agent LLM and the RAG embedder to the local fakes. Call before the app starts.
+
+    With ``llm=None`` the agents keep their real LLM (e.g. pointed at ``bench/fake_llm_server.py``).
+    """
+    import app.agents.agent1 as agent1
+    import app.agents.agent2 as agent2
+    import app.agents.agent3 as agent3
+    import app.embeddings as embeddings
+    from app.embeddings import CachingEmbeddingFunction
+
+    llm_sampler = _Sampler(llm or FakeLatency(), seed)
+    embedder_sampler = _Sampler(embedder or FakeLatency(mean=0.05), seed + 1)
+
+    def build_llm():
+        return FakeLLM(llm_sampler)
+
+    def build_embedder_config(resume_sha256: Optional[str] = None) -> dict:
+        inner = FakeEmbeddingFunction(embedder_sampler)
+        if resume_sha256 is not None:
+            inner = CachingEmbeddingFunction(inner, namespace=resume_sha256)
+        return {"provider": "custom", "config": {"embedder": inner}}
+
+    if llm is not None:
+        agent1._build_llm = agent2._build_llm = agent3._build_llm = build_llm
+    embeddings.build_embedder_config = build_embedder_config
@@ -0,0 +1,373 @@
+"""Load test ``/run-crew`` in-process against local fake models.
+
+Builds a synthetic corpus, starts the real FastAPI app (lifespan included)
+behind an in-memory ASGI transport, swaps the LLM and embedder for the
+fakes in ``bench.fakes`` and drives it from ``--concurrency`` closed-loop
+clients. Reports latency percentiles, requests per second, the per-stage
+breakdown from the ``Server-Timing`` headers and peak RSS, and writes them
+as JSON so a committed baseline can be diffed in review.
+
+    python -m bench.load --requests 200 --concurrency 8
+    python -m bench.load --compare bench/baseline.json
+    python -m bench.load --output bench/baseline.json   # refresh the baseline
+    python -m bench.load --llm-server --llm-rate-limited 0.1   # real HTTP path via app.llm_gateway
+    python -m bench.load --llm-malformed 0.3   # near-JSON answers, repaired by app.repair
+
+App settings (``CREW_MAX_WORKERS``, ``PIPELINE_MODE``, ...) are read from the
+environment as usual.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+import numpy as np
+
+# The app reads these at import time.
+os.environ.setdefault("API_KEY", "bench")
+os.environ.setdefault("ALLOWED_ORIGINS", "http://localhost")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")  # chromadb
+# One key drives all the load; per-tenant limits would measure the limiter, not the app
+os.environ.setdefault("TENANT_RATE_LIMIT_RPS", "0")
+os.environ.setdefault("TENANT_MAX_CONCURRENT", "0")
+# A persistent result store would answer a repeated run (same seed, same corpus) without any crew work
+os.environ.setdefault("RESULT_STORE_URL", "memory://")
+
+import httpx
+from bench.corpus import build_corpus
+from bench.fake_llm_server import ServerBehaviour, start_server
+from bench.fakes import FakeLatency, install_fakes, stats as fake_stats
+
+logger = logging.getLogger("bench")
+
+RESULT_FORMAT_VERSION = 1
+# Metrics checked by --compare: (path in the results, True when higher is better)
+COMPARED_METRICS = [
+    (("latency_ms", "p50"), False),
+    (("latency_ms", "p95"), False),
+    (("latency_ms", "p99"), False),
+    (("throughput_rps",), True),
+    (("peak_rss_mb",), False),
+]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m bench.load", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=200, help="measured requests (default 200)")
+    parser.add_argument("--warmup", type=int, default=8, help="requests sent first and left out of the stats (default 8)")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients (default 8)")
+    parser.add_argument("--resumes", type=int, default=0, help="distinct resumes, reused round-robin; 0 = one per request (all cache misses)")
+    parser.add_argument("--jobs", type=int, default=10, help="distinct job descriptions, reused round-robin (default 10)")
+    parser.add_argument("--oversized-fraction", type=float, default=0.0, help="share of resumes too long to inline, exercising the RAG path")
+    parser.add_argument("--scoring-mode", choices=["local", "llm", "hybrid"], default=None, help="scoring_mode form field (default: server default)")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="mean fake LLM latency in seconds (default 0.2)")
+    parser.add_argument("--llm-jitter", type=float, default=0.25, help="+/- fraction of the mean (default 0.25)")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0, help="probability a fake LLM call raises")
+    parser.add_argument("--llm-malformed", type=float, default=0.0, help="share of fake LLM answers sent as near-JSON (exercises app.repair)")
+    parser.add_argument("--llm-server", action="store_true", help="serve the fake LLM over HTTP (bench.fake_llm_server) instead of in-process")
+    parser.add_argument("--llm-rate-limited", type=float, default=0.0, help="with --llm-server: share of calls answered 429")
+    parser.add_argument("--llm-slow", type=float, default=0.0, help="with --llm-server: share of calls delayed by --llm-slow-seconds")
+    parser.add_argument("--llm-slow-seconds", type=float, default=10.0)
+    parser.add_argument("--embedder-latency", type=float, default=0.05, help="mean fake embedder latency per batch in seconds")
+    parser.add_argument("--embedder-failure-rate", type=float, default=0.0, help="probability a fake embedder call raises")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=os.path.join("bench", "last_run.json"), help="where to write the JSON results")
+    parser.add_argument("--compare", help="baseline JSON to compare against; exits 1 on a regression over --tolerance")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression for --compare (default 0.15)")
+    parser.add_argument("--verbose", action="store_true", help="keep app logs and crew output")
+    return parser.parse_args(argv)
+
+
+def summarize(values_ms: List[float]) -> Dict[str, float]:
+    if not values_ms:
+        return {}
+    values = np.asarray(values_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(values.size),
+        "mean": round(float(values.mean()), 2),
+        "p50": round(float(p50), 2),
+        "p95": round(float(p95), 2),
+        "p99": round(float(p99), 2),
+        "max": round(float(values.max()), 2),
+    }
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """``name;dur=12.3, other;dur=4`` -> {"name": 12.3, "other": 4.0}"""
+    timings = {}
+    for entry in (header or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur" and name:
+                try:
+                    timings[name] = float(value)
+                except ValueError:
+                    pass
+    return timings
+
+
+def parse_token_usage(header: Optional[str]) -> Dict[str, Dict[str, int]]:
+    """``stage;prompt=812;completion=95, ...`` -> {"stage": {"prompt": 812, "completion": 95}}"""
+    usage = {}
+    for entry in (header or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        counts = {}
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if value.isdigit():
+                counts[key] = int(value)
+        if name and counts:
+            usage[name] = counts
+    return usage
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def _wait_ready(client: httpx.AsyncClient, timeout: float = 300.0) -> dict:
+    """Poll ``/readyz`` until the app's background warm-up has finished; returns its report."""
+    deadline = time.perf_counter() + timeout
+    while True:
+        response = await client.get("/readyz")
+        if response.status_code == 200 or time.perf_counter() > deadline:
+            return response.json()
+        await asyncio.sleep(0.05)
+
+
+async def _drive(args: argparse.Namespace, resumes, jobs) -> dict:
+    import_start = time.perf_counter()
+    from app.main import app
+    import_seconds = time.perf_counter() - import_start
+
+    total = args.warmup + args.requests
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = defaultdict(list)
+    tokens: Dict[str, Counter] = defaultdict(Counter)
+    statuses: Counter = Counter()
+    errors: Counter = Counter()
+    next_index = 0
+
+    async def send(client: httpx.AsyncClient, index: int):
+        resume = resumes[index % len(resumes)]
+        data = {"job_description": jobs[index % len(jobs)]}
+        if args.scoring_mode:
+            data["scoring_mode"] = args.scoring_mode
+        files = {"resume_file": (f"resume_{index}.pdf", resume.pdf, "application/pdf")}
+        start = time.perf_counter()
+        try:
+            response = await client.post("/run-crew", data=data, files=files, headers={"X-API-Key": os.environ["API_KEY"]})
+        except Exception as e:
+            status, timing, usage = "exception", {}, {}
+            errors[type(e).__name__] += 1
+        else:
+            status, timing = response.status_code, parse_server_timing(response.headers.get("server-timing"))
+            usage = parse_token_usage(response.headers.get("x-token-usage"))
+            if status != 200:
+                errors[str(response.json().get("detail", ""))[:120]] += 1
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if index >= args.warmup:
+            statuses[str(status)] += 1
+            if status == 200:
+                latencies.append(elapsed_ms)
+                for stage, duration in timing.items():
+                    stages[stage].append(duration)
+                for stage, counts in usage.items():
+                    tokens[stage].update(counts)
+
+    async def client_loop(client: httpx.AsyncClient, end: int):
+        nonlocal next_index
+        while next_index < end:
+            index = next_index
+            next_index += 1
+            await send(client, index)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            ready = await _wait_ready(client)
+            # Warm-up runs alone first, so the measured window starts with warm pools and caches
+            await asyncio.gather(*(client_loop(client, args.warmup) for _ in range(min(args.concurrency, args.warmup))))
+            measured_start = time.perf_counter()
+            await asyncio.gather(*(client_loop(client, total) for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - measured_start
+            executor = (await client.get("/executor/metrics")).json()
+
+    succeeded = len(latencies)
+    return {
+        "requests": {
+            "sent": args.requests,
+            "succeeded": succeeded,
+            "statuses": dict(statuses),
+            "errors": dict(errors.most_common(10)),
+        },
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(succeeded / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": summarize(latencies),
+        "stages_ms": {stage: summarize(values) for stage, values in sorted(stages.items())},
+        # Mean LLM tokens per successful request (empty with the in-process fake, which reports none)
+        "tokens_per_request": {
+            stage: {kind: round(count / succeeded, 1) for kind, count in sorted(counts.items())}
+            for stage, counts in sorted(tokens.items())
+        } if succeeded else {},
+        "executor": executor,
+        "startup": {
+            "import_app_ms": round(import_seconds * 1000, 1),
+            "status": ready.get("status"),
+            "warmup_steps_ms": ready.get("warmup_steps_ms", {}),
+        },
+    }
+
+
+def _lookup(results: dict, path) -> Optional[float]:
+    value = results
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value if isinstance(value, (int, float)) else None
+
+
+def compare(current: dict, baseline: dict, tolerance: float, metrics=COMPARED_METRICS) -> List[str]:
+    """Print current vs baseline for ``metrics``; returns the regressions."""
+    regressions = []
+    print(f"\n{'metric':<20}{'baseline':>12}{'current':>12}{'change':>10}")
+    for path, higher_is_better in metrics:
+        name = ".".join(path)
+        old, new = _lookup(baseline, path), _lookup(current, path)
+        if old is None or new is None or old == 0:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        flag = "  REGRESSION" if worse > tolerance else ""
+        print(f"{name:<20}{old:>12.2f}{new:>12.2f}{change:>+10.1%}{flag}")
+        if flag:
+            regressions.append(f"{name}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def print_report(results: dict):
+    requests = results["requests"]
+    print(f"\n{requests['succeeded']}/{requests['sent']} succeeded in {results['duration_s']} s "
+          f"-> {results['throughput_rps']} req/s, peak RSS {results['peak_rss_mb']} MB")
+    if requests["errors"]:
+        print(f"errors: {requests['errors']}")
+    print(f"\n{'':<18}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)")
+    rows = [("request", results["latency_ms"])] + list(results["stages_ms"].items())
+    for name, summary in rows:
+        if summary:
+            print(f"{name:<18}{summary['p50']:>10.1f}{summary['p95']:>10.1f}{summary['p99']:>10.1f}{summary['max']:>10.1f}")
+    startup = results.get("startup")
+    if startup:
+        steps = ", ".join(f"{step} {ms:.0f}" for step, ms in startup["warmup_steps_ms"].items())
+        print(f"\nstartup: import app.main {startup['import_app_ms']:.0f} ms, warm-up {startup['status']} ({steps} ms)")
+    if results.get("tokens_per_request"):
+        print(f"\n{'tokens/request':<18}{'prompt':>10}{'completion':>12}")
+        for stage, counts in results["tokens_per_request"].items():
+            print(f"{stage:<18}{counts.get('prompt', 0):>10.1f}{counts.get('completion', 0):>12.1f}")
+    repairs = results.get("structured_output")
+    if repairs and repairs["repaired"] + repairs["reasked"] + repairs["failed"]:
+        print(f"\nstructured outputs: {repairs['outputs']}, repaired locally {repairs['repaired']}, "
+              f"re-asked {repairs['reasked']}, failed {repairs['failed']}")
+    if "server_outcomes" in results["fakes"]:
+        print(f"\nfake model server responses: {results['fakes']['server_outcomes']}")
+    else:
+        print(f"\nfake model calls: {results['fakes']['llm_calls']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.requests < 1 or args.concurrency < 1 or args.jobs < 1:
+        raise SystemExit("--requests, --concurrency and --jobs must be at least 1")
+
+    total = args.warmup + args.requests
+    resumes, jobs = build_corpus(args.resumes or total, args.jobs, seed=args.seed, oversized_fraction=args.oversized_fraction)
+    llm_latency = FakeLatency(args.llm_latency, args.llm_jitter, args.llm_failure_rate, args.llm_malformed)
+    server = None
+    if args.llm_server:
+        server = start_server(ServerBehaviour(
+            latency=args.llm_latency, jitter=args.llm_jitter, errors=args.llm_failure_rate,
+            rate_limited=args.llm_rate_limited, slow=args.llm_slow, slow_seconds=args.llm_slow_seconds,
+            malformed=args.llm_malformed,
+        ), seed=args.seed)
+        # Read by app.llm_gateway at import, which install_fakes triggers
+        os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+        os.environ.setdefault("GEMINI_API_KEY", "bench")
+    install_fakes(
+        None if server else llm_latency,
+        FakeLatency(args.embedder_latency, args.llm_jitter, args.embedder_failure_rate),
+        seed=args.seed,
+    )
+
+    with contextlib.ExitStack() as stack:
+        if not args.verbose:
+            logging.disable(logging.CRITICAL)
+            devnull = stack.enter_context(open(os.devnull, "w"))
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+        outcome = asyncio.run(_drive(args, resumes, jobs))
+    logging.disable(logging.NOTSET)
+    from app.repair import repair_stats
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare", "tolerance", "verbose")}
+    config["env"] = {
+        name: os.environ[name]
+        for name in ("CREW_EXECUTOR_MODE", "CREW_MAX_WORKERS", "CREW_MAX_QUEUE", "PIPELINE_MODE",
+                     "PIPELINE_POOL_SIZE", "SCORING_MODE", "RESUME_INLINE_MAX_TOKENS", "LLM_MAX_RETRIES",
+                     "LLM_HEDGE", "LLM_FALLBACK_MODEL", "LLM_RATE_LIMIT_RPS")
+        if name in os.environ
+    }
+    results = {
+        "format": RESULT_FORMAT_VERSION,
+        "config": config,
+        "platform": {
+            "python": platform.python_version(),
+            "system": platform.system(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        **outcome,
+        "peak_rss_mb": peak_rss_mb(),
+        "fakes": fake_stats.snapshot(),
+        "structured_output": repair_stats(),
+    }
+    if server is not None:
+        results["fakes"]["server_outcomes"] = dict(server.outcomes)
+        server.shutdown()
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+    print_report(results)
+    if args.output:
+        print(f"\nresults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""Recorded LLM responses, replayed so evaluation runs are offline and deterministic.
+
+``install_replay`` puts a ``ReplayLLM`` behind every agent factory, the way
+``bench.fakes.install_fakes`` does. Each request is keyed by the model and
+the exact messages, with volatile strings such as the fixture directory
+replaced, so a key only changes when a prompt, a model or CrewAI's own
+templates change.
+
+- ``replay`` mode answers from the recording and reports the recorded token
+  usage to CrewAI's callbacks, so the app's per-stage token accounting works
+  as with a live model. A request that was never recorded raises
+  ``ReplayMiss``.
+- ``record`` mode replays what is recorded and sends the rest to the real
+  model through ``app.llm_gateway``, adding the answer, its token usage and
+  its latency.
+
+A key keeps one sample per repeat: a recording made with three repeats keeps
+the model's run-to-run variation, and repeat ``r`` always replays the same
+sample (``r`` modulo the number recorded).
+"""
+
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+from crewai.llms.base_llm import BaseLLM
+
+REPLAY_FORMAT_VERSION = 1
+MODE_REPLAY = "replay"
+MODE_RECORD = "record"
+
+_repeat: contextvars.ContextVar[int] = contextvars.ContextVar("replay_repeat", default=0)
+
+
+class ReplayMiss(RuntimeError):
+    """The request was never recorded: re-record after changing prompts, models or CrewAI."""
+
+
+class ReplaySample(NamedTuple):
+    response: str
+    prompt_tokens: int
+    completion_tokens: int
+    latency: float  # seconds the model took when recorded
+
+
+def request_key(model: str, messages, redact: Iterable[str] = ()) -> str:
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    payload = json.dumps(
+        {"model": model, "messages": [[m.get("role", ""), str(m.get("content", ""))] for m in messages]},
+        ensure_ascii=False, sort_keys=True,
+    )
+    for index, value in enumerate(redact):
+        payload = payload.replace(value, f"<redacted-{index}>")
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def replay_repeat(repeat: int) -> Iterator[None]:
+    """Calls made inside (and in contexts copied from it) replay sample ``repeat``."""
+    token = _repeat.set(repeat)
+    try:
+        yield
+    finally:
+        _repeat.reset(token)
+
+
+class ReplayCache:
+    """Samples per request key, loaded from and saved to one JSON file. Thread-safe."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("format") != REPLAY_FORMAT_VERSION:
+                raise ValueError(f"{path}: unsupported replay format {data.get('format')!r}")
+            self._entries = data["entries"]
+
+    def get(self, key: str, repeat: int, exact: bool = False) -> Optional[ReplaySample]:
+        """Sample ``repeat`` of ``key``; unless ``exact``, cycles through the samples recorded."""
+        with self._lock:
+            samples = self._entries.get(key, {}).get("samples", [])
+            if exact:
+                sample = samples[repeat] if repeat < len(samples) else None
+            else:
+                recorded = [sample for sample in samples if sample is not None]
+                sample = recorded[repeat % len(recorded)] if recorded else None
+            if sample is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return ReplaySample(**sample)
+
+    def add(self, key: str, model: str, repeat: int, sample: ReplaySample):
+        with self._lock:
+            samples = self._entries.setdefault(key, {"model": model, "samples": []})["samples"]
+            samples.extend([None] * (repeat + 1 - len(samples)))
+            samples[repeat] = sample._asdict()
+            self.recorded += 1
+
+    def save(self):
+        """Write the recording (sorted, so re-recordings diff cleanly in review)."""
+        with self._lock:
+            data = {"format": REPLAY_FORMAT_VERSION, "entries": self._entries}
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            temporary = self.path + ".tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1, sort_keys=True, ensure_ascii=False)
+                f.write("\n")
+            os.replace(temporary, self.path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"keys": len(self._entries), "hits": self.hits, "misses": self.misses, "recorded": self.recorded}
+
+
+class _UsageRecorder:
+    """CrewAI token callback that keeps the usage of the one call it is passed to."""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def log_success_event(self, kwargs, response_obj, start_time, end_time):
+        usage = response_obj.get("usage") if isinstance(response_obj, dict) else None
+        self.prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        self.completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+
+
+class ReplayLLM(BaseLLM):
+    """Answers from a ``ReplayCache``; in record mode, asks ``real_llm()`` on a miss and records the answer."""
+
+    def __init__(
+        self,
+        cache: ReplayCache,
+        model: str,
+        mode: str = MODE_REPLAY,
+        real_llm: Optional[Callable[[], BaseLLM]] = None,
+        redact: Iterable[str] = (),
+        replay_latency: bool = False,
+    ):
+        super().__init__(model=model, temperature=0)
+        self._cache = cache
+        self._mode = mode
+        self._real_llm = real_llm
+        self._inner: Optional[BaseLLM] = None
+        self._redact = tuple(redact)
+        self._replay_latency = replay_latency
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, from_task=None, from_agent=None):
+        key = request_key(self.model, messages, self._redact)
+        repeat = _repeat.get()
+        sample = self._cache.get(key, repeat, exact=self._mode == MODE_RECORD)
+        if sample is not None:
+            if self._replay_latency:
+                time.sleep(sample.latency)
+            usage = SimpleNamespace(
+                prompt_tokens=sample.prompt_tokens, completion_tokens=sample.completion_tokens,
+                prompt_tokens_details=None,
+            )
+            for callback in callbacks or []:
+                if hasattr(callback, "log_success_event"):
+                    callback.log_success_event(kwargs={}, response_obj={"usage": usage}, start_time=0, end_time=0)
+            return sample.response
+        if self._mode != MODE_RECORD:
+            raise ReplayMiss(f"no recorded response for {self.model} request {key[:12]} (repeat {repeat})")
+
+        if self._inner is None:
+            self._inner = self._real_llm()
+        recorder = _UsageRecorder()
+        started = time.perf_counter()
+        response = self._inner.call(
+            messages, tools, list(callbacks or []) + [recorder], available_functions, from_task, from_agent
+        )
+        sample = ReplaySample(
+            response if isinstance(response, str) else json.dumps(response),
+            recorder.prompt_tokens, recorder.completion_tokens, round(time.perf_counter() - started, 3),
+        )
+        self._cache.add(key, self.model, repeat, sample)
+        return response
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def get_context_window_size(self) -> int:
+        return 1_000_000
+
+
+def install_replay(cache: ReplayCache, mode: str = MODE_REPLAY, redact: List[str] = (), replay_latency: bool = False):
+    """Route every agent LLM through ``cache``. Call before the stage pools are built."""
+    import app.agents.agent1 as agent1
+    import app.agents.agent2 as agent2
+    import app.agents.agent3 as agent3
+
+    for module, model in (
+        (agent1, agent1.RESUME_ANALYZER_MODEL),
+        (agent2, agent2.JOB_ANALYZER_MODEL),
+        (agent3, agent3.SCORE_GENERATOR_MODEL),
+    ):
+        real_llm = module._build_llm
+
+        def build_llm(model=model, real_llm=real_llm):
+            return ReplayLLM(cache, model, mode, real_llm, redact, replay_latency)
+
+        module._build_llm = build_llm
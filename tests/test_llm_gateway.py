@@ -0,0 +1,120 @@
+import threading
+import time
+import pytest
+from app import llm_gateway
+from app.llm_gateway import CircuitBreaker, LLMUnavailableError, backoff_delay, build_llm
+from bench.fake_llm_server import FakeModelServer, ServerBehaviour
+
+
+class ScriptedServer(FakeModelServer):
+    """Fake model server that answers with ``script`` outcomes first, then as ``behaviour`` says."""
+
+    def __init__(self, address, behaviour: ServerBehaviour, script=()):
+        super().__init__(address, behaviour)
+        self.script = list(script)
+
+    def sample(self):
+        with self._lock:
+            outcome = self.script.pop(0) if self.script else None
+        if outcome == "slow":
+            return self.behaviour.slow_seconds, outcome
+        return (0.0, outcome) if outcome else super().sample()
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    """Start a scripted fake Gemini server and point the gateway at it, with fast retries."""
+    servers = []
+
+    def start(script=(), **behaviour):
+        behaviour = {"latency": 0.01, "jitter": 0.0, "retry_after": 0, **behaviour}
+        server = ScriptedServer(("127.0.0.1", 0), ServerBehaviour(**behaviour), script)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        monkeypatch.setattr(llm_gateway, "LLM_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}")
+        return server
+
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    monkeypatch.setattr(llm_gateway, "LLM_BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(llm_gateway, "LLM_MAX_RETRIES", 3)
+    monkeypatch.setattr(llm_gateway, "LLM_HEDGE", False)
+    monkeypatch.setattr(llm_gateway, "_breakers", {})
+    monkeypatch.setattr(llm_gateway, "_latencies", {})
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_rate_limited_and_transient_failures_are_retried(fake_server):
+    server = fake_server(script=["rate_limited", "error"])
+    reply = build_llm("gemini/retry-model").call("Summarize this resume")
+    assert "Final Answer" in reply
+    assert server.outcomes == {"rate_limited": 1, "error": 1, "ok": 1}
+
+
+def test_gives_up_after_max_retries(fake_server):
+    server = fake_server(errors=1.0)
+    with pytest.raises(LLMUnavailableError):
+        build_llm("gemini/broken-model").call("Summarize this resume")
+    assert server.outcomes["error"] == llm_gateway.LLM_MAX_RETRIES + 1
+
+
+def test_backoff_waits_for_retry_after(fake_server):
+    server = fake_server(script=["rate_limited"], retry_after=1)
+    started = time.monotonic()
+    build_llm("gemini/throttled-model").call("Summarize this resume")
+    assert time.monotonic() - started >= 1.0
+    assert server.outcomes == {"rate_limited": 1, "ok": 1}
+
+
+@pytest.mark.parametrize("retry", [0, 1, 2, 5, 10])
+def test_backoff_delay_is_jittered_and_capped(monkeypatch, retry):
+    monkeypatch.setattr(llm_gateway, "LLM_BACKOFF_BASE", 1.0)
+    monkeypatch.setattr(llm_gateway, "LLM_BACKOFF_MAX", 8.0)
+    delays = [backoff_delay(retry) for _ in range(200)]
+    assert all(0.0 <= delay <= min(8.0, 2 ** retry) for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_slow_attempt_is_hedged(fake_server, monkeypatch):
+    monkeypatch.setattr(llm_gateway, "LLM_HEDGE", True)
+    monkeypatch.setattr(llm_gateway, "LLM_HEDGE_MIN_DELAY", 0.2)
+    server = fake_server(script=["slow"], slow_seconds=2.0)
+    started = time.monotonic()
+    build_llm("gemini/slow-model").call("Summarize this resume")
+    assert time.monotonic() - started < 1.5
+    assert server.outcomes == {"ok": 1}  # the slow request is still sleeping on the server
+
+
+def test_circuit_opens_after_repeated_failures_and_closes_after_a_probe(fake_server, monkeypatch):
+    model = "gemini/flaky-model"
+    breaker = CircuitBreaker(model, failure_threshold=2, reset_timeout=0.5)
+    monkeypatch.setitem(llm_gateway._breakers, model, breaker)
+    server = fake_server(fail_models=("flaky-model",))
+    llm = build_llm(model)
+
+    with pytest.raises(LLMUnavailableError, match="circuit"):
+        llm.call("Summarize this resume")
+    assert server.outcomes["unavailable"] == 2
+    assert breaker.state == "open"
+
+    # Open: fails fast without a request
+    with pytest.raises(LLMUnavailableError, match="circuit"):
+        llm.call("Summarize this resume")
+    assert server.outcomes["unavailable"] == 2
+
+    # Half-open: one probe decides
+    server.behaviour = server.behaviour._replace(fail_models=())
+    time.sleep(0.6)
+    assert breaker.state == "half_open"
+    assert "Final Answer" in llm.call("Summarize this resume")
+    assert breaker.state == "closed"
+
+
+def test_fallback_model_answers_when_the_primary_gives_up(fake_server):
+    server = fake_server(fail_models=("primary-model",))
+    reply = build_llm("gemini/primary-model", fallback_model="gemini/fallback-model").call("Summarize this resume")
+    assert "Final Answer" in reply
+    assert server.outcomes["unavailable"] == llm_gateway.LLM_MAX_RETRIES + 1
+    assert server.outcomes["ok"] == 1
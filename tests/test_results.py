@@ -0,0 +1,152 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from app import results
+from app.results import (
+    SOURCE_COALESCED,
+    SOURCE_COMPUTED,
+    SOURCE_STORED,
+    IdempotencyKeyReused,
+    InMemoryResultStore,
+    SingleFlight,
+    SQLiteResultStore,
+    bind_idempotency_key,
+    review_once,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path, monkeypatch):
+    store = InMemoryResultStore() if request.param == "memory" else SQLiteResultStore(str(tmp_path / "results.db"))
+    monkeypatch.setattr(results, "result_store", store)
+    monkeypatch.setattr(results, "_in_flight", SingleFlight())
+    return store
+
+
+def test_idempotency_key_stays_bound_to_its_first_review(store):
+    assert store.bind_idempotency_key("acme:key-1", "sha:review-a") == "sha:review-a"
+    assert store.bind_idempotency_key("acme:key-1", "sha:review-a") == "sha:review-a"
+    assert store.bind_idempotency_key("acme:key-1", "sha:review-b") == "sha:review-a"
+    assert store.idempotent_key("acme:key-1") == "sha:review-a"
+
+
+def test_idempotency_key_reused_for_another_review_is_refused(store):
+    async def scenario():
+        await bind_idempotency_key("acme", "key-1", "sha:review-a")
+        await bind_idempotency_key("acme", "key-1", "sha:review-a")
+        # Keys are scoped per tenant
+        await bind_idempotency_key("globex", "key-1", "sha:review-b")
+        with pytest.raises(IdempotencyKeyReused):
+            await bind_idempotency_key("acme", "key-1", "sha:review-b")
+
+    asyncio.run(scenario())
+
+
+def test_stored_review_is_returned_without_running(store):
+    store.put("sha:review-a", {"score": 80})
+    cleanups = []
+
+    async def run():
+        raise AssertionError("the stored review should be reused")
+
+    review = asyncio.run(review_once("sha:review-a", run, cleanup=lambda: cleanups.append(1)))
+    assert review.source == SOURCE_STORED
+    assert review.result == {"score": 80}
+    assert cleanups == [1]
+
+
+def test_identical_reviews_in_flight_share_one_run(store):
+    runs = []
+    cleanups = []
+
+    async def run():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return SimpleNamespace(result={"score": 72})
+
+    async def scenario():
+        return await asyncio.gather(
+            review_once("sha:review-a", run, cleanup=lambda: cleanups.append("first")),
+            review_once("sha:review-a", run, cleanup=lambda: cleanups.append("second")),
+        )
+
+    first, second = asyncio.run(scenario())
+    assert len(runs) == 1
+    assert (first.source, second.source) == (SOURCE_COMPUTED, SOURCE_COALESCED)
+    assert first.result == second.result == {"score": 72}
+    assert sorted(cleanups) == ["first", "second"]
+    assert store.get("sha:review-a") == {"score": 72}
+
+
+def test_caller_that_gives_up_does_not_cancel_the_others():
+    flight = SingleFlight()
+    cleanups = []
+
+    async def scenario():
+        done = asyncio.Event()
+
+        async def run():
+            await asyncio.sleep(0.05)
+            done.set()
+            return "result"
+
+        starter = asyncio.create_task(flight.do("key", run, cleanup=lambda: cleanups.append("starter")))
+        await asyncio.sleep(0)
+        joiner = asyncio.create_task(flight.do("key", run))
+        await asyncio.sleep(0.01)
+        starter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await starter
+        # The upload the run reads is kept until the run is done
+        assert cleanups == []
+        assert await joiner == ("result", True)
+        assert done.is_set()
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert cleanups == ["starter"]
+    assert len(flight) == 0
+
+
+def test_flight_is_cancelled_once_every_caller_gives_up():
+    flight = SingleFlight()
+    cleanups = []
+    cancelled = []
+
+    async def scenario():
+        async def run():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        callers = [
+            asyncio.create_task(flight.do("key", run, cleanup=lambda: cleanups.append("starter"))),
+            asyncio.create_task(flight.do("key", run, cleanup=lambda: cleanups.append("joiner"))),
+        ]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert cancelled == [1]
+    assert sorted(cleanups) == ["joiner", "starter"]
+    assert len(flight) == 0
+
+
+def test_errors_reach_every_caller():
+    flight = SingleFlight()
+
+    async def run():
+        await asyncio.sleep(0.01)
+        raise ValueError("crew failed")
+
+    async def scenario():
+        return await asyncio.gather(flight.do("key", run), flight.do("key", run), return_exceptions=True)
+
+    errors = asyncio.run(scenario())
+    assert [type(e) for e in errors] == [ValueError, ValueError]
+    assert len(flight) == 0
@@ -0,0 +1,41 @@
+import pytest
+from app.models import JobAnalysis, ResumeAnalysis
+from app.scoring import score_locally, stem, terms
+
+
+@pytest.mark.parametrize(
+    "singular, plural",
+    [
+        ("database", "databases"),
+        ("pipeline", "pipelines"),
+        ("microservice", "microservices"),
+        ("service", "services"),
+        ("website", "websites"),
+        ("api", "apis"),
+        ("job", "jobs"),
+        ("box", "boxes"),
+        ("batch", "batches"),
+        ("process", "processes"),
+        ("class", "classes"),
+        ("status", "statuses"),
+        ("library", "libraries"),
+        ("framework", "frameworks"),
+    ],
+)
+def test_singular_and_plural_stem_alike(singular, plural):
+    assert stem(singular) == stem(plural)
+
+
+@pytest.mark.parametrize("word", ["aws", "gcs", "process", "class", "status"])
+def test_words_ending_in_s_that_are_not_plurals_are_kept(word):
+    assert stem(word) == word
+
+
+def test_plural_resume_terms_match_singular_job_terms():
+    assert terms("Pipelines, Microservices, Databases, APIs") == terms("Pipeline, Microservice, Database, API")
+
+
+def test_score_locally_matches_plurals():
+    resume = ResumeAnalysis(summary="Backend engineer", keywords=["Pipelines", "Microservices", "Databases", "APIs"])
+    job = JobAnalysis(keywords=["Pipeline", "Microservice", "Database", "API"], responsibilities=[], requirements=[])
+    assert score_locally(resume, job).ats_score == 100
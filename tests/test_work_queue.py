@@ -0,0 +1,77 @@
+import pickle
+import time
+import pytest
+from app.llm_gateway import LLMUnavailableError
+from app.work_queue import WorkerLost, WorkQueue, dump_error, load_error
+
+LEASE = 0.1
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return WorkQueue(str(tmp_path / "work_queue.db"), lease_seconds=LEASE, max_attempts=2)
+
+
+def test_item_runs_once_and_is_collected(queue):
+    item_id = queue.enqueue(pickle.dumps((max, 1, 2)))
+    item = queue.claim("worker-a")
+    assert (item.item_id, item.attempts) == (item_id, 1)
+    assert queue.claim("worker-b") is None
+    assert queue.collect(item_id) is None
+
+    queue.complete(item_id, pickle.dumps(2))
+    succeeded, result = queue.collect(item_id)
+    assert succeeded and pickle.loads(result) == 2
+    assert queue.collect(item_id) is None
+    assert queue.pending() == 0
+
+
+def test_heartbeat_keeps_the_lease(queue):
+    item_id = queue.enqueue(b"payload")
+    queue.claim("worker-a")
+    for _ in range(4):
+        time.sleep(LEASE / 2)
+        assert queue.extend_leases("worker-a") == 1
+    assert queue.claim("worker-b") is None
+    assert queue.counts()["running"] == 1
+    queue.complete(item_id, b"done")
+
+
+def test_expired_lease_is_claimed_again(queue):
+    item_id = queue.enqueue(b"payload")
+    queue.claim("worker-a")
+    time.sleep(LEASE * 2)
+    item = queue.claim("worker-b")
+    assert (item.item_id, item.attempts) == (item_id, 2)
+    # The dead worker's heartbeat no longer covers it
+    assert queue.extend_leases("worker-a") == 0
+
+
+def test_item_fails_after_max_attempts(queue):
+    item_id = queue.enqueue(b"payload")
+    for _ in range(queue.max_attempts):
+        assert queue.claim("worker").item_id == item_id
+        time.sleep(LEASE * 2)
+    assert queue.claim("worker") is None
+    succeeded, error = queue.collect(item_id)
+    assert not succeeded
+    assert isinstance(load_error(error), WorkerLost)
+
+
+def test_enqueue_refuses_past_max_pending(queue):
+    assert queue.enqueue(b"one", max_pending=2) is not None
+    assert queue.enqueue(b"two", max_pending=2) is not None
+    assert queue.enqueue(b"three", max_pending=2) is None
+    assert queue.cancel(queue.claim("worker").item_id) is False
+    assert queue.pending() == 2
+
+
+def test_failure_keeps_the_error_type_and_retry_after(queue):
+    item_id = queue.enqueue(b"payload")
+    queue.claim("worker")
+    queue.fail(item_id, dump_error(LLMUnavailableError("circuit open", retry_after=7)))
+    succeeded, error = queue.collect(item_id)
+    error = load_error(error)
+    assert not succeeded
+    assert isinstance(error, LLMUnavailableError)
+    assert (str(error), error.retry_after) == ("circuit open", 7)